@@ -1,12 +1,68 @@
-from .client import PlausibleClient
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
 
 from .errors import (
     PlausibleError,
     PlausibleAPIError,
     PlausibleAuthError,
+    PlausibleQueryValidationError,
     PlausibleRateLimitError,
+    PlausibleResponseTooLargeError,
 )
-from . import models
+
+if TYPE_CHECKING:
+    from .client import PlausibleClient
+    from .transport import (
+        Transport,
+        RequestsTransport,
+        HTTPXTransport,
+        CannedTransport,
+        TransportResponse,
+    )
+    from .events import Event, EventEncoder
+    from .instrumentation import RequestContext, RequestHook
+    from .metrics import MetricsRegistry
+    from .validation import QueryIssue, QueryValidator
+    from .cache import CacheBackend, MemoryCache, SQLiteCache
+    from .prewarm import HotQueryRegistry, Prewarmer
+    from .dedup import EventDeduplicator
+    from .shipper import EventShipper, EventSink, ShipperSink
+    from .streaming import StatsStream
+    from .hedging import Hedger
+    from .resolver import DNSCache
+    from . import models, timing
+
+# Public names resolved on first access (PEP 562) so `import plausible` stays cheap.
+_LAZY_ATTRS = {
+    "PlausibleClient": ".client",
+    "Transport": ".transport",
+    "RequestsTransport": ".transport",
+    "HTTPXTransport": ".transport",
+    "CannedTransport": ".transport",
+    "TransportResponse": ".transport",
+    "Event": ".events",
+    "EventEncoder": ".events",
+    "RequestContext": ".instrumentation",
+    "RequestHook": ".instrumentation",
+    "MetricsRegistry": ".metrics",
+    "QueryIssue": ".validation",
+    "QueryValidator": ".validation",
+    "CacheBackend": ".cache",
+    "MemoryCache": ".cache",
+    "SQLiteCache": ".cache",
+    "HotQueryRegistry": ".prewarm",
+    "Prewarmer": ".prewarm",
+    "EventDeduplicator": ".dedup",
+    "EventSink": ".shipper",
+    "ShipperSink": ".shipper",
+    "EventShipper": ".shipper",
+    "StatsStream": ".streaming",
+    "Hedger": ".hedging",
+    "DNSCache": ".resolver",
+}
+_LAZY_MODULES = ("models", "timing")
 
 __all__ = [
     "PlausibleClient",
@@ -14,5 +70,47 @@ __all__ = [
     "PlausibleAPIError",
     "PlausibleAuthError",
     "PlausibleRateLimitError",
+    "PlausibleQueryValidationError",
+    "PlausibleResponseTooLargeError",
+    "Transport",
+    "RequestsTransport",
+    "HTTPXTransport",
+    "CannedTransport",
+    "TransportResponse",
+    "Event",
+    "EventEncoder",
+    "RequestContext",
+    "RequestHook",
+    "MetricsRegistry",
+    "QueryIssue",
+    "QueryValidator",
+    "CacheBackend",
+    "MemoryCache",
+    "SQLiteCache",
+    "HotQueryRegistry",
+    "Prewarmer",
+    "EventDeduplicator",
+    "EventSink",
+    "ShipperSink",
+    "EventShipper",
+    "StatsStream",
+    "Hedger",
+    "DNSCache",
     "models",
+    "timing",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_ATTRS:
+        value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+    elif name in _LAZY_MODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(__all__))
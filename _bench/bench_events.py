@@ -0,0 +1,75 @@
+"""
+Micro-benchmark: events encoded per second.
+
+Compares the previous dict + json.dumps path against EventEncoder.
+
+Run from the directory containing the `backend` package:
+    python -m backend.app.core.landing_page.plausible._bench.bench_events
+"""
+from __future__ import annotations
+
+import json
+import time
+
+from backend.app.core.landing_page.plausible.events import Event, EventEncoder
+
+
+UA = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+
+def make_events(n: int):
+    return [
+        Event(
+            domain="landing.example.com",
+            name="pageview",
+            url=f"https://landing.example.com/pricing?utm_source=ad{i % 50}",
+            user_agent=UA,
+            client_ip=f"10.0.{i % 255}.{i % 7}",
+            referrer="https://www.google.com/",
+            props={"variant": "b", "plan": "pro"} if i % 3 == 0 else None,
+        )
+        for i in range(n)
+    ]
+
+
+def legacy_encode(event: Event):
+    payload = {"domain": event.domain, "name": event.name, "url": event.url, "interactive": event.interactive}
+    if event.referrer is not None:
+        payload["referrer"] = event.referrer
+    if event.props is not None:
+        payload["props"] = event.props
+    headers = {"Content-Type": "application/json", "User-Agent": event.user_agent}
+    if event.client_ip:
+        headers["X-Forwarded-For"] = event.client_ip
+    return json.dumps(payload).encode("utf-8"), headers
+
+
+def run(n: int = 100_000) -> dict:
+    events = make_events(n)
+    encoder = EventEncoder()
+
+    t0 = time.perf_counter()
+    for e in events:
+        legacy_encode(e)
+    legacy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for e in events:
+        encoder.encode(e)
+        encoder.headers(e)
+    encoder_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    encoder.encode_batch(events)
+    batch_s = time.perf_counter() - t0
+
+    return {
+        "legacy_events_per_s": n / legacy_s,
+        "encoder_events_per_s": n / encoder_s,
+        "batch_events_per_s": n / batch_s,
+    }
+
+
+if __name__ == "__main__":
+    for key, value in run().items():
+        print(f"{key:>24}: {value:,.0f}")
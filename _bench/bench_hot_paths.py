@@ -0,0 +1,182 @@
+"""
+Benchmarks for client, limiter, model and router hot paths.
+Registered into harness.REGISTRY on import; run them through _bench/run.py.
+"""
+from __future__ import annotations
+
+import json
+import threading
+
+from backend.app.core.landing_page.plausible import CannedTransport, PlausibleClient, TransportResponse
+from backend.app.core.landing_page.plausible.events import Event, EventEncoder
+from backend.app.core.landing_page.plausible.rate_limiter import RateLimiter
+
+from .harness import benchmark
+
+
+QUERY = {
+    "site_id": "landing.example.com",
+    "metrics": ["visitors", "pageviews", "bounce_rate"],
+    "date_range": "30d",
+    "dimensions": ["visit:country_name", "visit:entry_page"],
+    "filters": [["is", "visit:device", ["Desktop"]]],
+    "order_by": [["visitors", "desc"]],
+    "pagination": {"limit": 100, "offset": 0},
+}
+
+
+def _stats_body(rows: int) -> dict:
+    return {
+        "results": [{"metrics": [i, i * 3, 41.5], "dimensions": ["Estonia", f"/page/{i}"]} for i in range(rows)],
+        "meta": {"imports_included": False},
+        "query": QUERY,
+    }
+
+
+def _client() -> PlausibleClient:
+    transport = CannedTransport(
+        {
+            ("POST", "/api/event"): TransportResponse(status_code=202),
+            ("POST", "/api/v2/query"): TransportResponse.from_json(_stats_body(1)),
+        },
+        max_calls=0,
+    )
+    return PlausibleClient(stats_api_key="k", sites_api_key="k", transport=transport, rate_limit_per_hour=10**9)
+
+
+# ------------
+# RateLimiter
+# ------------
+ACQUIRES_PER_THREAD = 2000
+
+
+def _contended_acquire(threads: int):
+    def factory():
+        limiter = RateLimiter(capacity=10**12, refill_window_s=1)
+
+        def worker() -> None:
+            acquire = limiter.acquire
+            for _ in range(ACQUIRES_PER_THREAD):
+                acquire()
+
+        def run() -> None:
+            pool = [threading.Thread(target=worker) for _ in range(threads)]
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+
+        return run
+
+    return factory
+
+
+for _n in (1, 8, 64):
+    benchmark(f"rate_limiter.acquire[{_n} threads]", ops_per_call=_n * ACQUIRES_PER_THREAD)(_contended_acquire(_n))
+
+
+# -----------------
+# Response handling
+# -----------------
+def _handle_response_factory(rows: int):
+    def factory():
+        client = _client()
+        resp = TransportResponse(status_code=200, content=json.dumps(_stats_body(rows)).encode("utf-8"))
+        return lambda: client._handle_response(resp)
+
+    return factory
+
+
+benchmark("client._handle_response[1 row]")(_handle_response_factory(1))
+benchmark("client._handle_response[10k rows]")(_handle_response_factory(10_000))
+
+
+# ------
+# Events
+# ------
+def _event() -> Event:
+    return Event(
+        domain="landing.example.com",
+        name="pageview",
+        url="https://landing.example.com/pricing?utm_source=newsletter",
+        user_agent="Mozilla/5.0 (X11; Linux x86_64) Chrome/120.0",
+        client_ip="10.0.0.1",
+        referrer="https://www.google.com/",
+        props={"variant": "b"},
+    )
+
+
+@benchmark("events.encode+headers")
+def _bench_event_encode():
+    encoder = EventEncoder()
+    event = _event()
+
+    def run() -> None:
+        encoder.encode(event)
+        encoder.headers(event)
+
+    return run
+
+
+@benchmark("client.send_event[canned transport]")
+def _bench_send_event():
+    client = _client()
+    e = _event()
+    return lambda: client.send_event(
+        domain=e.domain, name=e.name, url=e.url, user_agent=e.user_agent, client_ip=e.client_ip, props=e.props
+    )
+
+
+# ----------
+# Validation
+# ----------
+@benchmark("QueryValidator.issues")
+def _bench_validate():
+    from backend.app.core.landing_page.plausible.validation import QueryValidator
+
+    validator = QueryValidator()
+    return lambda: validator.issues(QUERY)
+
+
+# ---------------
+# Pydantic models
+# ---------------
+@benchmark("StatsQueryRequest.model_dump")
+def _bench_model_dump():
+    from backend.app.core.landing_page.plausible.api._requests import StatsQueryRequest
+
+    payload = StatsQueryRequest(**QUERY)
+    return lambda: payload.model_dump(exclude_none=True)
+
+
+def _stats_response_factory(rows: int):
+    def factory():
+        from backend.app.core.landing_page.plausible.api._responses import StatsResponse
+
+        body = _stats_body(rows)
+        return lambda: StatsResponse(**body)
+
+    return factory
+
+
+benchmark("StatsResponse(**result)[1 row]")(_stats_response_factory(1))
+benchmark("StatsResponse(**result)[10k rows]")(_stats_response_factory(10_000))
+
+
+# ------
+# Router
+# ------
+@benchmark("route POST /plausible/stats/query")
+def _bench_route():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from backend.app.core.landing_page.plausible.api import router
+    from backend.app.core.landing_page.plausible.api.deps import get_client
+
+    app = FastAPI()
+    shared = _client()
+    app.dependency_overrides[get_client] = lambda: shared
+    app.include_router(router)
+    http = TestClient(app)
+    return lambda: http.post("/plausible/stats/query", json=QUERY)
@@ -0,0 +1,72 @@
+"""
+Cold-start benchmark: package import and first client construction, each
+measured in a fresh interpreter.
+
+Run from the directory containing the `backend` package:
+    python -m backend.app.core.landing_page.plausible._bench.bench_import [--runs 15]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+PKG = "backend.app.core.landing_page.plausible"
+
+_PROBE = """
+import json, time
+t0 = time.perf_counter()
+import {pkg} as plausible
+t1 = time.perf_counter()
+client = plausible.PlausibleClient(stats_api_key="x", sites_api_key="x")
+t2 = time.perf_counter()
+client.transport
+t3 = time.perf_counter()
+from {pkg}.api import router
+t4 = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (t1 - t0) * 1000,
+    "construct_ms": (t2 - t1) * 1000,
+    "first_use_ms": (t3 - t2) * 1000,
+    "router_import_ms": (t4 - t3) * 1000,
+}}))
+"""
+
+_PROBE_PRE_USE = """
+import sys
+import {pkg} as plausible
+plausible.PlausibleClient(stats_api_key="x")
+print(",".join(m for m in ("requests", "urllib3", "fastapi", "pydantic") if m in sys.modules))
+"""
+
+
+def run(runs: int = 15) -> dict:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(pkg=PKG)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    loaded = subprocess.run(
+        [sys.executable, "-c", _PROBE_PRE_USE.format(pkg=PKG)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+    report = {key: statistics.median(s[key] for s in samples) for key in ("import_ms", "construct_ms", "first_use_ms", "router_import_ms")}
+    report["heavy_modules_before_first_use"] = loaded or "none"
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=15)
+    args = parser.parse_args()
+    for key, value in run(args.runs).items():
+        print(f"{key:>32}: {value:.2f}" if isinstance(value, float) else f"{key:>32}: {value}")
@@ -0,0 +1,109 @@
+"""
+Tiny benchmark harness: registration, timing, baselines and comparison reports.
+
+A benchmark is a factory returning a zero-argument callable; the callable is timed
+with timeit's autorange and reported as best-of-N nanoseconds per operation (ops_per_call
+lets one call stand for many operations, e.g. a batch of threaded acquires).
+"""
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import timeit
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+
+class BenchmarkCase(NamedTuple):
+    name: str
+    factory: Callable[[], Callable[[], object]]
+    ops_per_call: int
+
+
+class Result(NamedTuple):
+    name: str
+    ns_per_op: float
+    stdev_pct: float
+
+
+REGISTRY: Dict[str, BenchmarkCase] = {}
+
+
+def benchmark(name: str, *, ops_per_call: int = 1) -> Callable[[Callable[[], Callable[[], object]]], Callable[[], Callable[[], object]]]:
+    def decorator(factory: Callable[[], Callable[[], object]]) -> Callable[[], Callable[[], object]]:
+        if name in REGISTRY:
+            raise ValueError(f"duplicate benchmark name: {name}")
+        REGISTRY[name] = BenchmarkCase(name, factory, ops_per_call)
+        return factory
+
+    return decorator
+
+
+def measure(case: BenchmarkCase, *, repeat: int = 5, min_time_s: float = 0.2) -> Result:
+    fn = case.factory()
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time_s:
+        number = max(1, int(number * min_time_s / max(elapsed, 1e-9)))
+    samples = [t / (number * case.ops_per_call) * 1e9 for t in timer.repeat(repeat=repeat, number=number)]
+    # Best-of-N is the most stable estimate on a noisy machine (as recommended by timeit).
+    best = min(samples)
+    stdev = statistics.pstdev(samples) / statistics.mean(samples) * 100.0
+    return Result(case.name, best, stdev)
+
+
+def run(pattern: Optional[str] = None, *, repeat: int = 5) -> List[Result]:
+    return [measure(case, repeat=repeat) for name, case in sorted(REGISTRY.items()) if not pattern or pattern in name]
+
+
+def save_baseline(results: List[Result], path: str) -> None:
+    doc = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform()},
+        "results": {r.name: round(r.ns_per_op, 1) for r in results},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_baseline(path: str) -> Dict[str, float]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def compare(results: List[Result], baseline: Dict[str, float], *, threshold_pct: float = 10.0) -> tuple:
+    """
+    Returns (report_text, regressed_names). A benchmark regresses when it is more
+    than threshold_pct slower than its baseline.
+    """
+    lines = [f"{'benchmark':<44} {'baseline':>12} {'current':>12} {'change':>9}"]
+    regressed: List[str] = []
+    for r in results:
+        base = baseline.get(r.name)
+        if base is None:
+            lines.append(f"{r.name:<44} {'-':>12} {_fmt_ns(r.ns_per_op):>12} {'new':>9}")
+            continue
+        change = (r.ns_per_op - base) / base * 100.0
+        flag = ""
+        if change > threshold_pct:
+            flag = "  REGRESSION"
+            regressed.append(r.name)
+        elif change < -threshold_pct:
+            flag = "  improved"
+        lines.append(f"{r.name:<44} {_fmt_ns(base):>12} {_fmt_ns(r.ns_per_op):>12} {change:>+8.1f}%{flag}")
+    return "\n".join(lines), regressed
+
+
+def format_results(results: List[Result]) -> str:
+    lines = [f"{'benchmark':<44} {'time/op':>12} {'stdev':>8}"]
+    for r in results:
+        lines.append(f"{r.name:<44} {_fmt_ns(r.ns_per_op):>12} {r.stdev_pct:>7.1f}%")
+    return "\n".join(lines)
+
+
+def _fmt_ns(ns: float) -> str:
+    if ns >= 1e6:
+        return f"{ns / 1e6:.2f} ms"
+    if ns >= 1e3:
+        return f"{ns / 1e3:.2f} us"
+    return f"{ns:.0f} ns"
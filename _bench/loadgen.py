@@ -0,0 +1,194 @@
+"""
+Open-loop load generator for PlausibleClient and the FastAPI router.
+
+Requests are scheduled at a fixed target rate regardless of how fast earlier ones
+complete, and latency is measured from the scheduled start, so queueing delay
+is included (no coordinated omission).
+
+    # against an in-process stand-in with injected faults
+    python -m backend.app.core.landing_page.plausible._bench.loadgen --target client --rps 100 \\
+        --duration 15 --latency lognormal:0.05:0.5 --p429 0.02 --p5xx 0.01
+
+    # against a running stand-in (or any base URL)
+    python -m backend.app.core.landing_page.plausible._bench.loadgen --target router --base-url http://127.0.0.1:8765
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from backend.app.core.landing_page.plausible import PlausibleAPIError, PlausibleClient, PlausibleError
+
+from .standin_server import StandInServer, add_fault_arguments, faults_from_args
+
+
+Operation = Callable[[int], None]
+
+
+class LoadReport:
+    def __init__(self, duration_s: float, latencies_s: List[float], outcomes: Dict[str, int], scheduled: int) -> None:
+        self.duration_s = duration_s
+        self.latencies_s = sorted(latencies_s)
+        self.outcomes = outcomes
+        self.scheduled = scheduled
+
+    @property
+    def completed(self) -> int:
+        return len(self.latencies_s)
+
+    @property
+    def throughput(self) -> float:
+        return self.completed / self.duration_s if self.duration_s else 0.0
+
+    def percentile(self, pct: float) -> float:
+        if not self.latencies_s:
+            return 0.0
+        idx = min(len(self.latencies_s) - 1, max(0, int(round(pct / 100.0 * len(self.latencies_s))) - 1))
+        return self.latencies_s[idx]
+
+    def format(self) -> str:
+        lines = [
+            f"scheduled:   {self.scheduled}",
+            f"completed:   {self.completed} in {self.duration_s:.1f}s ({self.throughput:.1f} req/s)",
+            f"latency:     p50={self.percentile(50) * 1000:.1f}ms p90={self.percentile(90) * 1000:.1f}ms "
+            f"p99={self.percentile(99) * 1000:.1f}ms max={(self.latencies_s[-1] if self.latencies_s else 0) * 1000:.1f}ms",
+            "outcomes:",
+        ]
+        for name, count in sorted(self.outcomes.items(), key=lambda kv: -kv[1]):
+            lines.append(f"  {name:<32} {count:>8} ({count / max(self.completed, 1) * 100:.1f}%)")
+        return "\n".join(lines)
+
+
+def run_load(operation: Operation, *, rps: float, duration_s: float, concurrency: int = 64) -> LoadReport:
+    """Call operation(i) at rps for duration_s on up to concurrency threads."""
+    latencies: List[float] = []
+    outcomes: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def task(i: int, scheduled_at: float) -> None:
+        try:
+            operation(i)
+            outcome = "ok"
+        except PlausibleError as exc:
+            outcome = f"{type(exc).__name__}:{getattr(exc, 'status_code', None)}"
+        except Exception as exc:
+            outcome = type(exc).__name__
+        latency = time.perf_counter() - scheduled_at
+        with lock:
+            latencies.append(latency)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    interval = 1.0 / rps
+    started = time.perf_counter()
+    scheduled = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in itertools.count():
+            at = started + i * interval
+            if at - started >= duration_s:
+                break
+            delay = at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(task, i, at)
+            scheduled += 1
+    return LoadReport(time.perf_counter() - started, latencies, outcomes, scheduled)
+
+
+STATS_QUERY = {"site_id": "load.example", "metrics": ["visitors", "pageviews"], "date_range": "7d", "dimensions": ["event:page"]}
+
+
+def client_operation(client: PlausibleClient, event_ratio: float = 0.5) -> Operation:
+    """Mix of send_event and query_stats calls on a shared client."""
+    every = max(1, int(round(1 / event_ratio))) if event_ratio > 0 else 0
+
+    def op(i: int) -> None:
+        if every and i % every == 0:
+            client.send_event(domain="load.example", name="pageview", url=f"https://load.example/{i % 100}", user_agent="loadgen")
+        else:
+            client.query_stats(STATS_QUERY)
+
+    return op
+
+
+def router_operation(client: PlausibleClient, event_ratio: float = 0.5) -> Operation:
+    """Same mix driven through the FastAPI router (in-process TestClient)."""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from backend.app.core.landing_page.plausible.api import router
+    from backend.app.core.landing_page.plausible.api.deps import get_client
+    from backend.app.core.landing_page.plausible.api.exceptions import register_exception_handlers
+
+    app = FastAPI()
+    register_exception_handlers(app)
+    app.dependency_overrides[get_client] = lambda: client
+    app.include_router(router)
+    local = threading.local()
+    every = max(1, int(round(1 / event_ratio))) if event_ratio > 0 else 0
+
+    def op(i: int) -> None:
+        http = getattr(local, "http", None)
+        if http is None:
+            http = local.http = TestClient(app)
+        if every and i % every == 0:
+            resp = http.post(
+                "/plausible/events",
+                json={"domain": "load.example", "name": "pageview", "url": f"https://load.example/{i % 100}", "user_agent": "loadgen"},
+            )
+        else:
+            resp = http.post("/plausible/stats/query", json=STATS_QUERY)
+        if resp.status_code >= 400:
+            raise PlausibleAPIError(f"router HTTP {resp.status_code}", status_code=resp.status_code)
+
+    return op
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=("client", "router"), default="client")
+    parser.add_argument("--base-url", default=None, help="existing server; default starts an in-process stand-in")
+    parser.add_argument("--rps", type=float, default=50.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--event-ratio", type=float, default=0.5)
+    parser.add_argument("--pool-maxsize", type=int, default=64)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--rate-limit-per-hour", type=int, default=10**9)
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    standin = None if args.base_url else StandInServer(faults_from_args(args)).start()
+    base_url = args.base_url or standin.url
+    client = PlausibleClient(
+        stats_api_key="loadgen",
+        sites_api_key="loadgen",
+        base_url=base_url,
+        max_retries=args.max_retries,
+        backoff_factor=0.05,
+        rate_limit_per_hour=args.rate_limit_per_hour,
+        pool_maxsize=args.pool_maxsize,
+        pool_block=True,
+        timeout_s=10,
+    )
+    make_op = client_operation if args.target == "client" else router_operation
+    try:
+        report = run_load(make_op(client, args.event_ratio), rps=args.rps, duration_s=args.duration, concurrency=args.concurrency)
+    finally:
+        client.close()
+        if standin is not None:
+            standin.stop()
+
+    print(f"target={args.target} base_url={base_url} rps={args.rps:g} duration={args.duration:g}s")
+    print(report.format())
+    if standin is not None:
+        print("upstream responses:")
+        for (path, status), count in sorted(standin.counts.items()):
+            print(f"  {status} {path:<28} {count:>8}")
+
+
+if __name__ == "__main__":
+    main()
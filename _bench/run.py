@@ -0,0 +1,56 @@
+"""
+Run the micro-benchmark suite and compare against stored baselines.
+
+Run from the directory containing the `backend` package:
+    python -m backend.app.core.landing_page.plausible._bench.run                # compare with baselines.json
+    python -m backend.app.core.landing_page.plausible._bench.run --save         # record new baselines
+    python -m backend.app.core.landing_page.plausible._bench.run -k rate_limiter
+
+Baselines are machine specific; record them on the machine that runs the comparison.
+Exits with status 1 when any benchmark is slower than --threshold percent.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+from . import bench_hot_paths  # noqa: F401  (registers benchmarks)
+from .harness import compare, format_results, load_baseline, run, save_baseline
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="pattern", default=None, help="only run benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=15.0, help="regression threshold in percent")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = run(args.pattern, repeat=args.repeat)
+
+    if args.save:
+        save_baseline(results, args.baseline)
+        print(format_results(results))
+        print(f"\nbaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(format_results(results))
+        print(f"\nno baseline at {args.baseline}; run with --save to record one")
+        return 0
+
+    report, regressed = compare(results, load_baseline(args.baseline), threshold_pct=args.threshold)
+    print(report)
+    if regressed:
+        print(f"\n{len(regressed)} regression(s) above {args.threshold:.0f}%: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
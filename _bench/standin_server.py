@@ -0,0 +1,301 @@
+"""
+Local fault-injecting stand-in for the Plausible endpoints used by PlausibleClient.
+
+Implements POST /api/event, POST /api/v2/query and the /api/v1/sites* endpoints
+with configurable latency, 429/5xx injection (with Retry-After) and slow bodies.
+
+    python -m backend.app.core.landing_page.plausible._bench.standin_server --port 8765 \\
+        --latency lognormal:0.05:0.6 --p429 0.02 --p5xx 0.01 --slow-body 0.05
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+
+class LatencyDistribution:
+    """
+    Parsed from "kind:args":
+    - fixed:S            always S seconds
+    - uniform:LO:HI      uniform in [LO, HI]
+    - exponential:MEAN   exponential with the given mean
+    - lognormal:MEDIAN:SIGMA
+    """
+
+    def __init__(self, spec: str = "fixed:0") -> None:
+        kind, *raw = spec.split(":")
+        args = [float(a) for a in raw]
+        if kind not in ("fixed", "uniform", "exponential", "lognormal"):
+            raise ValueError(f"unknown latency distribution: {kind}")
+        self.kind = kind
+        self.args = args
+        self.spec = spec
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.args[0]
+        if self.kind == "uniform":
+            return rng.uniform(self.args[0], self.args[1])
+        if self.kind == "exponential":
+            return rng.expovariate(1.0 / self.args[0]) if self.args[0] > 0 else 0.0
+        median, sigma = self.args
+        return median * rng.lognormvariate(0.0, sigma)
+
+
+class FaultConfig:
+    """Fault injection knobs; probabilities are per request in [0, 1]."""
+
+    def __init__(
+        self,
+        *,
+        latency: str = "fixed:0",
+        p429: float = 0.0,
+        p5xx: float = 0.0,
+        retry_after_s: Optional[int] = 1,
+        p_slow_body: float = 0.0,
+        slow_body_chunk_delay_s: float = 0.05,
+        slow_body_chunks: int = 10,
+        rows: int = 10,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.latency = LatencyDistribution(latency)
+        self.p429 = p429
+        self.p5xx = p5xx
+        self.retry_after_s = retry_after_s
+        self.p_slow_body = p_slow_body
+        self.slow_body_chunk_delay_s = slow_body_chunk_delay_s
+        self.slow_body_chunks = slow_body_chunks
+        self.rows = rows
+        self.rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def roll(self) -> Tuple[float, float, float]:
+        with self._rng_lock:
+            return self.latency.sample(self.rng), self.rng.random(), self.rng.random()
+
+
+def _stats_result(query: Dict[str, Any], rows: int) -> Dict[str, Any]:
+    metrics = query.get("metrics") or ["visitors"]
+    dimensions = query.get("dimensions") or []
+    n = rows if dimensions else 1
+    return {
+        "results": [
+            {
+                "metrics": [(i + 1) * (j + 3) for j in range(len(metrics))],
+                "dimensions": [f"{d.split(':')[-1]}-{i}" for d in dimensions],
+            }
+            for i in range(n)
+        ],
+        "meta": {},
+        "query": query,
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_StandInHTTPServer"
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_PUT(self) -> None:
+        self._dispatch("PUT")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str) -> None:
+        faults = self.server.faults
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        path = urlsplit(self.path).path
+
+        delay, fault_roll, slow_roll = faults.roll()
+        if delay > 0:
+            time.sleep(delay)
+
+        if fault_roll < faults.p429:
+            headers = {"Retry-After": str(faults.retry_after_s)} if faults.retry_after_s is not None else {}
+            return self._reply(429, {"error": "Too many requests"}, path, headers)
+        if fault_roll < faults.p429 + faults.p5xx:
+            return self._reply(503, {"error": "Service unavailable"}, path)
+
+        if path != "/api/event" and not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self._reply(401, {"error": "Missing API key"}, path)
+
+        status, body = self._route(method, path, raw)
+        self._reply(status, body, path, slow=slow_roll < faults.p_slow_body)
+
+    def _route(self, method: str, path: str, raw: bytes) -> Tuple[int, Any]:
+        if path == "/api/event" and method == "POST":
+            if self.headers.get("X-Debug-Request") == "true":
+                return 200, {"ip": self.headers.get("X-Forwarded-For", self.client_address[0])}
+            return 202, None
+        if path == "/api/v2/query" and method == "POST":
+            try:
+                query = json.loads(raw or b"{}")
+            except ValueError:
+                return 400, {"error": "Invalid JSON"}
+            if not query.get("site_id") or not query.get("metrics") or "date_range" not in query:
+                return 400, {"error": "site_id, metrics and date_range are required"}
+            return 200, _stats_result(query, self.server.faults.rows)
+        if path == "/api/v1/sites" and method == "GET":
+            return 200, {"sites": [{"domain": f"site-{i}.example", "timezone": "Etc/UTC"} for i in range(3)], "meta": {}}
+        if path == "/api/v1/sites/teams" and method == "GET":
+            return 200, {"teams": [{"id": "team-1", "name": "Team"}], "meta": {}}
+        if path == "/api/v1/sites/goals":
+            return 200, {"goals": [], "meta": {}} if method == "GET" else {"id": "1"}
+        if path == "/api/v1/sites/guests":
+            return 200, {"guests": [], "meta": {}} if method == "GET" else {"status": "invited"}
+        if path == "/api/v1/sites/shared-links" and method == "PUT":
+            return 200, {"name": "shared", "url": "http://standin/share/x?auth=y"}
+        if path.startswith("/api/v1/sites/goals/") or path.startswith("/api/v1/sites/guests/"):
+            return 200, {"deleted": True}
+        if path == "/api/v1/sites" and method == "POST":
+            return 200, {"domain": "created.example", "timezone": "Etc/UTC"}
+        if path.startswith("/api/v1/sites/"):
+            site_id = path.rsplit("/", 1)[-1]
+            if method == "DELETE":
+                return 200, {"deleted": True}
+            return 200, {"domain": site_id, "timezone": "Etc/UTC"}
+        return 404, {"error": "Not found"}
+
+    def _reply(
+        self,
+        status: int,
+        body: Any,
+        path: str,
+        headers: Optional[Dict[str, str]] = None,
+        *,
+        slow: bool = False,
+    ) -> None:
+        self.server.record(path, status)
+        payload = b"" if body is None else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if not slow or not payload:
+            self.wfile.write(payload)
+            return
+        faults = self.server.faults
+        step = max(1, len(payload) // faults.slow_body_chunks)
+        for i in range(0, len(payload), step):
+            self.wfile.write(payload[i : i + step])
+            self.wfile.flush()
+            time.sleep(faults.slow_body_chunk_delay_s)
+
+
+class _StandInHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], faults: FaultConfig) -> None:
+        super().__init__(address, _Handler)
+        self.faults = faults
+        self.counts: Dict[Tuple[str, int], int] = {}
+        self._counts_lock = threading.Lock()
+
+    def record(self, path: str, status: int) -> None:
+        with self._counts_lock:
+            key = (path, status)
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+
+class StandInServer:
+    """
+    Runs the stand-in on a background thread.
+
+        with StandInServer(FaultConfig(p429=0.05)) as srv:
+            client = PlausibleClient(base_url=srv.url, stats_api_key="x")
+    """
+
+    def __init__(self, faults: Optional[FaultConfig] = None, *, host: str = "127.0.0.1", port: int = 0) -> None:
+        self._httpd = _StandInHTTPServer((host, port), faults or FaultConfig())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def faults(self) -> FaultConfig:
+        return self._httpd.faults
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def counts(self) -> Dict[Tuple[str, int], int]:
+        return dict(self._httpd.counts)
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="plausible-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", default="fixed:0", help="fixed:S | uniform:LO:HI | exponential:MEAN | lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--p429", type=float, default=0.0)
+    parser.add_argument("--p5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--slow-body", type=float, default=0.0, help="probability of a slow, chunked body")
+    parser.add_argument("--rows", type=int, default=10, help="rows per stats response with dimensions")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def faults_from_args(args: argparse.Namespace) -> FaultConfig:
+    return FaultConfig(
+        latency=args.latency,
+        p429=args.p429,
+        p5xx=args.p5xx,
+        retry_after_s=args.retry_after,
+        p_slow_body=args.slow_body,
+        rows=args.rows,
+        seed=args.seed,
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Fault-injecting Plausible stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    httpd = _StandInHTTPServer((args.host, args.port), faults_from_args(args))
+    print(f"plausible stand-in listening on http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
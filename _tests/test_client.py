@@ -0,0 +1,1228 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from backend.app.core.landing_page.plausible import (
+    CannedTransport,
+    DNSCache,
+    Event,
+    EventDeduplicator,
+    EventEncoder,
+    EventShipper,
+    Hedger,
+    HotQueryRegistry,
+    MemoryCache,
+    MetricsRegistry,
+    PlausibleAPIError,
+    PlausibleClient,
+    PlausibleQueryValidationError,
+    PlausibleRateLimitError,
+    PlausibleResponseTooLargeError,
+    Prewarmer,
+    QueryValidator,
+    RequestHook,
+    RequestsTransport,
+    SQLiteCache,
+    ShipperSink,
+    TransportResponse,
+)
+from backend.app.core.landing_page.plausible import timing
+from backend.app.core.landing_page.plausible.cache import cache_key
+from backend.app.core.landing_page.plausible.combiner import QueryBatcher
+from backend.app.core.landing_page.plausible.rate_limiter import RateLimiter
+from backend.app.core.landing_page.plausible.transport import encode_json_body
+
+
+STATS_RESULT = {"results": [{"metrics": [42], "dimensions": []}], "meta": {}, "query": {}}
+
+
+def make_client(transport: CannedTransport, **kwargs) -> PlausibleClient:
+    kwargs.setdefault("stats_api_key", "stats-key")
+    kwargs.setdefault("sites_api_key", "sites-key")
+    return PlausibleClient(transport=transport, **kwargs)
+
+
+def test_query_stats_through_canned_transport():
+    transport = CannedTransport({("POST", "/api/v2/query"): TransportResponse.from_json(STATS_RESULT)})
+    client = make_client(transport)
+
+    result = client.query_stats({"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "7d"})
+
+    assert result["results"][0]["metrics"] == [42]
+    call = transport.calls[0]
+    assert call["headers"]["Authorization"] == "Bearer stats-key"
+    assert call["json"]["site_id"] == "dummy.site"
+
+
+def test_canned_transport_keeps_only_latest_calls():
+    transport = CannedTransport({("POST", "/api/event"): TransportResponse(status_code=202)}, max_calls=2)
+    for i in range(5):
+        transport.request("POST", f"https://plausible.test/api/event?i={i}")
+
+    assert [call["url"][-1] for call in transport.calls] == ["3", "4"]
+
+
+def test_rate_limited_response_raises():
+    transport = CannedTransport({("GET", "/api/v1/sites"): TransportResponse(status_code=429)})
+    client = make_client(transport)
+
+    with pytest.raises(PlausibleRateLimitError):
+        client.list_sites()
+
+
+def test_requests_transport_pool_settings():
+    transport = RequestsTransport(pool_maxsize=64, pool_block=True, keep_alive=False)
+    adapter = transport.session.get_adapter("https://plausible.io")
+
+    assert adapter._pool_maxsize == 64
+    assert adapter._pool_block is True
+    assert transport.session.headers["Connection"] == "close"
+    transport.close()
+
+
+def test_encode_json_body_gzips_large_payloads():
+    headers: dict = {}
+    payload = [{"name": "pageview", "url": "https://dummy.site/" + "x" * 50}] * 50
+
+    body = encode_json_body(payload, headers, compress=True, compress_min_bytes=256)
+
+    assert headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(body)) == payload
+
+
+def test_send_event_encodes_record_bytes():
+    transport = CannedTransport({("POST", "/api/event"): TransportResponse(status_code=202)})
+    client = make_client(transport)
+
+    client.send_event(
+        domain="dummy.site",
+        name="pageview",
+        url="https://dummy.site/é",
+        user_agent="pytest-UA",
+        client_ip="10.0.0.1",
+        props={"plan": "pro"},
+    )
+
+    call = transport.calls[0]
+    assert json.loads(call["data"]) == {
+        "domain": "dummy.site",
+        "name": "pageview",
+        "url": "https://dummy.site/é",
+        "interactive": True,
+        "props": {"plan": "pro"},
+    }
+    assert call["headers"]["User-Agent"] == "pytest-UA"
+    assert call["headers"]["X-Forwarded-For"] == "10.0.0.1"
+
+
+def test_import_and_plain_client_do_not_load_heavy_modules():
+    import subprocess
+    import sys
+
+    package = PlausibleClient.__module__.rsplit(".", 1)[0]
+    script = (
+        "import importlib, json, sys\n"
+        f"plausible = importlib.import_module({package!r})\n"
+        "plausible.PlausibleClient()\n"
+        "print(json.dumps(sorted(m for m in ('requests', 'sqlite3', 'concurrent.futures', 'ssl') if m in sys.modules)))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", script],
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(p for p in sys.path if p)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert json.loads(out.stdout) == []
+
+
+def test_event_encoder_batch_matches_payloads():
+    encoder = EventEncoder()
+    events = [
+        Event(domain="dummy.site", name="pageview", url=f"https://dummy.site/{i}", user_agent="UA", referrer="r")
+        for i in range(3)
+    ]
+
+    assert json.loads(encoder.encode_batch(events)) == [e.payload() for e in events]
+    assert encoder.headers(events[0]) is encoder.headers(events[1])
+
+
+def test_metrics_and_hooks_record_upstream_calls():
+    class Recorder(RequestHook):
+        def __init__(self):
+            self.ended = []
+
+        def on_request_end(self, ctx):
+            self.ended.append((ctx.endpoint, ctx.status_code))
+
+    transport = CannedTransport(
+        {
+            ("GET", "/api/v1/sites/dummy.site"): TransportResponse.from_json({"domain": "dummy.site"}),
+            ("GET", "/api/v1/sites"): TransportResponse(status_code=429),
+        }
+    )
+    registry = MetricsRegistry()
+    recorder = Recorder()
+    client = make_client(transport, metrics=registry, hooks=[recorder])
+
+    client.get_site(site_id="dummy.site")
+    with pytest.raises(PlausibleRateLimitError):
+        client.list_sites()
+
+    assert recorder.ended == [("/api/v1/sites/{site_id}", 200), ("/api/v1/sites", 429)]
+    assert registry.counter_value("plausible_client_rate_limited_total", {"endpoint": "/api/v1/sites"}) == 1
+    assert registry.histogram_count("plausible_rate_limiter_wait_seconds") == 2
+    text = registry.render_prometheus()
+    assert 'plausible_client_requests_total{endpoint="/api/v1/sites/{site_id}",method="GET",status="200"} 1' in text
+    assert "# TYPE plausible_client_request_duration_seconds histogram" in text
+
+
+def test_sampled_calls_record_phase_breakdown():
+    transport = CannedTransport({("POST", "/api/v2/query"): TransportResponse.from_json(STATS_RESULT)})
+    client = make_client(transport, timing_sample_rate=1.0)
+
+    client.query_stats({"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "7d"})
+    call = timing.pop_last()
+
+    assert call is not None
+    assert call.endpoint == "/api/v2/query"
+    assert "ttfb" in call.phases and "parse" in call.phases
+    assert "ttfb;dur=" in call.server_timing()
+    assert timing.pop_last() is None
+
+
+def test_unsampled_calls_record_nothing():
+    transport = CannedTransport({("POST", "/api/v2/query"): TransportResponse.from_json(STATS_RESULT)})
+    client = make_client(transport)
+
+    client.query_stats({"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "7d"})
+
+    assert timing.pop_last() is None
+
+
+def test_invalid_query_rejected_before_upstream_call():
+    transport = CannedTransport({("POST", "/api/v2/query"): TransportResponse.from_json(STATS_RESULT)})
+    client = make_client(transport, validate_queries=True, rate_limit_per_hour=1)
+
+    with pytest.raises(PlausibleQueryValidationError) as excinfo:
+        client.query_stats(
+            {
+                "site_id": "dummy.site",
+                "metrics": ["visitors", "conversion_rate", "pageviewz"],
+                "date_range": "12mo",
+                "dimensions": ["time:minute"],
+                "order_by": [["bounce_rate", "desc"]],
+            }
+        )
+
+    codes = {issue.code for issue in excinfo.value.issues}
+    assert codes == {"unknown_metric", "goal_required", "time_dimension_range", "order_by_not_queried"}
+    assert transport.calls == []
+    # The single rate-limit token is still available for a valid query.
+    client.query_stats({"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "7d"})
+    assert len(transport.calls) == 1
+
+
+def test_query_validator_accepts_goal_filtered_conversion_rate():
+    validator = QueryValidator()
+    query = {
+        "site_id": "dummy.site",
+        "metrics": ["visitors", "conversion_rate"],
+        "date_range": ["2024-01-01", "2024-01-31"],
+        "dimensions": ["time:day", "event:props:plan"],
+        "filters": [["and", [["is", "event:goal", ["Signup"]], ["is_not", "visit:country", ["EE"]]]]],
+        "include": {"time_labels": True},
+        "pagination": {"limit": 100},
+    }
+
+    assert validator.issues(query) == ()
+
+
+def test_query_validator_reports_non_string_list_elements():
+    validator = QueryValidator()
+    query = {
+        "site_id": "dummy.site",
+        "metrics": ["visitors", ["pageviews"], {"m": 1}],
+        "date_range": "7d",
+        "dimensions": [["event:page"]],
+        "order_by": [[["visitors"], "desc"]],
+    }
+
+    issues = validator.issues(query)
+
+    assert [(i.path, i.code) for i in issues] == [
+        ("metrics[1]", "invalid_type"),
+        ("metrics[2]", "invalid_type"),
+        ("dimensions[0]", "invalid_type"),
+        ("order_by[0]", "invalid_order_by"),
+    ]
+
+
+def test_query_validator_rejects_session_metric_with_event_dimension():
+    validator = QueryValidator()
+    query = {"site_id": "dummy.site", "metrics": ["visitors", "bounce_rate"], "date_range": "7d", "dimensions": ["event:page"]}
+
+    assert [i.code for i in validator.issues(query)] == ["incompatible_dimension"]
+    assert validator.issues({**query, "dimensions": ["visit:entry_page"]}) == ()
+
+
+def test_query_validator_rejects_percentage_without_dimensions():
+    validator = QueryValidator()
+    query = {"site_id": "dummy.site", "metrics": ["visitors", "percentage"], "date_range": "7d"}
+
+    assert [i.code for i in validator.issues(query)] == ["dimension_required"]
+    assert validator.issues({**query, "dimensions": ["visit:source"]}) == ()
+
+
+def _merged_stats_response(request):
+    metrics = request["json"]["metrics"]
+    rows = [{"metrics": [f"{m}@{page}" for m in metrics], "dimensions": [page]} for page in ("/a", "/b")]
+    return TransportResponse.from_json({"results": rows, "meta": {}, "query": request["json"]})
+
+
+def test_query_stats_many_merges_queries_differing_only_in_metrics():
+    transport = CannedTransport({("POST", "/api/v2/query"): _merged_stats_response})
+    registry = MetricsRegistry()
+    client = make_client(transport, metrics=registry)
+    base = {"site_id": "dummy.site", "date_range": "7d", "dimensions": ["event:page"], "order_by": [["visitors", "desc"]]}
+
+    results = client.query_stats_many(
+        [
+            {**base, "metrics": ["visitors", "pageviews"]},
+            {**base, "metrics": ["bounce_rate"]},
+            {**base, "date_range": "30d", "metrics": ["visitors"]},
+            {**base, "metrics": ["pageviews"]},
+        ]
+    )
+
+    assert [call["json"]["metrics"] for call in transport.calls] == [["visitors", "pageviews", "bounce_rate"], ["visitors"]]
+    assert results[0]["results"][1] == {"metrics": ["visitors@/b", "pageviews@/b"], "dimensions": ["/b"]}
+    assert results[1]["results"][0]["metrics"] == ["bounce_rate@/a"]
+    assert results[1]["query"]["metrics"] == ["bounce_rate"]
+    assert results[2]["query"]["date_range"] == "30d"
+    assert results[3]["results"][0]["metrics"] == ["pageviews@/a"]
+    assert registry.counter_value("plausible_client_queries_combined_total") == 2
+
+
+def test_concurrent_query_stats_combined_within_window():
+    transport = CannedTransport({("POST", "/api/v2/query"): _merged_stats_response})
+    client = make_client(transport, combine_window_s=0.2)
+    base = {"site_id": "dummy.site", "date_range": "7d", "dimensions": ["event:page"], "order_by": [["visitors", "desc"]]}
+    metric_sets = [["visitors"], ["pageviews"], ["visitors", "visit_duration"]]
+    results = [None] * len(metric_sets)
+
+    def worker(i):
+        results[i] = client.query_stats({**base, "metrics": metric_sets[i]})
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(metric_sets))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(transport.calls) == 1
+    for metrics, result in zip(metric_sets, results):
+        assert result["results"][0]["metrics"] == [f"{m}@/a" for m in metrics]
+
+
+def test_shared_batcher_combines_queries_from_separate_clients():
+    transport = CannedTransport({("POST", "/api/v2/query"): _merged_stats_response})
+    batcher = QueryBatcher(window_s=0.2)
+    base = {"site_id": "dummy.site", "date_range": "7d", "dimensions": ["event:page"], "order_by": [["visitors", "desc"]]}
+    metric_sets = [["visitors"], ["pageviews"], ["visitors", "visit_duration"]]
+    results = [None] * len(metric_sets)
+
+    def worker(i):
+        # A fresh client per call, as the per-request bearer-token dependency creates.
+        client = make_client(transport, batcher=batcher)
+        results[i] = client.query_stats({**base, "metrics": metric_sets[i]})
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(metric_sets))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(transport.calls) == 1
+    for metrics, result in zip(metric_sets, results):
+        assert result["results"][0]["metrics"] == [f"{m}@/a" for m in metrics]
+
+
+def test_rejected_merged_query_fails_only_the_offending_member():
+    def respond(request):
+        metrics = request["json"]["metrics"]
+        if "bogus" in metrics:
+            return TransportResponse.from_json({"error": "Unknown metric 'bogus'"}, status_code=400)
+        return _merged_stats_response(request)
+
+    transport = CannedTransport({("POST", "/api/v2/query"): respond})
+    batcher = QueryBatcher(window_s=0.2)
+    base = {"site_id": "dummy.site", "date_range": "7d", "dimensions": ["event:page"], "order_by": [["visitors", "desc"]]}
+    metric_sets = [["visitors"], ["bogus"], ["pageviews"]]
+    results = [None] * len(metric_sets)
+
+    def worker(i):
+        try:
+            results[i] = make_client(transport, batcher=batcher).query_stats({**base, "metrics": metric_sets[i]})
+        except PlausibleAPIError as exc:
+            results[i] = exc
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(metric_sets))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # One merged attempt, then each member alone.
+    assert len(transport.calls) == 4
+    assert results[0]["results"][0]["metrics"] == ["visitors@/a"]
+    assert isinstance(results[1], PlausibleAPIError) and results[1].status_code == 400
+    assert results[2]["results"][0]["metrics"] == ["pageviews@/a"]
+
+
+def _counting_stats_response():
+    served = []
+
+    def respond(request):
+        served.append(request["json"])
+        return TransportResponse.from_json({"results": [{"metrics": [len(served)], "dimensions": []}], "meta": {}, "query": {}})
+
+    return respond, served
+
+
+def test_cache_serves_stale_while_revalidating():
+    respond, served = _counting_stats_response()
+    registry = MetricsRegistry()
+    client = make_client(
+        CannedTransport({("POST", "/api/v2/query"): respond}),
+        cache=MemoryCache(),
+        cache_ttl_s=0.05,
+        cache_max_stale_s=60,
+        metrics=registry,
+    )
+    query = {"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "7d"}
+
+    assert client.query_stats(query)["results"][0]["metrics"] == [1]
+    assert client.query_stats(dict(reversed(list(query.items()))))["results"][0]["metrics"] == [1]
+    time.sleep(0.06)
+    # Expired: the stale value comes back at once and a refresh runs in the background.
+    assert client.query_stats(query)["results"][0]["metrics"] == [1]
+    assert client.wait_for_refreshes(1.0)
+    assert registry.counter_value("plausible_cache_refreshes_total", {"source": "revalidate", "outcome": "ok"}) == 1
+    assert client.query_stats(query)["results"][0]["metrics"] == [2]
+    assert len(served) == 2
+    assert registry.counter_value("plausible_cache_lookups_total", {"result": "stale"}) == 1
+
+
+def test_cache_miss_fetched_once_for_concurrent_callers():
+    served = []
+
+    def respond(request):
+        served.append(request["json"])
+        time.sleep(0.1)
+        if request["json"]["date_range"] == "30d" and len(served) == 2:
+            return TransportResponse.from_json({"error": "boom"}, status_code=400)
+        return TransportResponse.from_json({"results": [{"metrics": [len(served)], "dimensions": []}], "meta": {}, "query": {}})
+
+    transport = CannedTransport({("POST", "/api/v2/query"): respond})
+    cache = MemoryCache()
+    # Separate clients sharing the cache, as per-request clients do.
+    clients = [make_client(transport, cache=cache, cache_ttl_s=60) for _ in range(8)]
+
+    def run_all(query):
+        results = [None] * len(clients)
+
+        def worker(i):
+            try:
+                results[i] = clients[i].query_stats(query)["results"][0]["metrics"]
+            except PlausibleAPIError as exc:
+                results[i] = exc.status_code
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(clients))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    assert run_all({"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "7d"}) == [[1]] * 8
+    assert len(served) == 1
+    # The leader's failure stays its own: one waiter takes over and the rest get its result.
+    results = run_all({"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "30d"})
+    assert sorted(results, key=str) == sorted([400] + [[3]] * 7, key=str)
+    assert len(served) == 3
+
+
+def test_prewarmer_refreshes_hot_queries_within_reserved_budget():
+    respond, served = _counting_stats_response()
+    hot = HotQueryRegistry(min_score=2)
+    client = make_client(
+        CannedTransport({("POST", "/api/v2/query"): respond}),
+        cache=MemoryCache(),
+        cache_ttl_s=10,
+        hot_queries=hot,
+        rate_limit_per_hour=20,
+    )
+    pinned = {"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "day"}
+    hot.add(pinned)
+    popular = {"site_id": "dummy.site", "metrics": ["pageviews"], "date_range": "7d"}
+    client.query_stats(popular)
+    client.query_stats(popular)
+    client.query_stats({"site_id": "dummy.site", "metrics": ["pageviews"], "date_range": "30d"})
+
+    prewarmer = Prewarmer(client, reserved_fraction=0.1, refresh_ahead_s=30)
+    # Budget is 2 tokens: the pinned query and the learned one, not the one-off query.
+    assert prewarmer.run_once() == 2
+    assert served[-2:] == [pinned, popular]
+    assert prewarmer.run_once() == 0
+    assert client.query_stats(pinned)["results"][0]["metrics"] == [3]
+
+
+def test_refresh_claims_are_shared_through_the_cache():
+    release = threading.Event()
+    served = []
+
+    def respond(request):
+        served.append(request["json"])
+        release.wait(1.0)
+        return TransportResponse.from_json({"results": [{"metrics": [len(served)], "dimensions": []}], "meta": {}, "query": {}})
+
+    cache = MemoryCache()
+    transport = CannedTransport({("POST", "/api/v2/query"): respond})
+    clients = [make_client(transport, cache=cache, cache_ttl_s=60, cache_max_stale_s=60) for _ in range(2)]
+    query = {"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "7d"}
+    cache.set(cache_key(query), {"results": [], "meta": {}, "query": {}}, ttl_s=-1, stale_s=60)
+
+    # Both clients see the stale entry; only the first starts a refresh.
+    for client in clients:
+        assert client.query_stats(query)["results"] == []
+    assert clients[1].refresh_if_idle(query) == "in_flight"
+    release.set()
+    assert clients[0].wait_for_refreshes(1.0)
+    assert len(served) == 1
+
+
+def test_refresh_if_idle_charges_budget_only_with_a_client_token():
+    respond, served = _counting_stats_response()
+    client = make_client(CannedTransport({("POST", "/api/v2/query"): respond}), cache=MemoryCache(), rate_limit_per_hour=1)
+    budget = RateLimiter(capacity=1, refill_window_s=3600)
+    query = {"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "7d"}
+
+    client.query_stats({**query, "date_range": "30d"})  # spends the client's only token
+    assert client.refresh_if_idle(query, budget=budget) == "rate_limit"
+    assert budget.try_acquire()  # untouched by the refused refresh
+
+    client.rate_limiter.release()
+    assert client.refresh_if_idle(query, budget=budget) == "budget"
+    assert client.rate_limiter.try_acquire()  # refunded
+    assert len(served) == 1
+
+
+def test_sqlite_cache_is_shared_and_size_bounded(tmp_path):
+    path = str(tmp_path / "stats.sqlite")
+    writer = SQLiteCache(path, max_bytes=4000, evict_every=1)
+    reader = SQLiteCache(path)
+    body = {"results": [{"metrics": [i, i * 2], "dimensions": [f"/page/{i}"]} for i in range(50)], "meta": {}}
+
+    writer.set("q0", body, ttl_s=60)
+    entry = reader.get("q0")
+    assert entry.value == body and entry.is_fresh()
+
+    writer.set("gone", body, ttl_s=-1)
+    assert reader.get("gone") is None
+    for i in range(1, 40):
+        writer.set(f"q{i}", {**body, "meta": {"i": i}}, ttl_s=60)
+    assert writer.size_bytes() <= 4000
+    assert reader.get("q39").value["meta"] == {"i": 39}
+    assert reader.get("q1") is None
+    writer.close()
+    reader.close()
+
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc/self/fd")
+def test_sqlite_cache_connections_do_not_grow_with_threads(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "stats.sqlite"), pool_size=2)
+    respond, _ = _counting_stats_response()
+    client = make_client(CannedTransport({("POST", "/api/v2/query"): respond}), cache=cache, cache_ttl_s=60)
+    query = {"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "7d"}
+    client.compare_stats(query, today=date(2024, 3, 11))
+    fds = len(os.listdir("/proc/self/fd"))
+
+    for day in range(12, 62):
+        # Each call fetches the previous period on a new thread.
+        client.compare_stats(query, today=date(2024, 3, 11) + timedelta(days=day - 11))
+    threads = [threading.Thread(target=cache.get, args=("missing",)) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(os.listdir("/proc/self/fd")) <= fds + 2
+    assert cache.idle_connections <= 2
+    cache.close()
+
+
+def test_export_job_resumes_from_checkpoint(tmp_path):
+    from datetime import date
+
+    from backend.app.core.landing_page.plausible.export import ExportJob, MetricSet
+
+    failing_day = ["2024-01-02"]
+
+    def stats(request):
+        query = request["json"]
+        day = query["date_range"][0]
+        if day in failing_day:
+            return TransportResponse(status_code=500, content=b"boom")
+        rows = [{"metrics": [f"{m}:{day}" for m in query["metrics"]], "dimensions": ["/a"] if query.get("dimensions") else []}]
+        return TransportResponse.from_json({"results": rows, "meta": {}, "query": query})
+
+    def sites(request):
+        if request["params"].get("after"):
+            return TransportResponse.from_json({"sites": [{"domain": "b.example"}], "meta": {"after": None}})
+        return TransportResponse.from_json({"sites": [{"domain": "a.example"}], "meta": {"after": "cursor"}})
+
+    transport = CannedTransport({("POST", "/api/v2/query"): stats, ("GET", "/api/v1/sites"): sites})
+    client = make_client(transport)
+    metric_sets = [
+        MetricSet.parse("totals=visitors,pageviews"),
+        MetricSet.parse("engagement=bounce_rate"),
+        MetricSet.parse("pages=visitors/event:page"),
+    ]
+
+    def job():
+        return ExportJob(
+            client, str(tmp_path), start=date(2024, 1, 1), end=date(2024, 1, 3), metric_sets=metric_sets, max_attempts=1
+        )
+
+    first = job().run()
+    assert first.units_total == 18 and first.units_done == 12 and len(first.failed) == 6
+    # totals and engagement share one call per site and day; pages needs its own.
+    assert sum(1 for c in transport.calls if c["method"] == "POST") == 4 * 2 + 2
+
+    failing_day.clear()
+    transport.calls.clear()
+    second = job().run()
+    assert second.units_skipped == 12 and second.units_done == 6 and not second.failed
+    assert sum(1 for c in transport.calls if c["method"] == "POST") == 2 * 2
+
+    totals = [json.loads(line) for line in (tmp_path / "totals.ndjson").read_text().splitlines()]
+    assert sorted((r["site_id"], r["date"]) for r in totals) == [
+        (site, f"2024-01-0{d}") for site in ("a.example", "b.example") for d in (1, 2, 3)
+    ]
+    assert totals[0] == {"site_id": "a.example", "date": totals[0]["date"], "visitors": f"visitors:{totals[0]['date']}", "pageviews": f"pageviews:{totals[0]['date']}"}
+    pages = [json.loads(line) for line in (tmp_path / "pages.ndjson").read_text().splitlines()]
+    assert len(pages) == 6 and pages[0]["event:page"] == "/a"
+
+
+def test_export_job_marks_units_failed_on_transport_errors(tmp_path):
+    import requests
+
+    from backend.app.core.landing_page.plausible.export import ExportJob, MetricSet
+
+    def stats(request):
+        query = request["json"]
+        day = query["date_range"][0]
+        if day == "2024-01-01":
+            raise requests.ConnectionError("connection reset")
+        if day == "2024-01-02":
+            raise requests.Timeout("read timed out")
+        return TransportResponse.from_json({"results": [{"metrics": [1], "dimensions": []}], "meta": {}, "query": query})
+
+    job = ExportJob(
+        make_client(CannedTransport({("POST", "/api/v2/query"): stats})),
+        str(tmp_path),
+        start=date(2024, 1, 1),
+        end=date(2024, 1, 3),
+        metric_sets=[MetricSet.parse("totals=visitors")],
+        sites=["a.example"],
+        max_attempts=1,
+    )
+    report = job.run()
+
+    assert report.units_done == 1
+    assert sorted(report.failed) == ["a.example|totals|2024-01-01", "a.example|totals|2024-01-02"]
+    assert "ConnectionError" in report.failed["a.example|totals|2024-01-01"]
+
+
+def test_export_job_marks_units_failed_on_malformed_responses(tmp_path):
+    from backend.app.core.landing_page.plausible.export import ExportJob, MetricSet
+
+    malformed = {"2024-01-01"}
+
+    def stats(request):
+        query = request["json"]
+        if query["date_range"][0] in malformed:
+            return TransportResponse.from_json({"results": [{"dimensions": []}], "meta": {}, "query": query})
+        return TransportResponse.from_json({"results": [{"metrics": [1], "dimensions": []}], "meta": {}, "query": query})
+
+    def job():
+        return ExportJob(
+            make_client(CannedTransport({("POST", "/api/v2/query"): stats})),
+            str(tmp_path),
+            start=date(2024, 1, 1),
+            end=date(2024, 1, 2),
+            metric_sets=[MetricSet.parse("totals=visitors")],
+            sites=["a.example"],
+        )
+
+    report = job().run()
+    assert report.units_done == 1
+    assert list(report.failed) == ["a.example|totals|2024-01-01"]
+    assert "KeyError" in report.failed["a.example|totals|2024-01-01"]
+
+    # Left unchecked in the checkpoint: the next run retries it.
+    malformed.clear()
+    report = job().run()
+    assert report.units_skipped == 1 and report.units_done == 1 and not report.failed
+
+
+def test_export_checkpoint_drops_torn_trailing_line(tmp_path):
+    from backend.app.core.landing_page.plausible.export import ExportJob, MetricSet
+
+    def stats(request):
+        query = request["json"]
+        return TransportResponse.from_json({"results": [{"metrics": [1], "dimensions": []}], "meta": {}, "query": query})
+
+    transport = CannedTransport({("POST", "/api/v2/query"): stats})
+
+    def job(end):
+        return ExportJob(
+            make_client(transport),
+            str(tmp_path),
+            start=date(2024, 1, 1),
+            end=end,
+            metric_sets=[MetricSet.parse("totals=visitors")],
+            sites=["a.example"],
+            workers=1,
+        )
+
+    job(date(2024, 1, 1)).run()
+    checkpoint = tmp_path / "checkpoint.ndjson"
+    with open(checkpoint, "ab") as fh:
+        fh.write(b'{"units": ["a.example|totals|2024-01-02"], "offs')  # crash mid-write
+
+    report = job(date(2024, 1, 2)).run()
+
+    assert report.units_skipped == 1 and report.units_done == 1
+    lines = checkpoint.read_text().splitlines()
+    assert [json.loads(line)["units"] for line in lines] == [["a.example|totals|2024-01-01"], ["a.example|totals|2024-01-02"]]
+    assert len((tmp_path / "totals.ndjson").read_text().splitlines()) == 2
+
+
+def test_duplicate_events_suppressed_within_window():
+    transport = CannedTransport({("POST", "/api/event"): TransportResponse(status_code=202)})
+    registry = MetricsRegistry()
+    client = make_client(transport, deduplicator=EventDeduplicator(window_s=0.05), metrics=registry, rate_limit_per_hour=3)
+    event = dict(domain="dummy.site", name="pageview", url="https://dummy.site/", user_agent="UA", client_ip="10.0.0.1")
+
+    assert client.send_event(**event, props={"a": 1, "b": 2}) == {}
+    assert client.send_event(**event, props={"b": 2, "a": 1}) == {}
+    client.send_event(**event, props={"a": 2})
+    assert len(transport.calls) == 2
+    assert registry.counter_value("plausible_events_deduplicated_total") == 1
+
+    time.sleep(0.11)
+    client.send_event(**event, props={"a": 1, "b": 2})
+    assert len(transport.calls) == 3
+
+
+def test_failed_event_send_is_not_marked_seen():
+    statuses = [500, 202]
+    transport = CannedTransport({("POST", "/api/event"): lambda request: TransportResponse(status_code=statuses.pop(0))})
+    client = make_client(transport, deduplicator=EventDeduplicator(window_s=60))
+    event = dict(domain="dummy.site", name="pageview", url="https://dummy.site/", user_agent="UA", client_ip="10.0.0.1")
+
+    with pytest.raises(PlausibleAPIError):
+        client.send_event(**event)
+    # The retry goes out; once it succeeds, further repeats are suppressed.
+    assert client.send_event(**event) == {}
+    assert client.send_event(**event) == {}
+    assert len(transport.calls) == 2
+
+
+def test_event_deduplicator_false_positive_rate_near_configured():
+    dedup = EventDeduplicator(window_s=60, capacity=5000, false_positive_rate=0.01)
+    for i in range(5000):
+        dedup.seen(Event(domain="d", name="pageview", url=f"https://d/{i}", user_agent="UA"))
+    assert dedup.suppressed < 50
+    assert 0.001 < dedup.estimated_false_positive_rate() <= 0.01
+    false_positives = sum(dedup.seen(Event(domain="d", name="pageview", url=f"https://d/new/{i}", user_agent="UA")) for i in range(1000))
+    assert false_positives < 20
+
+
+@pytest.mark.parametrize("use_shm", [True, False])
+def test_events_handed_to_shipper_process_via_sink(tmp_path, use_shm):
+    from backend.app.core.landing_page.plausible.shipper import shm_supported
+
+    if use_shm and not shm_supported():
+        pytest.skip("shared-memory ring not supported on this platform")
+    upstream = CannedTransport({("POST", "/api/event"): TransportResponse(status_code=202)})
+    socket_path = str(tmp_path / "ship.sock")
+    shipper = EventShipper(make_client(upstream), socket_path, workers=2).start()
+    sink = ShipperSink(socket_path, use_shm=use_shm, ring_size=1 << 16)
+    local = CannedTransport({("POST", "/api/event"): TransportResponse(status_code=202)})
+    client = make_client(local, event_sink=sink)
+    try:
+        for i in range(200):
+            assert client.send_event(domain="dummy.site", name="pageview", url=f"https://dummy.site/{i}", user_agent="UA", client_ip="10.0.0.9") == {}
+        client.send_event(domain="dummy.site", name="pageview", url="https://dummy.site/debug", user_agent="UA", debug=True)
+        sink.close()
+    finally:
+        shipper.stop()
+
+    # Only the debug event went out directly.
+    assert [json.loads(c["data"])["url"] for c in local.calls] == ["https://dummy.site/debug"]
+    shipped = [json.loads(c["data"])["url"] for c in upstream.calls]
+    assert sorted(shipped) == sorted(f"https://dummy.site/{i}" for i in range(200))
+    assert upstream.calls[0]["headers"]["X-Forwarded-For"] == "10.0.0.9"
+    assert shipper.sent == len(shipped) and shipper.failed == 0
+
+
+def test_shipper_counts_and_logs_failed_sends(tmp_path, caplog):
+    import logging
+    import urllib.request
+
+    from backend.app.core.landing_page.plausible.metrics import serve_prometheus
+    from backend.app.core.landing_page.plausible.shipper import encode_frame
+
+    registry = MetricsRegistry()
+    upstream = CannedTransport({("POST", "/api/event"): TransportResponse(status_code=500, content=b"down")})
+    shipper = EventShipper(make_client(upstream, metrics=registry), str(tmp_path / "ship.sock"), workers=1)
+    frame = encode_frame(Event(domain="dummy.site", name="pageview", url="https://dummy.site/", user_agent="UA"), EventEncoder())
+    with caplog.at_level(logging.WARNING, logger="backend.app.core.landing_page.plausible.shipper"):
+        for _ in range(3):
+            shipper._dispatch(frame)
+        shipper._pool.shutdown(wait=True)
+
+    assert shipper.failed == 3 and shipper.sent == 0
+    # Rate-limited: one warning for the first failure, the rest are summed into the next.
+    assert len(caplog.records) == 1 and "PlausibleAPIError" in caplog.records[0].getMessage()
+
+    server = serve_prometheus(registry)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as resp:
+            text = resp.read().decode()
+    finally:
+        server.shutdown()
+    assert 'plausible_shipper_events_total{outcome="failed"} 3' in text
+
+
+def test_shipper_drops_corrupt_ring_and_keeps_draining(tmp_path, caplog):
+    import logging
+    import socket
+
+    from backend.app.core.landing_page.plausible.shipper import _HEADER, _MSG_HEAD, _U32, _U64, _WRITE_POS, EventRing, shm_supported
+
+    if not shm_supported():
+        pytest.skip("shared-memory ring not supported on this platform")
+    upstream = CannedTransport({("POST", "/api/event"): TransportResponse(status_code=202)})
+    socket_path = str(tmp_path / "ship.sock")
+    shipper = EventShipper(make_client(upstream), socket_path, workers=1).start()
+    bad = EventRing.create(1 << 12)
+    # A record longer than push() ever writes.
+    _U32.pack_into(bad.buf, _HEADER, 1 << 20)
+    _U64.pack_into(bad.buf, _WRITE_POS, 8)
+    registrar = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    registrar.connect(socket_path)
+    name = bad.name.encode()
+    registrar.sendall(_MSG_HEAD.pack(b"R", len(name)) + name)
+    sink = ShipperSink(socket_path, use_shm=True, ring_size=1 << 16)
+    client = make_client(CannedTransport(), event_sink=sink)
+    try:
+        with caplog.at_level(logging.ERROR, logger="backend.app.core.landing_page.plausible.shipper"):
+            for i in range(20):
+                client.send_event(domain="dummy.site", name="pageview", url=f"https://dummy.site/{i}", user_agent="UA")
+            deadline = time.monotonic() + 5
+            while shipper.sent < 20 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        assert shipper.sent == 20
+        assert any("dropping event ring" in r.getMessage() for r in caplog.records)
+    finally:
+        sink.close()
+        registrar.close()
+        bad.close()
+        shipper.stop()
+
+
+def test_shipper_socket_is_private_and_attaches_only_event_rings(tmp_path):
+    import socket
+    import stat
+    from multiprocessing import shared_memory
+
+    from backend.app.core.landing_page.plausible.shipper import _MSG_HEAD, shm_supported
+
+    if not shm_supported():
+        pytest.skip("shared-memory ring not supported on this platform")
+    socket_path = str(tmp_path / "ship.sock")
+    shipper = EventShipper(make_client(CannedTransport()), socket_path, workers=1).start()
+    assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+    # An unrelated segment, and one with a ring-like name but no ring header.
+    segments = [
+        shared_memory.SharedMemory(name=f"unrelated-{os.getpid()}", create=True, size=4096),
+        shared_memory.SharedMemory(name=f"plausible-ring-{os.getpid()}-deadbeef", create=True, size=4096),
+    ]
+    try:
+        for segment in segments:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.connect(socket_path)
+            name = segment.name.encode()
+            conn.sendall(_MSG_HEAD.pack(b"R", len(name)) + name)
+            conn.settimeout(5)
+            assert conn.recv(1) == b""  # refused: the shipper hangs up
+            conn.close()
+    finally:
+        shipper.stop()
+    for segment in segments:
+        # Still there: the shipper neither attached nor unlinked them.
+        shared_memory.SharedMemory(name=segment.name).close()
+        segment.close()
+        segment.unlink()
+
+
+def test_loadgen_smoke_against_standin_server():
+    from backend.app.core.landing_page.plausible._bench.loadgen import client_operation, run_load
+    from backend.app.core.landing_page.plausible._bench.standin_server import FaultConfig, StandInServer
+
+    # Seeded: the fault rolls come in a fixed order whatever the thread interleaving.
+    with StandInServer(FaultConfig(p429=0.2, p5xx=0.2, retry_after_s=None, seed=7)) as standin:
+        client = PlausibleClient(
+            stats_api_key="loadgen",
+            sites_api_key="loadgen",
+            base_url=standin.url,
+            max_retries=3,
+            backoff_factor=0.01,
+            pool_maxsize=8,
+            pool_block=True,
+        )
+        try:
+            report = run_load(client_operation(client), rps=100, duration_s=0.5, concurrency=8)
+        finally:
+            client.close()
+        counts = standin.counts
+
+    throttled = sum(n for (_, status), n in counts.items() if status == 429)
+    server_errors = sum(n for (_, status), n in counts.items() if status >= 500)
+    succeeded = sum(n for (_, status), n in counts.items() if status < 300)
+    assert report.completed == report.scheduled == 50
+    assert throttled > 0 and server_errors > 0
+    # Every call got exactly one 2xx or ended on a fault after its retries ran out.
+    assert succeeded == report.outcomes.get("ok", 0)
+    failed = {name: n for name, n in report.outcomes.items() if name != "ok"}
+    assert all(name.endswith((":429", ":500", ":502", ":503", ":504")) for name in failed)
+    assert sum(counts.values()) >= report.completed + sum(failed.values()) * 3
+
+
+def test_query_stats_stream_yields_rows_across_chunk_boundaries():
+    body = {
+        "results": [{"metrics": [i, 1.5e-3 * i], "dimensions": [f"/página/{i}", None, True]} for i in range(500)],
+        "meta": {"imports_included": False},
+        "query": {"site_id": "dummy.site"},
+    }
+    raw = json.dumps(body, indent=1, ensure_ascii=False).encode("utf-8")
+    transport = CannedTransport({("POST", "/api/v2/query"): TransportResponse(content=raw)})
+    client = make_client(transport)
+
+    stream = client.query_stats_stream({"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "7d"}, chunk_size=7)
+    with pytest.raises(RuntimeError):
+        stream.meta
+    rows = []
+    for row in stream:
+        rows.append(row)
+        assert stream.bytes_read < len(raw)
+    assert rows == body["results"]
+    assert stream.meta == body["meta"] and stream.query == body["query"]
+
+
+def test_max_response_bytes_enforced_while_reading():
+    big = TransportResponse.from_json({"results": [{"metrics": [i], "dimensions": []} for i in range(10_000)], "meta": {}, "query": {}})
+    transport = CannedTransport({("POST", "/api/v2/query"): big})
+    query = {"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "7d"}
+
+    assert make_client(transport, max_response_bytes=len(big.content))._query_stats(query)["results"][-1]["metrics"] == [9999]
+    with pytest.raises(PlausibleResponseTooLargeError):
+        make_client(transport, max_response_bytes=50_000).query_stats(query)
+    with pytest.raises(PlausibleResponseTooLargeError):
+        list(make_client(transport, max_response_bytes=50_000).query_stats_stream(query))
+
+
+def test_slow_calls_hedged_within_budget():
+    delays = [0.001] * 10 + [1.0, 0.001, 0.3]
+    calls = []
+
+    def respond(call):
+        calls.append(call)
+        time.sleep(delays[len(calls) - 1])
+        return TransportResponse.from_json({"domain": "dummy.site", "attempt": len(calls)})
+
+    registry = MetricsRegistry()
+    hedger = Hedger(percentile=0.9, min_samples=10, min_delay_s=0.05, budget_fraction=1 / 600, rate_limit_per_hour=600)
+    client = make_client(CannedTransport({("GET", "/api/v1/sites/dummy.site"): respond}), metrics=registry, hedger=hedger)
+    for _ in range(10):
+        client.get_site(site_id="dummy.site")
+    assert hedger.delay_for("/api/v1/sites/{site_id}") == 0.05
+
+    started = time.perf_counter()
+    assert client.get_site(site_id="dummy.site")["attempt"] == 12
+    assert time.perf_counter() - started < 0.5
+    # The budget (1 hedge per hour) is spent: the next slow call is waited out.
+    assert client.get_site(site_id="dummy.site")["attempt"] == 13
+    assert len(calls) == 13
+
+    endpoint = "/api/v1/sites/{site_id}"
+    assert registry.counter_value("plausible_client_hedges_total", {"endpoint": endpoint, "outcome": "won"}) == 1
+    assert registry.counter_value("plausible_client_hedges_total", {"endpoint": endpoint, "outcome": "budget"}) == 1
+    hedger.close()
+
+
+def test_httpx_transport_retries_429_and_5xx_with_retry_after():
+    pytest.importorskip("httpx")
+    import http.server
+
+    from backend.app.core.landing_page.plausible import HTTPXTransport
+
+    statuses = [429, 503, 200]
+    seen = []
+
+    class Upstream(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            status = statuses.pop(0) if statuses else 502
+            seen.append((status, time.perf_counter()))
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    transport = HTTPXTransport(http2=False, max_retries=2, backoff_factor=0.01)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/api/v2/query"
+        assert transport.request("POST", url, json={"a": 1}).status_code == 200
+        assert [status for status, _ in seen] == [429, 503, 200]
+        assert seen[1][1] - seen[0][1] >= 0.9  # waited per Retry-After
+
+        # Retries exhausted: the last response is returned for the client to raise on.
+        seen.clear()
+        assert transport.request("POST", url, json={"a": 1}).status_code == 502
+        assert len(seen) == 3
+    finally:
+        transport.close()
+        server.shutdown()
+
+
+def test_httpx_streamed_responses_with_timing_sampled():
+    pytest.importorskip("httpx")
+    import http.server
+
+    from backend.app.core.landing_page.plausible import HTTPXTransport
+
+    raw = json.dumps({"results": [{"metrics": [i], "dimensions": [f"/{i}"]} for i in range(200)], "meta": {}, "query": {}}).encode()
+
+    class Upstream(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    transport = HTTPXTransport(http2=False, max_connections=1, max_retries=0)
+    client = make_client(
+        transport,
+        base_url=f"http://127.0.0.1:{server.server_port}",
+        timing_sample_rate=1.0,
+        max_response_bytes=len(raw),
+    )
+    query = {"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "7d"}
+    try:
+        # httpx only sets elapsed once a streamed body is read: the whole call counts as ttfb.
+        assert len(list(client.query_stats_stream(query))) == 200
+        call = timing.pop_last()
+        assert call is not None and "ttfb" in call.phases and not call.phases.get("download")
+        # With a single pooled connection, a leaked stream would block these calls.
+        for _ in range(3):
+            assert client.query_stats(query)["results"][-1]["metrics"] == [199]
+    finally:
+        transport.close()
+        server.shutdown()
+
+
+def test_dns_cache_resolves_once_per_ttl():
+    import http.server
+    import socket
+
+    class Upstream(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    lookups = []
+
+    def getaddrinfo(host, port, *args):
+        lookups.append(host)
+        return socket.getaddrinfo("127.0.0.1", port, *args)
+
+    dns = DNSCache(ttl_s=60, getaddrinfo=getaddrinfo)
+    transport = RequestsTransport(keep_alive=False, dns_cache=dns)
+    try:
+        for _ in range(3):
+            # A fresh connection per request (Connection: close), but one lookup.
+            assert transport.request("GET", f"http://plausible.test:{server.server_port}/").status_code == 204
+        assert lookups == ["plausible.test"]
+        dns.invalidate("plausible.test")
+        transport.request("GET", f"http://plausible.test:{server.server_port}/")
+        assert lookups == ["plausible.test"] * 2
+    finally:
+        transport.close()
+        server.shutdown()
+
+
+def test_dns_cache_tries_every_cached_address():
+    import http.server
+    import socket
+
+    import requests
+
+    class Upstream(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    addresses = ["127.0.0.2", "127.0.0.1"]  # nothing listens on 127.0.0.2
+
+    def getaddrinfo(host, port, *args):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port)) for address in addresses]
+
+    dns = DNSCache(ttl_s=60, getaddrinfo=getaddrinfo)
+    transport = RequestsTransport(keep_alive=False, dns_cache=dns, max_retries=0)
+    try:
+        assert transport.request("GET", f"http://plausible.test:{server.server_port}/").status_code == 204
+        assert dns.misses == 1
+
+        addresses.remove("127.0.0.1")
+        dns.clear()
+        with pytest.raises(requests.ConnectionError):
+            transport.request("GET", f"http://plausible.test:{server.server_port}/")
+        # All addresses failed: the entry is dropped so the next attempt resolves again.
+        with pytest.raises(requests.ConnectionError):
+            transport.request("GET", f"http://plausible.test:{server.server_port}/")
+        assert dns.misses == 3
+    finally:
+        transport.close()
+        server.shutdown()
+
+
+def test_compare_stats_runs_periods_concurrently_and_joins_rows():
+    periods = {
+        ("2024-03-04", "2024-03-10"): [
+            {"metrics": [120, 40.0], "dimensions": ["Estonia"]},
+            {"metrics": [30, 55.5], "dimensions": ["Latvia"]},
+            {"metrics": [5, 0.0], "dimensions": ["Finland"]},
+        ],
+        ("2024-02-26", "2024-03-03"): [
+            {"metrics": [100, 50.0], "dimensions": ["Estonia"]},
+            {"metrics": [0, 0.0], "dimensions": ["Latvia"]},
+        ],
+    }
+    served = []
+
+    def respond(request):
+        date_range = tuple(request["json"]["date_range"])
+        served.append(date_range)
+        time.sleep(0.2)
+        return TransportResponse.from_json({"results": periods[date_range], "meta": {}, "query": request["json"]})
+
+    client = make_client(CannedTransport({("POST", "/api/v2/query"): respond}), cache=MemoryCache(), cache_ttl_s=0)
+    query = {"site_id": "dummy.site", "metrics": ["visitors", "bounce_rate"], "date_range": "7d", "dimensions": ["visit:country_name"]}
+
+    started = time.perf_counter()
+    result = client.compare_stats(query, today=date(2024, 3, 11))
+    assert time.perf_counter() - started < 0.35
+    assert sorted(served) == sorted(periods)
+    assert result["comparison"]["previous_date_range"] == ["2024-02-26", "2024-03-03"]
+    estonia, latvia, finland = result["results"]
+    assert estonia["comparison"]["change"] == [20, -10.0]
+    assert estonia["comparison"]["percent_change"] == [20.0, -20.0]
+    assert latvia["comparison"]["percent_change"] == [None, None]
+    assert finland["comparison"] is None
+
+    # Both periods ended before today: cached for cache_closed_ttl_s despite cache_ttl_s=0.
+    client.compare_stats(query, today=date(2024, 3, 11))
+    assert len(served) == 2
+
+
+def test_compare_stats_aligns_time_buckets():
+    def respond(request):
+        first = date.fromisoformat(request["json"]["date_range"][0])
+        rows = [{"metrics": [first.month * 10 + i], "dimensions": [f"{first.year}-{first.month:02d}-{i + 1:02d}"]} for i in range(3)]
+        return TransportResponse.from_json({"results": rows, "meta": {}, "query": {}})
+
+    client = make_client(CannedTransport({("POST", "/api/v2/query"): respond}))
+    result = client.compare_stats(
+        {"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "month", "dimensions": ["time:day"]},
+        today=date(2024, 3, 15),
+    )
+
+    assert result["comparison"]["previous_date_range"] == ["2024-02-01", "2024-02-29"]
+    assert [row["comparison"]["dimensions"] for row in result["results"]] == [["2024-02-01"], ["2024-02-02"], ["2024-02-03"]]
+    assert [row["comparison"]["change"] for row in result["results"]] == [[10], [10], [10]]
+    with pytest.raises(PlausibleQueryValidationError):
+        client.compare_stats({"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "all"})
+
+
+def test_compare_stats_aligns_sparse_auto_time_buckets():
+    # Empty buckets are omitted upstream; rows must still pair by position in the period.
+    periods = {
+        "2024-03-01": [("2024-03-01", 5), ("2024-03-03", 7)],
+        "2024-02-01": [("2024-02-02", 1), ("2024-02-03", 2)],
+        "2024-01-01": [("2024-01-01", 3), ("2024-03-01", 4)],
+        "2023-07-01": [("2023-08-01", 6), ("2023-09-01", 8)],
+    }
+
+    def respond(request):
+        rows = [{"metrics": [v], "dimensions": [d]} for d, v in periods[request["json"]["date_range"][0]]]
+        return TransportResponse.from_json({"results": rows, "meta": {}, "query": {}})
+
+    client = make_client(CannedTransport({("POST", "/api/v2/query"): respond}))
+    by_day = client.compare_stats(
+        {"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "month", "dimensions": ["time"]},
+        today=date(2024, 3, 15),
+    )
+    assert [row["comparison"] and row["comparison"]["dimensions"] for row in by_day["results"]] == [None, ["2024-02-03"]]
+
+    by_month = client.compare_stats(
+        {"site_id": "dummy.site", "metrics": ["visitors"], "date_range": ["2024-01-01", "2024-06-30"], "dimensions": ["time"]},
+        today=date(2024, 7, 15),
+    )
+    assert [row["comparison"] and row["comparison"]["dimensions"] for row in by_month["results"]] == [None, ["2023-09-01"]]
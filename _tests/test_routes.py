@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import http.server
+import threading
+
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
-from backend.app.core.landing_page.plausible.api import router
+from backend.app.core.landing_page.plausible import config
+from backend.app.core.landing_page.plausible.api import plausible_lifespan, router
 from backend.app.core.landing_page.plausible.api.deps import get_client
 from backend.app.core.landing_page.plausible.api.exceptions import register_exception_handlers
 
@@ -12,6 +16,10 @@ class FakePlausibleClient:
     def query_stats(self, query: dict):
         return {"results": [{"metrics": [1], "dimensions": []}], "meta": {}, "query": query}
 
+    def compare_stats(self, query: dict, **kwargs):
+        row = {"metrics": [2], "dimensions": [], "comparison": {"dimensions": [], "metrics": [1], "change": [1], "percent_change": [100.0]}}
+        return {"results": [row], "meta": {}, "query": query, "comparison": {"mode": kwargs["compare"]}}
+
     def send_event(self, **kwargs):
         return {}
 
@@ -76,6 +84,19 @@ def test_stats_query():
     assert data["results"][0]["metrics"] == [1]
 
 
+def test_stats_compare():
+    client = TestClient(create_app())
+    resp = client.post(
+        "/plausible/stats/compare",
+        json={"site_id": "dummy.site", "metrics": ["visitors"], "date_range": "7d", "compare": "year_over_year"},
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["results"][0]["comparison"]["percent_change"] == [100.0]
+    assert data["comparison"]["mode"] == "year_over_year"
+    assert "compare" not in data["query"]
+
+
 def test_send_event():
     app = create_app()
     client = TestClient(app)
@@ -103,3 +124,71 @@ def test_sites_list_and_get():
     r2 = client.get("/plausible/sites/test-domain.com")
     assert r2.status_code == 200
     assert r2.json()["data"]["domain"] == "test-domain.com"
+
+
+def test_metrics_endpoint():
+    app = create_app()
+    client = TestClient(app)
+
+    resp = client.get("/plausible/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+
+
+def test_metrics_endpoint_requires_configured_token(monkeypatch):
+    monkeypatch.setenv("PLAUSIBLE_METRICS_TOKEN", "scrape-secret")
+    config.get_settings.cache_clear()
+    try:
+        client = TestClient(create_app())
+        assert client.get("/plausible/metrics").status_code == 401
+        assert client.get("/plausible/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+        assert client.get("/plausible/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+    finally:
+        config.get_settings.cache_clear()
+
+
+def test_lifespan_shares_prewarmed_client(monkeypatch):
+    connections = []
+
+    class Upstream(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            connections.append(self.client_address)
+
+        def do_GET(self):
+            body = b'{"domain": "dummy.site", "timezone": "Etc/UTC"}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("PLAUSIBLE_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setenv("PLAUSIBLE_SITES_API_KEY", "sites-key")
+    monkeypatch.setenv("PLAUSIBLE_WARM_CONNECTIONS", "2")
+    config.get_settings.cache_clear()
+
+    app = FastAPI(lifespan=plausible_lifespan)
+    register_exception_handlers(app)
+    app.include_router(router)
+    try:
+        with TestClient(app) as client:
+            resources = app.state.plausible
+            assert resources.warmed_connections == 2
+            for _ in range(3):
+                assert client.get("/plausible/sites/dummy.site").json()["data"]["domain"] == "dummy.site"
+            # Sequential requests reuse the connections opened at startup.
+            assert len(connections) == 2
+        assert not hasattr(app.state, "plausible")
+        for getter in (config.get_dns_cache, config.get_deduplicator, config.get_hot_queries, config.get_cache):
+            assert getter.cache_info().currsize == 0
+    finally:
+        server.shutdown()
+        config.get_settings.cache_clear()
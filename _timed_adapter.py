@@ -0,0 +1,117 @@
+"""
+urllib3/requests adapter whose connections record TCP connect and TLS handshake
+durations into timing.current() and can resolve hosts through a DNSCache.
+Imported lazily by RequestsTransport.
+"""
+from __future__ import annotations
+
+import time
+import functools
+from typing import Any, Optional
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError
+
+from . import timing
+from .resolver import DNSCache
+
+
+class _TimedConnectionMixin:
+    """
+    Records TCP connect and TLS handshake durations into the current CallTiming.
+    With a dns_cache the socket is opened to the cached address; the host name is
+    still used for SNI, certificate checks and the Host header.
+    """
+
+    _tcp_s = 0.0
+    dns_cache: Optional[DNSCache] = None
+
+    def _new_conn(self):  # type: ignore[no-untyped-def]
+        started = time.perf_counter()
+        if self.dns_cache is None:
+            sock = super()._new_conn()  # type: ignore[misc]
+        else:
+            sock = self._new_conn_cached(self.dns_cache)
+        self._tcp_s = time.perf_counter() - started
+        return sock
+
+    def _new_conn_cached(self, dns_cache: DNSCache):  # type: ignore[no-untyped-def]
+        host = self._dns_host  # type: ignore[has-type]
+        try:
+            addresses = dns_cache.resolve(host, self.port)  # type: ignore[attr-defined]
+        except OSError as exc:
+            raise NameResolutionError(host, self, exc) from exc  # type: ignore[arg-type]
+        # Like socket.create_connection, try each address in turn and fail only when
+        # all of them do. `host` is derived from _dns_host, so swap it around each connect.
+        error: Optional[ConnectTimeoutError] = None
+        for address in addresses:
+            self._dns_host = address
+            try:
+                return super()._new_conn()  # type: ignore[misc]
+            except ConnectTimeoutError as exc:  # NewConnectionError is a subclass
+                error = exc
+            finally:
+                self._dns_host = host
+        dns_cache.invalidate(host, self.port)  # type: ignore[attr-defined]
+        assert error is not None
+        raise error
+
+    def connect(self) -> None:
+        call = timing.current()
+        if call is None:
+            super().connect()  # type: ignore[misc]
+            return
+        started = time.perf_counter()
+        super().connect()  # type: ignore[misc]
+        total = time.perf_counter() - started
+        call.add("connect", self._tcp_s)
+        if isinstance(self, HTTPSConnection):
+            call.add("tls", total - self._tcp_s)
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _DNSCachePoolMixin:
+    """Hands the adapter's DNSCache to every connection the pool creates."""
+
+    def __init__(self, *args: Any, dns_cache: Optional[DNSCache] = None, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)  # type: ignore[call-arg]
+        self.dns_cache = dns_cache
+
+    def _new_conn(self):  # type: ignore[no-untyped-def]
+        conn = super()._new_conn()  # type: ignore[misc]
+        conn.dns_cache = self.dns_cache
+        return conn
+
+
+class _TimedHTTPConnectionPool(_DNSCachePoolMixin, HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(_DNSCachePoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def __init__(self, *args: Any, dns_cache: Optional[DNSCache] = None, **kwargs: Any) -> None:
+        # Set before HTTPAdapter.__init__, which calls init_poolmanager().
+        self.dns_cache = dns_cache
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        # PoolManager calls pool_cls(host, port, **context); a partial adds the cache.
+        # (getattr: HTTPAdapter.__setstate__ re-runs this without calling __init__.)
+        dns_cache = getattr(self, "dns_cache", None)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": functools.partial(_TimedHTTPConnectionPool, dns_cache=dns_cache),
+            "https": functools.partial(_TimedHTTPSConnectionPool, dns_cache=dns_cache),
+        }
@@ -1,3 +1,24 @@
-from .routes import router
+from __future__ import annotations
 
-__all__ = ["router"]
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .lifespan import plausible_lifespan
+    from .routes import router
+
+__all__ = ["router", "plausible_lifespan"]
+
+
+def __getattr__(name: str) -> Any:
+    # FastAPI and the pydantic models are only imported when the router is requested.
+    if name == "router":
+        from .routes import router
+
+        globals()["router"] = router
+        return router
+    if name == "plausible_lifespan":
+        from .lifespan import plausible_lifespan
+
+        globals()["plausible_lifespan"] = plausible_lifespan
+        return plausible_lifespan
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
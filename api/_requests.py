@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -18,6 +18,11 @@ class StatsQueryRequest(BaseModel):
     pagination: Optional[Dict[str, int]] = None
 
 
+class StatsCompareRequest(StatsQueryRequest):
+    compare: Literal["previous_period", "year_over_year"] = "previous_period"
+    timezone: Optional[str] = Field(None, description="Site timezone (IANA) named date ranges are resolved in; UTC if unset")
+
+
 # ---------
 # Events API
 # ---------
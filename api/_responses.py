@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -15,6 +15,25 @@ class StatsResponse(BaseModel):
     query: dict
 
 
+class StatsComparison(BaseModel):
+    dimensions: List[Any]
+    metrics: List[Any]
+    change: List[Any]
+    percent_change: List[Optional[float]]
+
+
+class ComparedStatsRow(StatsRow):
+    comparison: Optional[StatsComparison] = None
+
+
+class StatsCompareResponse(BaseModel):
+    results: List[ComparedStatsRow]
+    meta: dict
+    query: dict
+    comparison: dict
+
+
 class GenericResponse(BaseModel):
     ok: bool = True
     data: Optional[Any] = None
+    timing: Optional[Dict[str, float]] = None  # phase durations in ms, debug events only
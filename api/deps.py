@@ -1,20 +1,35 @@
 from __future__ import annotations
 
+import hmac
 from typing import Optional
-from fastapi import Depends, Header, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Request, status
 
 from backend.app.core.landing_page.plausible import PlausibleClient
-from .config import get_client as get_default_client
+from backend.app.core.landing_page.plausible.client import DEFAULT_BASE_URL
+from backend.app.core.landing_page.plausible.transport import Transport
+from ..config import (
+    get_batcher,
+    get_client as get_default_client,
+    get_deduplicator,
+    get_dns_cache,
+    get_event_sink,
+    get_hedger,
+    get_metrics,
+    get_settings,
+)
 
 
-def get_client(authorization: Optional[str] = Header(None)) -> PlausibleClient:
+def get_client(request: Request, authorization: Optional[str] = Header(None)) -> PlausibleClient:
     """
     Provide a PlausibleClient.
     - If Authorization: Bearer <token> is provided, use it for both stats and sites.
     - Otherwise, return the default client configured from env via config.get_client().
+    - With api.lifespan.plausible_lifespan registered, the default client is the one
+      created at startup, and bearer-token clients reuse its transport (connection pool).
     """
+    resources = getattr(request.app.state, "plausible", None)
     if not authorization:
-        return get_default_client()
+        return resources.client if resources is not None else get_default_client()
 
     parts = authorization.split()
     if len(parts) != 2 or parts[0].lower() != "bearer":
@@ -23,4 +38,38 @@ def get_client(authorization: Optional[str] = Header(None)) -> PlausibleClient:
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Empty bearer token")
 
-    return PlausibleClient(stats_api_key=token, sites_api_key=token)
+    return token_client(token, transport=resources.client.transport if resources is not None else None)
+
+
+def require_metrics_token(authorization: Optional[str] = Header(None)) -> None:
+    """
+    Guard for the metrics route: with PLAUSIBLE_METRICS_TOKEN set, require
+    Authorization: Bearer <that token>. Unset, the route is served to anyone who can
+    reach it (internal-only mounts).
+    """
+    expected = get_settings().metrics_token
+    if not expected:
+        return
+    parts = (authorization or "").split()
+    if len(parts) != 2 or parts[0].lower() != "bearer" or not hmac.compare_digest(parts[1].encode(), expected.encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+
+
+def token_client(token: str, *, transport: Optional[Transport] = None) -> PlausibleClient:
+    # No shared stats cache here: cached results are not keyed by token.
+    # A shared transport is owned by the lifespan; these clients are never closed.
+    return PlausibleClient(
+        stats_api_key=token,
+        sites_api_key=token,
+        transport=transport,
+        metrics=get_metrics(),
+        timing_sample_rate=get_settings().timing_sample_rate,
+        validate_queries=get_settings().validate_queries,
+        combine_window_s=get_settings().combine_window_s,
+        batcher=get_batcher(DEFAULT_BASE_URL, token),
+        deduplicator=get_deduplicator(),
+        event_sink=get_event_sink(),
+        max_response_bytes=get_settings().max_response_bytes,
+        hedger=get_hedger(),
+        dns_cache=get_dns_cache(),
+    )
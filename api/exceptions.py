@@ -6,7 +6,9 @@ from fastapi.responses import JSONResponse
 from backend.app.core.landing_page.plausible import (
     PlausibleAPIError,
     PlausibleAuthError,
+    PlausibleQueryValidationError,
     PlausibleRateLimitError,
+    PlausibleResponseTooLargeError,
 )
 
 
@@ -31,6 +33,27 @@ def register_exception_handlers(app: FastAPI) -> None:
             },
         )
 
+    @app.exception_handler(PlausibleQueryValidationError)
+    async def handle_query_validation_error(_: Request, exc: PlausibleQueryValidationError):
+        return JSONResponse(
+            status_code=422,
+            content={
+                "error": "plausible_invalid_query",
+                "message": str(exc),
+                "details": [issue.as_dict() if hasattr(issue, "as_dict") else issue for issue in exc.issues],
+            },
+        )
+
+    @app.exception_handler(PlausibleResponseTooLargeError)
+    async def handle_response_too_large(_: Request, exc: PlausibleResponseTooLargeError):
+        return JSONResponse(
+            status_code=502,
+            content={
+                "error": "plausible_response_too_large",
+                "message": str(exc),
+            },
+        )
+
     @app.exception_handler(PlausibleAPIError)
     async def handle_api_error(_: Request, exc: PlausibleAPIError):
         return JSONResponse(
@@ -1,10 +1,15 @@
 from __future__ import annotations
 
-from fastapi import Query
+from typing import Optional
+
+from fastapi import Query, Response
 
 from backend.app.core.landing_page.plausible import PlausibleClient
+from backend.app.core.landing_page.plausible.metrics import default_registry
+from backend.app.core.landing_page.plausible.timing import CallTiming
 from ._requests import (
     StatsQueryRequest,
+    StatsCompareRequest,
     EventRequest,
     CreateSiteRequest,
     UpdateSiteDomainRequest,
@@ -23,6 +28,16 @@ def handle_stats_query(payload: StatsQueryRequest, client: PlausibleClient):
     return result
 
 
+def handle_stats_compare(payload: StatsCompareRequest, client: PlausibleClient):
+    query = payload.model_dump(exclude_none=True, exclude={"compare", "timezone"})
+    return client.compare_stats(query, compare=payload.compare, timezone=payload.timezone)
+
+
+def apply_server_timing(response: Response, call: Optional[CallTiming]) -> None:
+    if call is not None and call.phases:
+        response.headers["Server-Timing"] = call.server_timing()
+
+
 # ---------
 # Events API
 # ---------
@@ -102,3 +117,11 @@ def handle_put_guest(payload: PutGuestRequest, client: PlausibleClient):
 
 def handle_delete_guest(email: str, client: PlausibleClient):
     return client.delete_guest(email=email)
+
+
+# ---------
+# Metrics
+# ---------
+
+def handle_metrics() -> str:
+    return default_registry().render_prometheus()
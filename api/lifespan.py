@@ -0,0 +1,90 @@
+"""
+FastAPI lifespan creating the Plausible client once per process instead of per request.
+
+    app = FastAPI(lifespan=plausible_lifespan)
+
+or, inside an existing lifespan:
+
+    async with plausible_lifespan(app):
+        yield
+
+At startup the default client and its transport are built (with the DNS cache) and
+PLAUSIBLE_WARM_CONNECTIONS connections to the upstream host are opened, so the first
+requests skip DNS, TCP and TLS setup. The Prewarmer runs when hot-query learning is on.
+At shutdown background work is drained for up to PLAUSIBLE_SHUTDOWN_TIMEOUT_S and
+connections, the event sink and the cache are closed.
+"""
+from __future__ import annotations
+
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+
+from backend.app.core.landing_page.plausible import PlausibleClient, Prewarmer
+from .. import config
+
+
+class PlausibleResources:
+    """Process-wide objects owned by the lifespan, kept on app.state.plausible."""
+
+    def __init__(self, client: PlausibleClient, *, prewarmer: Optional[Prewarmer] = None) -> None:
+        self.client = client
+        self.prewarmer = prewarmer
+        self.warmed_connections = 0
+
+    @classmethod
+    def start(cls, settings: Optional[config.PlausibleSettings] = None) -> "PlausibleResources":
+        settings = settings or config.get_settings()
+        client = config.get_client()
+        prewarmer = None
+        if client.cache is not None and client.hot_queries is not None:
+            prewarmer = Prewarmer(client).start()
+        resources = cls(client, prewarmer=prewarmer)
+        if settings.warm_connections > 0:
+            try:
+                resources.warmed_connections = client.transport.warm(client.base_url, settings.warm_connections)
+            except Exception:
+                # Warming is best effort; requests open connections on demand as before.
+                pass
+        return resources
+
+    def close(self, timeout_s: float = 5.0) -> None:
+        deadline = time.monotonic() + timeout_s
+        if self.prewarmer is not None:
+            self.prewarmer.stop(timeout_s)
+        # Let in-flight stale-while-revalidate refreshes finish writing to the cache.
+        self.client.wait_for_refreshes(max(0.0, deadline - time.monotonic()))
+        hedger, sink, cache = config.get_hedger(), config.get_event_sink(), config.get_cache()
+        if hedger is not None:
+            hedger.close()
+        if sink is not None:
+            sink.close()
+        self.client.close()
+        if cache is not None:
+            cache.close()
+        # A restarted app (e.g. in tests) gets fresh instances rather than closed or
+        # stale ones (DNS entries, dedup windows, hot-query counts).
+        for getter in (
+            config.get_hedger,
+            config.get_event_sink,
+            config.get_cache,
+            config.get_dns_cache,
+            config.get_deduplicator,
+            config.get_hot_queries,
+        ):
+            getter.cache_clear()
+
+
+@asynccontextmanager
+async def plausible_lifespan(app: FastAPI) -> AsyncIterator[None]:
+    settings = config.get_settings()
+    resources = await run_in_threadpool(PlausibleResources.start, settings)
+    app.state.plausible = resources
+    try:
+        yield
+    finally:
+        del app.state.plausible
+        await run_in_threadpool(resources.close, settings.shutdown_timeout_s)
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Query
+import time
+
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import PlainTextResponse
 from typing import Any, Dict
 
-from backend.app.core.landing_page.plausible import PlausibleClient
-from .deps import get_client
+from backend.app.core.landing_page.plausible import PlausibleClient, timing
+from .deps import get_client, require_metrics_token
 from ._requests import (
     StatsQueryRequest,
+    StatsCompareRequest,
     EventRequest,
     CreateSiteRequest,
     UpdateSiteDomainRequest,
@@ -14,9 +18,11 @@ from ._requests import (
     PutGoalRequest,
     PutGuestRequest,
 )
-from ._responses import StatsResponse, GenericResponse
+from ._responses import StatsResponse, StatsCompareResponse, GenericResponse
 from .handlers import (
+    apply_server_timing,
     handle_stats_query,
+    handle_stats_compare,
     handle_send_event,
     handle_list_sites,
     handle_list_teams,
@@ -31,26 +37,47 @@ from .handlers import (
     handle_list_guests,
     handle_put_guest,
     handle_delete_guest,
+    handle_metrics,
 )
 
 router = APIRouter(prefix="/plausible", tags=["plausible"])
 
+# Routes calling the client are plain `def` so FastAPI runs them in its threadpool:
+# the client blocks (HTTP, query combining, retries) and must not stall the event loop.
+
 
 # ---------
 # Stats API
 # ---------
 @router.post("/stats/query", response_model=StatsResponse)
-async def stats_query(payload: StatsQueryRequest, client: PlausibleClient = Depends(get_client)):
+def stats_query(payload: StatsQueryRequest, response: Response, client: PlausibleClient = Depends(get_client)):
+    timing.pop_last()
     result = handle_stats_query(payload, client)
-    return StatsResponse(**result)
+    call = timing.pop_last()
+    started = time.perf_counter()
+    body = StatsResponse(**result)
+    if call is not None:
+        call.add("validate", time.perf_counter() - started)
+        apply_server_timing(response, call)
+    return body
+
+
+@router.post("/stats/compare", response_model=StatsCompareResponse)
+def stats_compare(payload: StatsCompareRequest, client: PlausibleClient = Depends(get_client)):
+    return StatsCompareResponse(**handle_stats_compare(payload, client))
 
 
 # ---------
 # Events API
 # ---------
 @router.post("/events", response_model=GenericResponse)
-async def send_event(payload: EventRequest, client: PlausibleClient = Depends(get_client)):
+def send_event(payload: EventRequest, response: Response, client: PlausibleClient = Depends(get_client)):
+    timing.pop_last()
     data = handle_send_event(payload, client)
+    call = timing.pop_last()
+    apply_server_timing(response, call)
+    if payload.debug and call is not None:
+        return GenericResponse(ok=True, data=data, timing=call.as_ms())
     return GenericResponse(ok=True, data=data)
 
 
@@ -58,65 +85,73 @@ async def send_event(payload: EventRequest, client: PlausibleClient = Depends(ge
 # Sites API
 # ---------
 @router.get("/sites", response_model=GenericResponse)
-async def list_sites(client: PlausibleClient = Depends(get_client)):
+def list_sites(client: PlausibleClient = Depends(get_client)):
     return GenericResponse(ok=True, data=handle_list_sites(client))
 
 
 @router.get("/sites/teams", response_model=GenericResponse)
-async def list_teams(client: PlausibleClient = Depends(get_client)):
+def list_teams(client: PlausibleClient = Depends(get_client)):
     return GenericResponse(ok=True, data=handle_list_teams(client))
 
 
 @router.post("/sites", response_model=GenericResponse)
-async def create_site(payload: CreateSiteRequest, client: PlausibleClient = Depends(get_client)):
+def create_site(payload: CreateSiteRequest, client: PlausibleClient = Depends(get_client)):
     return GenericResponse(ok=True, data=handle_create_site(payload, client))
 
 
 @router.put("/sites/{site_id}", response_model=GenericResponse)
-async def update_site(site_id: str, payload: UpdateSiteDomainRequest, client: PlausibleClient = Depends(get_client)):
+def update_site(site_id: str, payload: UpdateSiteDomainRequest, client: PlausibleClient = Depends(get_client)):
     return GenericResponse(ok=True, data=handle_update_site(site_id, payload, client))
 
 
 @router.delete("/sites/{site_id}", response_model=GenericResponse)
-async def delete_site(site_id: str, client: PlausibleClient = Depends(get_client)):
+def delete_site(site_id: str, client: PlausibleClient = Depends(get_client)):
     return GenericResponse(ok=True, data=handle_delete_site(site_id, client))
 
 
 @router.get("/sites/{site_id}", response_model=GenericResponse)
-async def get_site(site_id: str, client: PlausibleClient = Depends(get_client)):
+def get_site(site_id: str, client: PlausibleClient = Depends(get_client)):
     return GenericResponse(ok=True, data=handle_get_site(site_id, client))
 
 
 @router.put("/sites/shared-links", response_model=GenericResponse)
-async def put_shared_link(payload: SharedLinkRequest, client: PlausibleClient = Depends(get_client)):
+def put_shared_link(payload: SharedLinkRequest, client: PlausibleClient = Depends(get_client)):
     return GenericResponse(ok=True, data=handle_put_shared_link(payload, client))
 
 
 @router.get("/sites/{site_id}/goals", response_model=GenericResponse)
-async def list_goals(site_id: str, client: PlausibleClient = Depends(get_client)):
+def list_goals(site_id: str, client: PlausibleClient = Depends(get_client)):
     return GenericResponse(ok=True, data=handle_list_goals(site_id, client))
 
 
 @router.put("/sites/goals", response_model=GenericResponse)
-async def put_goal(payload: PutGoalRequest, client: PlausibleClient = Depends(get_client)):
+def put_goal(payload: PutGoalRequest, client: PlausibleClient = Depends(get_client)):
     return GenericResponse(ok=True, data=handle_put_goal(payload, client))
 
 
 @router.delete("/sites/goals/{goal_id}", response_model=GenericResponse)
-async def delete_goal(goal_id: str, site_id: str = Query(...), client: PlausibleClient = Depends(get_client)):
+def delete_goal(goal_id: str, site_id: str = Query(...), client: PlausibleClient = Depends(get_client)):
     return GenericResponse(ok=True, data=handle_delete_goal(goal_id, site_id, client))
 
 
 @router.get("/sites/{site_id}/guests", response_model=GenericResponse)
-async def list_guests(site_id: str, client: PlausibleClient = Depends(get_client)):
+def list_guests(site_id: str, client: PlausibleClient = Depends(get_client)):
     return GenericResponse(ok=True, data=handle_list_guests(site_id, client))
 
 
 @router.put("/sites/guests", response_model=GenericResponse)
-async def put_guest(payload: PutGuestRequest, client: PlausibleClient = Depends(get_client)):
+def put_guest(payload: PutGuestRequest, client: PlausibleClient = Depends(get_client)):
     return GenericResponse(ok=True, data=handle_put_guest(payload, client))
 
 
 @router.delete("/sites/guests/{email}", response_model=GenericResponse)
-async def delete_guest(email: str, client: PlausibleClient = Depends(get_client)):
+def delete_guest(email: str, client: PlausibleClient = Depends(get_client)):
     return GenericResponse(ok=True, data=handle_delete_guest(email, client))
+
+
+# ---------
+# Metrics
+# ---------
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_token)])
+async def metrics():
+    return PlainTextResponse(handle_metrics(), media_type="text/plain; version=0.0.4")
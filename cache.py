@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Set
+
+if TYPE_CHECKING:
+    from .metrics import MetricsRegistry
+
+
+def describe_metrics(registry: MetricsRegistry) -> None:
+    registry.describe("plausible_cache_lookups_total", "Stats cache lookups by result (fresh, stale, miss).")
+    registry.describe("plausible_cache_stale_age_seconds", "Age of stale cache entries served while revalidating.")
+    registry.describe("plausible_cache_refreshes_total", "Stats cache refreshes by source (miss, revalidate, prewarm) and outcome.")
+    registry.describe("plausible_cache_refresh_seconds", "Duration of stats cache refreshes by source.")
+
+
+def cache_key(query: Any) -> str:
+    """Canonical key for a stats query: key order and whitespace do not matter."""
+    return json.dumps(query, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class CacheEntry:
+    """
+    A cached stats result.
+
+    stored_at / expires_at are wall-clock timestamps (time.time()) so entries stay
+    meaningful across processes. Past expires_at the entry is stale; backends drop
+    it once it is older than expires_at + the stale_s it was stored with.
+    """
+
+    __slots__ = ("value", "stored_at", "expires_at")
+
+    def __init__(self, value: Dict[str, Any], stored_at: float, expires_at: float) -> None:
+        self.value = value
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (time.time() if now is None else now) < self.expires_at
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (time.time() if now is None else now) - self.stored_at
+
+    def __repr__(self) -> str:
+        return f"CacheEntry(stored_at={self.stored_at!r}, expires_at={self.expires_at!r})"
+
+
+class CacheBackend:
+    """
+    Storage for query_stats results keyed by cache_key(query).
+
+    get() returns entries that are fresh or still within their stale window, or None.
+    Implementations must be thread-safe.
+
+    claim_refresh() / release_refresh() coordinate refreshes: every client sharing
+    the backend sees the same claims, so a stale or missing key is fetched once, not
+    once per caller; wait_refresh() lets the others wait for that fetch. The default
+    claims are in-process.
+    """
+
+    def __init__(self) -> None:
+        self._refreshing: Set[str] = set()
+        self._refreshing_lock = threading.Condition()
+
+    def claim_refresh(self, key: str) -> bool:
+        """Mark key as being refreshed; False if a refresh for it is already in flight."""
+        with self._refreshing_lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def release_refresh(self, key: str) -> None:
+        with self._refreshing_lock:
+            self._refreshing.discard(key)
+            self._refreshing_lock.notify_all()
+
+    def wait_refresh(self, key: str, timeout_s: Optional[float] = None) -> bool:
+        """Block until key is no longer claimed; False if timeout_s passed first."""
+        with self._refreshing_lock:
+            return self._refreshing_lock.wait_for(lambda: key not in self._refreshing, timeout_s)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Dict[str, Any], *, ttl_s: float, stale_s: float = 0.0) -> CacheEntry:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache bounded by entry count."""
+
+    def __init__(self, *, max_entries: int = 1024) -> None:
+        super().__init__()
+        if max_entries <= 0:
+            raise ValueError("max_entries must be > 0")
+        self.max_entries = max_entries
+        # key -> (entry, dead_at)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            entry, dead_at = item
+            if time.time() >= dead_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Dict[str, Any], *, ttl_s: float, stale_s: float = 0.0) -> CacheEntry:
+        now = time.time()
+        entry = CacheEntry(value, now, now + ttl_s)
+        with self._lock:
+            self._entries[key] = (entry, entry.expires_at + stale_s)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stats_cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    dead_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stats_cache_accessed ON stats_cache (accessed_at);
+CREATE INDEX IF NOT EXISTS stats_cache_dead ON stats_cache (dead_at);
+"""
+
+
+def encode_value(value: Dict[str, Any], level: int = 6) -> bytes:
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"), level)
+
+
+def decode_value(blob: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(blob))
+
+
+class SQLiteCache(CacheBackend):
+    """
+    On-disk cache in a single SQLite file (WAL mode), shared by every process on the host.
+
+    - Values are zlib-compressed compact JSON.
+    - Total stored bytes are kept under max_bytes: every evict_every writes, dead
+      entries are dropped, then least recently read ones until under 90% of max_bytes.
+    - Last-read times are updated at most every touch_interval_s per entry, so
+      reads do not turn into a write each.
+    - Connections are checked out of a pool of at most pool_size idle connections,
+      so short-lived threads (revalidation, comparisons) do not each keep one open.
+      The pool is dropped (not closed) after fork.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        max_bytes: int = 64 * 1024 * 1024,
+        evict_every: int = 32,
+        touch_interval_s: float = 60.0,
+        compress_level: int = 6,
+        busy_timeout_s: float = 5.0,
+        pool_size: int = 4,
+    ) -> None:
+        super().__init__()
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be > 0")
+        if pool_size <= 0:
+            raise ValueError("pool_size must be > 0")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evict_every = max(1, evict_every)
+        self.touch_interval_s = touch_interval_s
+        self.compress_level = compress_level
+        self.busy_timeout_s = busy_timeout_s
+        self.pool_size = pool_size
+        self._idle: List[sqlite3.Connection] = []
+        self._pool_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._writes = 0
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_s, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        pid = os.getpid()
+        conn = None
+        with self._pool_lock:
+            if self._pid != pid:
+                # Inherited across fork: never touch the parent's handles.
+                self._idle = []
+                self._pid = pid
+            if self._idle:
+                conn = self._idle.pop()
+        if conn is None:
+            conn = self._open()
+        try:
+            yield conn
+        finally:
+            with self._pool_lock:
+                if self._pid == pid and len(self._idle) < self.pool_size:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT value, stored_at, expires_at, dead_at, accessed_at FROM stats_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            blob, stored_at, expires_at, dead_at, accessed_at = row
+            now = time.time()
+            if now >= dead_at:
+                conn.execute("DELETE FROM stats_cache WHERE key = ? AND dead_at <= ?", (key, now))
+                return None
+            if now - accessed_at >= self.touch_interval_s:
+                conn.execute("UPDATE stats_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return CacheEntry(decode_value(blob), stored_at, expires_at)
+
+    def set(self, key: str, value: Dict[str, Any], *, ttl_s: float, stale_s: float = 0.0) -> CacheEntry:
+        blob = encode_value(value, self.compress_level)
+        now = time.time()
+        entry = CacheEntry(value, now, now + ttl_s)
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO stats_cache (key, value, size, stored_at, expires_at, dead_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, blob, len(blob) + len(key), now, entry.expires_at, entry.expires_at + stale_s, now),
+            )
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self.evict()
+        return entry
+
+    def delete(self, key: str) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM stats_cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM stats_cache")
+
+    def evict(self) -> int:
+        """Drop dead entries, then LRU entries while over max_bytes. Returns rows removed."""
+        with self._connection() as conn:
+            removed = conn.execute("DELETE FROM stats_cache WHERE dead_at <= ?", (time.time(),)).rowcount
+            if _size_bytes(conn) <= self.max_bytes:
+                return removed
+            target = int(self.max_bytes * 0.9)
+            doomed = []
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                total = _size_bytes(conn)
+                for key, size in conn.execute("SELECT key, size FROM stats_cache ORDER BY accessed_at"):
+                    if total <= target:
+                        break
+                    doomed.append((key,))
+                    total -= size
+                conn.executemany("DELETE FROM stats_cache WHERE key = ?", doomed)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return removed + len(doomed)
+
+    def size_bytes(self) -> int:
+        with self._connection() as conn:
+            return _size_bytes(conn)
+
+    def __len__(self) -> int:
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM stats_cache").fetchone()[0]
+
+    @property
+    def idle_connections(self) -> int:
+        return len(self._idle)
+
+    def close(self) -> None:
+        """Close idle connections; ones in use are closed when returned past pool_size."""
+        with self._pool_lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def _size_bytes(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COALESCE(SUM(size), 0) FROM stats_cache").fetchone()[0]
@@ -1,20 +1,40 @@
 from __future__ import annotations
 
+import functools
 import os
+import threading
 import time
-from typing import Any, Dict, Iterable, Optional
-
-import requests
-from requests import Response, Session
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
+from datetime import date
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
 
 from .errors import (
     PlausibleAPIError,
     PlausibleAuthError,
     PlausibleRateLimitError,
 )
+from .events import Event, EventEncoder
+from . import timing
 from .rate_limiter import RateLimiter
+from .timing import TimingSampler
+from .transport import HTTPXTransport, RequestsTransport, Transport
+
+# Feature modules (combining, caching, comparison, streaming, validation, metrics) are
+# imported where they are used, so `import plausible` and constructing a plain client
+# stay cheap; each is loaded once by the first call that needs it.
+if TYPE_CHECKING:
+    from requests import Response, Session
+
+    from . import combiner, comparison
+    from .cache import CacheBackend
+    from .dedup import EventDeduplicator
+    from .instrumentation import RequestHook
+    from .metrics import MetricsRegistry
+    from .streaming import StatsStream
+    from .validation import QueryValidator
+    from .hedging import Hedger
+    from .resolver import DNSCache
+    from .shipper import EventSink
+    from .prewarm import HotQueryRegistry
 
 
 DEFAULT_BASE_URL = "https://plausible.io"
@@ -23,6 +43,19 @@ EVENT_ENDPOINT = "/api/event"
 SITES_V1 = "/api/v1/sites"
 
 
+def _headers_elapsed(resp: Any, total_s: float) -> float:
+    """
+    Seconds until the response headers arrived. requests sets elapsed once headers
+    are parsed; httpx only once the body is read, so a streamed httpx response (whose
+    body the caller has yet to read) counts the whole call as time to first byte.
+    """
+    try:
+        elapsed = resp.elapsed
+    except (AttributeError, RuntimeError):
+        return total_s
+    return min(elapsed.total_seconds(), total_s)
+
+
 class PlausibleClient:
     """
     Python SDK client for Plausible Analytics Stats, Events and Sites APIs.
@@ -34,6 +67,63 @@ class PlausibleClient:
     You can pass keys directly or rely on env vars:
     - PLAUSIBLE_STATS_API_KEY
     - PLAUSIBLE_SITES_API_KEY
+
+    Transport:
+    - By default a RequestsTransport with a pool of pool_maxsize connections per host is used.
+    - http2=True switches to HTTPXTransport (requires httpx[http2]).
+    - Pass transport= to plug in any Transport, e.g. CannedTransport in tests.
+    - The default transport is created lazily on the first upstream call.
+    - dns_cache: a resolver.DNSCache shared by the default RequestsTransport's connections.
+
+    Instrumentation (off by default, no per-call overhead when off):
+    - hooks: RequestHook instances called at the start/end of every upstream call.
+    - metrics: MetricsRegistry receiving latency, retry, 429, rate-limiter wait and pool stats.
+    - timing_sample_rate: fraction of calls recording a phase breakdown
+      (rate_limit, connect, tls, ttfb, download, parse), read back with timing.pop_last().
+      Events sent with debug=True are always timed.
+
+    Validation:
+    - validate_queries=True (or a QueryValidator) checks stats queries locally
+      and rejects invalid ones without spending a rate-limit token or a round trip.
+
+    Query combining:
+    - query_stats_many() merges queries that differ only in `metrics` into one upstream call.
+    - combine_window_s > 0 does the same for concurrent query_stats() calls arriving
+      within that window (each caller blocks for up to the window).
+    - batcher: a combiner.QueryBatcher shared by clients using the same stats key, so
+      calls from per-request clients are combined too (config.get_batcher()).
+
+    Caching (off unless cache= is given):
+    - query_stats results are stored in the CacheBackend for cache_ttl_s.
+    - Expired entries younger than cache_ttl_s + cache_max_stale_s are served
+      immediately while one background refresh per query updates the cache.
+    - hot_queries: a HotQueryRegistry that learns popular queries from traffic,
+      for a prewarm.Prewarmer to refresh ahead of expiry.
+    - Cached results are shared between callers; treat them as read-only.
+    - compare_stats() caches periods that ended before today for cache_closed_ttl_s.
+
+    Event dedup (off unless deduplicator= is given):
+    - Repeats of an event (same domain, name, url, user agent, IP and props) within
+      the deduplicator's window are dropped before spending a rate-limit token.
+      send_event returns {} for them, as for an accepted event. Debug events are never dropped.
+
+    Event sink (off unless event_sink= is given):
+    - Non-debug events are handed to the sink (e.g. shipper.ShipperSink feeding a sidecar
+      shipper process) and send_event returns {} at once. If the sink refuses an event
+      (full or unreachable) it is sent directly instead.
+
+    Large responses:
+    - query_stats_stream() yields result rows while the body downloads instead of
+      buffering and decoding it whole.
+    - max_response_bytes caps stats response bodies (PlausibleResponseTooLargeError);
+      when set, query_stats also reads through the streaming parser so the cap is
+      enforced during download.
+
+    Hedging (off unless hedger= is given):
+    - query_stats, get_site and list_* calls slower than the hedger's percentile delay
+      for their endpoint are sent a second time; the first response wins and the
+      other is closed. Hedges need a token from both the hedger's budget and this
+      client's rate limiter, and are never waited for.
     """
 
     def __init__(
@@ -47,28 +137,113 @@ class PlausibleClient:
         backoff_factor: float = 0.5,
         rate_limit_per_hour: Optional[int] = 600,
         session: Optional[Session] = None,
+        transport: Optional[Transport] = None,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        keep_alive: bool = True,
+        http2: bool = False,
+        compress_requests: bool = False,
+        hooks: Optional[Iterable[RequestHook]] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        timing_sample_rate: float = 0.0,
+        validate_queries: Union[bool, QueryValidator] = False,
+        combine_window_s: float = 0.0,
+        batcher: Optional[combiner.QueryBatcher] = None,
+        cache: Optional[CacheBackend] = None,
+        cache_ttl_s: float = 300.0,
+        cache_max_stale_s: float = 0.0,
+        cache_closed_ttl_s: float = 86400.0,
+        hot_queries: Optional[HotQueryRegistry] = None,
+        deduplicator: Optional[EventDeduplicator] = None,
+        event_sink: Optional[EventSink] = None,
+        max_response_bytes: Optional[int] = None,
+        hedger: Optional[Hedger] = None,
+        dns_cache: Optional[DNSCache] = None,
     ) -> None:
         self.base_url = base_url.rstrip("/")
         self.stats_api_key = stats_api_key or os.getenv("PLAUSIBLE_STATS_API_KEY")
         self.sites_api_key = sites_api_key or os.getenv("PLAUSIBLE_SITES_API_KEY")
         self.timeout_s = timeout_s
 
-        self.session = session or requests.Session()
-        retry = Retry(
-            total=max_retries,
-            read=max_retries,
-            connect=max_retries,
-            status=max_retries,
-            backoff_factor=backoff_factor,
-            status_forcelist=(429, 500, 502, 503, 504),
-            allowed_methods=("GET", "POST", "PUT", "DELETE"),
-            raise_on_status=False,
-        )
-        adapter = HTTPAdapter(max_retries=retry)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+        # The transport (and its session / connection pool) is built on first use.
+        self._transport: Optional[Transport] = transport
+        self._transport_lock = threading.Lock()
+        self._transport_factory: Callable[[], Transport]
+        if http2:
+            self._transport_factory = functools.partial(
+                HTTPXTransport,
+                http2=True,
+                max_connections=pool_maxsize,
+                max_retries=max_retries,
+                backoff_factor=backoff_factor,
+                compress_requests=compress_requests,
+            )
+        else:
+            self._transport_factory = functools.partial(
+                RequestsTransport,
+                session=session,
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                pool_block=pool_block,
+                max_retries=max_retries,
+                backoff_factor=backoff_factor,
+                keep_alive=keep_alive,
+                compress_requests=compress_requests,
+                dns_cache=dns_cache,
+            )
 
         self._rate_limiter = RateLimiter(capacity=rate_limit_per_hour or 600, refill_window_s=3600)
+        self._event_encoder = EventEncoder()
+        self._event_url = f"{self.base_url}{EVENT_ENDPOINT}"
+
+        self._hooks: List[RequestHook] = list(hooks or ())
+        self.metrics = metrics
+        if metrics is not None:
+            from .instrumentation import MetricsHook
+
+            self._hooks.append(MetricsHook(metrics))
+            if transport is not None:
+                self._register_collector(transport)
+        self._local = threading.local()
+        self._timing_sampler = TimingSampler(timing_sample_rate)
+        if validate_queries is True:
+            from .validation import default_validator
+
+            validate_queries = default_validator()
+        self._validator: Optional[QueryValidator] = validate_queries or None
+        self._batcher: Optional[combiner.QueryBatcher] = batcher
+        if batcher is None and combine_window_s > 0:
+            from .combiner import QueryBatcher
+
+            self._batcher = QueryBatcher(window_s=combine_window_s)
+        self.cache = cache
+        if metrics is not None and cache is not None:
+            from .cache import describe_metrics
+
+            describe_metrics(metrics)
+        self.cache_ttl_s = cache_ttl_s
+        self.cache_max_stale_s = cache_max_stale_s
+        self.cache_closed_ttl_s = cache_closed_ttl_s
+        self.hot_queries = hot_queries
+        self._refreshing: set = set()
+        self._refreshing_lock = threading.Condition()
+        self.deduplicator = deduplicator
+        if metrics is not None and deduplicator is not None:
+            from .dedup import describe_metrics
+
+            describe_metrics(metrics)
+            metrics.add_collector(deduplicator)
+        self.event_sink = event_sink
+        self.max_response_bytes = max_response_bytes
+        self.hedger = hedger
+        if metrics is not None and hedger is not None:
+            from .hedging import describe_metrics
+
+            describe_metrics(metrics)
+            metrics.add_collector(hedger)
+        if metrics is not None and dns_cache is not None:
+            metrics.add_collector(dns_cache)
 
     # ---------------
     # Stats API (v2)
@@ -78,24 +253,178 @@ class PlausibleClient:
         POST /api/v2/query
         query: full Plausible stats query JSON.
         Returns parsed JSON dict.
+        With validate_queries enabled, invalid queries raise PlausibleQueryValidationError
+        before a rate-limit token is spent.
+        With a cache configured, fresh (or servable stale) results are returned without
+        an upstream call.
+        """
+        if not self.stats_api_key:
+            raise PlausibleAuthError("Stats API key missing. Set PLAUSIBLE_STATS_API_KEY or pass stats_api_key.")
+        if self._validator is not None:
+            self._validator.validate(query)
+        if self.cache is not None:
+            return self._cached_query_stats(query)
+        return self._fetch_stats(query)
+
+    def query_stats_many(self, queries: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Run several stats queries, merging those that differ only in `metrics`
+        into one upstream call each. Results are returned in input order.
         """
         if not self.stats_api_key:
             raise PlausibleAuthError("Stats API key missing. Set PLAUSIBLE_STATS_API_KEY or pass stats_api_key.")
+        if self._validator is not None:
+            for query in queries:
+                self._validator.validate(query)
+
+        from . import combiner
+
+        groups, placement = combiner.plan(queries)
+        split = [group.split(self._query_stats(group.merged_query())) for group in groups]
+        for group in groups:
+            self._record_combined(len(group.members))
+        return [split[gi][mi] for gi, mi in placement]
+
+    def compare_stats(
+        self,
+        query: Dict[str, Any],
+        *,
+        compare: str = "previous_period",
+        timezone: Optional[str] = None,
+        today: Optional[date] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run query for its date_range and for the period it is compared with
+        (compare: "previous_period" or "year_over_year"), concurrently.
+
+        Named ranges ("7d", "month", ...) are resolved to dates relative to today
+        (default: today in timezone, or UTC), and both periods are sent as explicit
+        ranges. Each result row gets a `comparison` with the previous row's
+        metrics, change and percent_change (None when the row is new). The
+        response's `comparison` holds the mode and both resolved date ranges.
+        With a cache, periods that ended before today are kept for cache_closed_ttl_s.
+        """
+        if not self.stats_api_key:
+            raise PlausibleAuthError("Stats API key missing. Set PLAUSIBLE_STATS_API_KEY or pass stats_api_key.")
+        if self._validator is not None:
+            self._validator.validate(query)
+        from . import comparison
+
+        today = today or comparison.today_in(timezone)
+        current_range = comparison.resolve_date_range(query.get("date_range"), today)
+        previous_range = comparison.previous_range(current_range, compare)
 
-        self._rate_limiter.acquire()
+        previous: Dict[str, Any] = {}
+
+        def fetch_previous() -> None:
+            try:
+                previous["result"] = self._fetch_period(query, previous_range, today)
+            except BaseException as exc:
+                previous["error"] = exc
+
+        worker = threading.Thread(target=fetch_previous, name="plausible-compare", daemon=True)
+        worker.start()
+        try:
+            current = self._fetch_period(query, current_range, today)
+        finally:
+            worker.join()
+        if "error" in previous:
+            raise previous["error"]
+
+        return {
+            "results": comparison.compare_results(
+                current,
+                previous["result"],
+                dimensions=query.get("dimensions") or (),
+                current_range=current_range,
+                previous_range=previous_range,
+            ),
+            "meta": current.get("meta", {}),
+            "query": current.get("query", {}),
+            "comparison": {
+                "mode": compare,
+                "date_range": [d.isoformat() for d in current_range],
+                "previous_date_range": [d.isoformat() for d in previous_range],
+            },
+        }
+
+    def _fetch_period(self, query: Dict[str, Any], date_range: comparison.DateRange, today: date) -> Dict[str, Any]:
+        from .comparison import with_date_range
+
+        period_query = with_date_range(query, date_range)
+        if self.cache is None:
+            return self._fetch_stats(period_query)
+        # A period that has ended no longer changes; keep it longer.
+        return self._cached_query_stats(period_query, ttl_s=self.cache_closed_ttl_s if date_range[1] < today else None)
+
+    def _fetch_stats(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        if self._batcher is not None:
+            return self._batcher.submit(query, execute=self._query_stats, on_group=self._record_combined)
+        return self._query_stats(query)
+
+    def query_stats_stream(self, query: Dict[str, Any], *, chunk_size: Optional[int] = None) -> StatsStream:
+        """
+        POST /api/v2/query, returning a StatsStream that yields `results` rows while
+        the body is read; `meta` and `query` are available once it is exhausted.
+        chunk_size defaults to streaming.DEFAULT_CHUNK_SIZE.
+        Bypasses the cache and query combining. Close the stream if you stop early.
+        """
+        if not self.stats_api_key:
+            raise PlausibleAuthError("Stats API key missing. Set PLAUSIBLE_STATS_API_KEY or pass stats_api_key.")
+        if self._validator is not None:
+            self._validator.validate(query)
+        return self._open_stats_stream(query, chunk_size=chunk_size)
+
+    def _query_stats(self, query: Dict[str, Any], *, acquire: bool = True) -> Dict[str, Any]:
+        if self.max_response_bytes is not None:
+            # Read through the streaming parser so the size cap applies while downloading.
+            return self._open_stats_stream(query, acquire=acquire).read_all()
+        if acquire:
+            self._acquire()
 
         url = f"{self.base_url}{STATS_ENDPOINT}"
-        resp = self.session.post(
+        resp = self._request(
+            "POST",
             url,
             json=query,
             headers={
                 "Authorization": f"Bearer {self.stats_api_key}",
                 "Content-Type": "application/json",
             },
-            timeout=self.timeout_s,
+            hedge=True,
         )
         return self._handle_response(resp)
 
+    def _open_stats_stream(
+        self, query: Dict[str, Any], *, acquire: bool = True, chunk_size: Optional[int] = None
+    ) -> StatsStream:
+        from .streaming import DEFAULT_CHUNK_SIZE, StatsStream
+
+        if acquire:
+            self._acquire()
+
+        url = f"{self.base_url}{STATS_ENDPOINT}"
+        resp = self._request(
+            "POST",
+            url,
+            json=query,
+            headers={
+                "Authorization": f"Bearer {self.stats_api_key}",
+                "Content-Type": "application/json",
+            },
+            stream=True,
+            hedge=True,
+        )
+        if not 200 <= resp.status_code < 300:
+            # Error bodies are small: read them whole and raise the usual errors.
+            try:
+                self._handle_response(resp)
+            finally:
+                resp.close()
+        # The call is timed up to the response headers; the body is parsed by the caller.
+        timing.finish()
+        return StatsStream(resp, max_bytes=self.max_response_bytes, chunk_size=chunk_size or DEFAULT_CHUNK_SIZE)
+
     # ---------------
     # Events API
     # ---------------
@@ -117,32 +446,62 @@ class PlausibleClient:
         POST /api/event
         Returns {} on 202 Accepted; if debug=True, returns a JSON payload with resolved IP and 200 OK.
         """
-        self._rate_limiter.acquire()
+        event = Event(
+            domain=domain,
+            name=name,
+            url=url,
+            user_agent=user_agent,
+            client_ip=client_ip,
+            referrer=referrer,
+            props=props,
+            revenue=revenue,
+            interactive=interactive,
+        )
+        return self.send_event_record(event, debug=debug)
 
-        payload: Dict[str, Any] = {
-            "domain": domain,
-            "name": name,
-            "url": url,
-            "interactive": interactive,
-        }
-        if referrer is not None:
-            payload["referrer"] = referrer
-        if props is not None:
-            payload["props"] = props
-        if revenue is not None:
-            payload["revenue"] = revenue
-
-        headers = {
-            "Content-Type": "application/json",
-            "User-Agent": user_agent,
-        }
-        if client_ip:
-            headers["X-Forwarded-For"] = client_ip
-        if debug:
-            headers["X-Debug-Request"] = "true"
+    def send_event_record(self, event: Event, *, debug: bool = False) -> Dict[str, Any]:
+        """
+        POST /api/event for a pre-built Event record (used by send_event and queueing paths).
+        With a deduplicator, the event only counts as seen once it was sent (or handed
+        to the event_sink); a failed send can be retried.
+        """
+        dedup_key = None
+        if self.deduplicator is not None and not debug:
+            dedup_key = self.deduplicator.reserve(event)
+            if dedup_key is None:
+                if self.metrics is not None:
+                    self.metrics.inc("plausible_events_deduplicated_total")
+                return {}
+        try:
+            result = self._send_event(event, debug=debug)
+        except BaseException:
+            # Not delivered: a retry of the same event must not be dropped as a repeat.
+            if dedup_key is not None:
+                self.deduplicator.release(dedup_key)
+            raise
+        if dedup_key is not None:
+            self.deduplicator.commit(dedup_key)
+        return result
+
+    def _send_event(self, event: Event, *, debug: bool) -> Dict[str, Any]:
+        if self.event_sink is not None and not debug and self.event_sink.submit(event):
+            return {}
+        self._acquire(force_timing=debug)
+
+        body = self._event_encoder.encode(event)
+        headers = self._event_encoder.headers(event, debug=debug)
+        resp = self._request("POST", self._event_url, data=body, headers=headers)
+        return self._handle_response(resp)
+
+    def send_encoded_event(self, body: bytes, *, user_agent: str, client_ip: Optional[str] = None) -> Dict[str, Any]:
+        """
+        POST /api/event with a body already produced by EventEncoder.encode()
+        (used by the out-of-process shipper). Bypasses dedup and event_sink.
+        """
+        self._acquire()
 
-        url_ep = f"{self.base_url}{EVENT_ENDPOINT}"
-        resp = self.session.post(url_ep, json=payload, headers=headers, timeout=self.timeout_s)
+        headers = self._event_encoder.request_headers(user_agent, client_ip)
+        resp = self._request("POST", self._event_url, data=body, headers=headers)
         return self._handle_response(resp)
 
     # ------------------
@@ -150,7 +509,7 @@ class PlausibleClient:
     # ------------------
     def list_sites(self, *, after: Optional[str] = None, before: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
         self._require_sites_key()
-        self._rate_limiter.acquire()
+        self._acquire()
 
         params: Dict[str, Any] = {}
         if after is not None:
@@ -161,12 +520,12 @@ class PlausibleClient:
             params["limit"] = limit
 
         url = f"{self.base_url}{SITES_V1}"
-        resp = self.session.get(url, headers=self._sites_headers(), params=params, timeout=self.timeout_s)
+        resp = self._request("GET", url, headers=self._sites_headers(), params=params, hedge=True)
         return self._handle_response(resp)
 
     def list_teams(self, *, after: Optional[str] = None, before: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
         self._require_sites_key()
-        self._rate_limiter.acquire()
+        self._acquire()
 
         params: Dict[str, Any] = {}
         if after is not None:
@@ -177,12 +536,12 @@ class PlausibleClient:
             params["limit"] = limit
 
         url = f"{self.base_url}{SITES_V1}/teams"
-        resp = self.session.get(url, headers=self._sites_headers(), params=params, timeout=self.timeout_s)
+        resp = self._request("GET", url, headers=self._sites_headers(), params=params, hedge=True)
         return self._handle_response(resp)
 
     def create_site(self, *, domain: str, timezone: str = "Etc/UTC", team_id: Optional[str] = None) -> Dict[str, Any]:
         self._require_sites_key()
-        self._rate_limiter.acquire()
+        self._acquire()
 
         # Sites API expects multipart form data (-F in curl examples)
         data = {
@@ -193,52 +552,52 @@ class PlausibleClient:
             data["team_id"] = f'"{team_id}"'
 
         url = f"{self.base_url}{SITES_V1}"
-        resp = self.session.post(url, headers=self._sites_headers(), files=data, timeout=self.timeout_s)
+        resp = self._request("POST", url, headers=self._sites_headers(), files=data)
         return self._handle_response(resp)
 
     def update_site_domain(self, *, site_id: str, new_domain: str) -> Dict[str, Any]:
         self._require_sites_key()
-        self._rate_limiter.acquire()
+        self._acquire()
 
         data = {
             "domain": f'"{new_domain}"',
         }
         url = f"{self.base_url}{SITES_V1}/{site_id}"
-        resp = self.session.put(url, headers=self._sites_headers(), files=data, timeout=self.timeout_s)
+        resp = self._request("PUT", url, headers=self._sites_headers(), files=data)
         return self._handle_response(resp)
 
     def delete_site(self, *, site_id: str) -> Dict[str, Any]:
         self._require_sites_key()
-        self._rate_limiter.acquire()
+        self._acquire()
 
         url = f"{self.base_url}{SITES_V1}/{site_id}"
-        resp = self.session.delete(url, headers=self._sites_headers(), timeout=self.timeout_s)
+        resp = self._request("DELETE", url, headers=self._sites_headers())
         return self._handle_response(resp)
 
     def get_site(self, *, site_id: str) -> Dict[str, Any]:
         self._require_sites_key()
-        self._rate_limiter.acquire()
+        self._acquire()
 
         url = f"{self.base_url}{SITES_V1}/{site_id}"
-        resp = self.session.get(url, headers=self._sites_headers(), timeout=self.timeout_s)
+        resp = self._request("GET", url, headers=self._sites_headers(), hedge=True)
         return self._handle_response(resp)
 
     def put_shared_link(self, *, site_id: str, name: str) -> Dict[str, Any]:
         self._require_sites_key()
-        self._rate_limiter.acquire()
+        self._acquire()
 
         data = {
             "site_id": f'"{site_id}"',
             "name": f'"{name}"',
         }
         url = f"{self.base_url}{SITES_V1}/shared-links"
-        resp = self.session.put(url, headers=self._sites_headers(), files=data, timeout=self.timeout_s)
+        resp = self._request("PUT", url, headers=self._sites_headers(), files=data)
         return self._handle_response(resp)
 
     # Goals
     def list_goals(self, *, site_id: str, after: Optional[str] = None, before: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
         self._require_sites_key()
-        self._rate_limiter.acquire()
+        self._acquire()
 
         params: Dict[str, Any] = {"site_id": site_id}
         if after is not None:
@@ -249,7 +608,7 @@ class PlausibleClient:
             params["limit"] = limit
 
         url = f"{self.base_url}{SITES_V1}/goals"
-        resp = self.session.get(url, headers=self._sites_headers(), params=params, timeout=self.timeout_s)
+        resp = self._request("GET", url, headers=self._sites_headers(), params=params, hedge=True)
         return self._handle_response(resp)
 
     def put_goal(
@@ -262,7 +621,7 @@ class PlausibleClient:
         display_name: Optional[str] = None,
     ) -> Dict[str, Any]:
         self._require_sites_key()
-        self._rate_limiter.acquire()
+        self._acquire()
 
         data = {"site_id": f'"{site_id}"', "goal_type": f'"{goal_type}"'}
         if event_name is not None:
@@ -273,22 +632,22 @@ class PlausibleClient:
             data["display_name"] = f'"{display_name}"'
 
         url = f"{self.base_url}{SITES_V1}/goals"
-        resp = self.session.put(url, headers=self._sites_headers(), files=data, timeout=self.timeout_s)
+        resp = self._request("PUT", url, headers=self._sites_headers(), files=data)
         return self._handle_response(resp)
 
     def delete_goal(self, *, goal_id: str, site_id: str) -> Dict[str, Any]:
         self._require_sites_key()
-        self._rate_limiter.acquire()
+        self._acquire()
 
         data = {"site_id": f'"{site_id}"'}
         url = f"{self.base_url}{SITES_V1}/goals/{goal_id}"
-        resp = self.session.delete(url, headers=self._sites_headers(), files=data, timeout=self.timeout_s)
+        resp = self._request("DELETE", url, headers=self._sites_headers(), files=data)
         return self._handle_response(resp)
 
     # Guests
     def list_guests(self, *, site_id: str, after: Optional[str] = None, before: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
         self._require_sites_key()
-        self._rate_limiter.acquire()
+        self._acquire()
 
         params: Dict[str, Any] = {"site_id": site_id}
         if after is not None:
@@ -299,29 +658,281 @@ class PlausibleClient:
             params["limit"] = limit
 
         url = f"{self.base_url}{SITES_V1}/guests"
-        resp = self.session.get(url, headers=self._sites_headers(), params=params, timeout=self.timeout_s)
+        resp = self._request("GET", url, headers=self._sites_headers(), params=params, hedge=True)
         return self._handle_response(resp)
 
     def put_guest(self, *, site_id: str, email: str, role: str) -> Dict[str, Any]:
         self._require_sites_key()
-        self._rate_limiter.acquire()
+        self._acquire()
 
         data = {"site_id": f'"{site_id}"', "email": f'"{email}"', "role": f'"{role}"'}
         url = f"{self.base_url}{SITES_V1}/guests"
-        resp = self.session.put(url, headers=self._sites_headers(), files=data, timeout=self.timeout_s)
+        resp = self._request("PUT", url, headers=self._sites_headers(), files=data)
         return self._handle_response(resp)
 
     def delete_guest(self, *, email: str) -> Dict[str, Any]:
         self._require_sites_key()
-        self._rate_limiter.acquire()
+        self._acquire()
 
         url = f"{self.base_url}{SITES_V1}/guests/{email}"
-        resp = self.session.delete(url, headers=self._sites_headers(), timeout=self.timeout_s)
+        resp = self._request("DELETE", url, headers=self._sites_headers())
         return self._handle_response(resp)
 
+    # ------------------
+    # Lifecycle
+    # ------------------
+    @property
+    def transport(self) -> Transport:
+        transport = self._transport
+        if transport is None:
+            with self._transport_lock:
+                transport = self._transport
+                if transport is None:
+                    transport = self._transport = self._transport_factory()
+                    self._register_collector(transport)
+        return transport
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        return self._rate_limiter
+
+    @property
+    def session(self) -> Optional[Session]:
+        return getattr(self.transport, "session", None)
+
+    def refresh_if_idle(
+        self, query: Dict[str, Any], *, budget: Optional[RateLimiter] = None, source: str = "prewarm"
+    ) -> str:
+        """
+        Refresh query into the cache now, unless a refresh of it is already in flight.
+
+        Never waits: the call needs a token from the client's rate limiter and, when
+        given, one from budget. Either token is only consumed if both are available.
+        Returns "refreshed", "in_flight", "rate_limit", "budget" or "error" (counted
+        in plausible_cache_refreshes_total).
+        """
+        if self.cache is None:
+            raise ValueError("refresh_if_idle requires a client configured with cache=")
+        from .cache import cache_key
+
+        key = cache_key(query)
+        if not self._claim_refresh(key):
+            return "in_flight"
+        try:
+            if not self._rate_limiter.try_acquire():
+                return "rate_limit"
+            if budget is not None and not budget.try_acquire():
+                self._rate_limiter.release()
+                return "budget"
+            try:
+                self._refresh(key, query, source=source, acquire=False)
+            except Exception:
+                return "error"
+            return "refreshed"
+        finally:
+            self._release_refresh(key)
+
+    def wait_for_refreshes(self, timeout_s: Optional[float] = None) -> bool:
+        """
+        Block until background cache refreshes started by this client have finished,
+        or timeout_s has passed. Returns False on timeout.
+        """
+        with self._refreshing_lock:
+            return self._refreshing_lock.wait_for(lambda: not self._refreshing, timeout_s)
+
+    def close(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+
+    def __enter__(self) -> "PlausibleClient":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
     # ------------------
     # Internal helpers
     # ------------------
+    def _cached_query_stats(self, query: Dict[str, Any], *, ttl_s: Optional[float] = None) -> Dict[str, Any]:
+        from .cache import cache_key
+
+        key = cache_key(query)
+        if self.hot_queries is not None:
+            self.hot_queries.record(query, key)
+        entry = self.cache.get(key)
+        if entry is None:
+            self._record_lookup("miss")
+            return self._fetch_miss(key, query, ttl_s=ttl_s)
+        if entry.is_fresh():
+            self._record_lookup("fresh")
+            return entry.value
+        self._record_lookup("stale", entry.age())
+        if self._claim_refresh(key):
+            threading.Thread(
+                target=self._background_refresh,
+                args=(key, query, ttl_s),
+                name="plausible-revalidate",
+                daemon=True,
+            ).start()
+        return entry.value
+
+    def _fetch_miss(self, key: str, query: Dict[str, Any], *, ttl_s: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Single-flight fetch of a missing key: one caller claims it and goes upstream,
+        concurrent callers wait for its result. If that fetch fails, the next waiter
+        claims the key and tries itself; after timeout_s waiters stop waiting and fetch.
+        """
+        deadline = time.monotonic() + self.timeout_s
+        while not self._claim_refresh(key):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return self._refresh(key, query, source="miss", ttl_s=ttl_s)
+            self.cache.wait_refresh(key, remaining)
+            entry = self.cache.get(key)
+            if entry is not None:
+                return entry.value
+        try:
+            return self._refresh(key, query, source="miss", ttl_s=ttl_s)
+        finally:
+            self._release_refresh(key)
+
+    def _refresh(
+        self, key: str, query: Dict[str, Any], *, source: str, acquire: bool = True, ttl_s: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Fetch query upstream and store the result under key (for ttl_s, default cache_ttl_s), ignoring any cached entry."""
+        started = time.perf_counter()
+        try:
+            value = self._fetch_stats(query) if acquire else self._query_stats(query, acquire=False)
+        except Exception:
+            self._record_refresh(source, "error", started)
+            raise
+        self.cache.set(key, value, ttl_s=self.cache_ttl_s if ttl_s is None else ttl_s, stale_s=self.cache_max_stale_s)
+        self._record_refresh(source, "ok", started)
+        return value
+
+    def _background_refresh(self, key: str, query: Dict[str, Any], ttl_s: Optional[float] = None) -> None:
+        try:
+            self._refresh(key, query, source="revalidate", ttl_s=ttl_s)
+        except Exception:
+            # Counted in plausible_cache_refreshes_total; the stale entry stays servable.
+            pass
+        finally:
+            self._release_refresh(key)
+
+    def _claim_refresh(self, key: str) -> bool:
+        """Claim key in the shared cache; False if any client is already refreshing it."""
+        if not self.cache.claim_refresh(key):
+            return False
+        with self._refreshing_lock:
+            self._refreshing.add(key)
+        return True
+
+    def _release_refresh(self, key: str) -> None:
+        self.cache.release_refresh(key)
+        with self._refreshing_lock:
+            self._refreshing.discard(key)
+            self._refreshing_lock.notify_all()
+
+    def _record_lookup(self, result: str, stale_age_s: Optional[float] = None) -> None:
+        if self.metrics is None:
+            return
+        self.metrics.inc("plausible_cache_lookups_total", labels={"result": result})
+        if stale_age_s is not None:
+            self.metrics.observe("plausible_cache_stale_age_seconds", stale_age_s)
+
+    def _record_refresh(self, source: str, outcome: str, started: float) -> None:
+        if self.metrics is None:
+            return
+        self.metrics.inc("plausible_cache_refreshes_total", labels={"source": source, "outcome": outcome})
+        self.metrics.observe("plausible_cache_refresh_seconds", time.perf_counter() - started, {"source": source})
+
+    def _record_combined(self, members: int) -> None:
+        if self.metrics is not None and members > 1:
+            self.metrics.inc("plausible_client_queries_combined_total", members - 1)
+
+    def _record_hedge(self, endpoint: str, outcome: str) -> None:
+        if self.metrics is not None:
+            self.metrics.inc("plausible_client_hedges_total", labels={"endpoint": endpoint, "outcome": outcome})
+
+    def _register_collector(self, transport: Transport) -> None:
+        if self.metrics is not None and hasattr(transport, "collect_metrics"):
+            self.metrics.add_collector(transport)
+
+    def _acquire(self, *, force_timing: bool = False) -> None:
+        sampled = force_timing or self._timing_sampler.should_sample()
+        wait_s = self._rate_limiter.acquire()
+        if self._hooks:
+            self._local.rate_limit_wait_s = wait_s
+        if sampled:
+            timing.begin().add("rate_limit", wait_s)
+
+    def _request(self, method: str, url: str, **kwargs: Any) -> Response:
+        if not self._hooks:
+            return self._send(method, url, **kwargs)
+
+        from .instrumentation import RequestContext, endpoint_label
+
+        ctx = RequestContext(
+            method,
+            url,
+            endpoint_label(url[len(self.base_url):]),
+            rate_limit_wait_s=getattr(self._local, "rate_limit_wait_s", 0.0),
+        )
+        self._local.rate_limit_wait_s = 0.0
+        for hook in self._hooks:
+            hook.on_request_start(ctx)
+        try:
+            resp = self._send(method, url, **kwargs)
+        except Exception as exc:
+            ctx.finish(error=exc)
+            for hook in self._hooks:
+                hook.on_request_end(ctx)
+            raise
+        ctx.finish(resp)
+        for hook in self._hooks:
+            hook.on_request_end(ctx)
+        return resp
+
+    def _send(self, method: str, url: str, *, hedge: bool = False, **kwargs: Any) -> Response:
+        call = timing.current()
+        if call is None:
+            return self._transport_request(method, url, hedge, kwargs)
+
+        from .instrumentation import endpoint_label
+
+        call.endpoint = endpoint_label(url[len(self.base_url):])
+        started = time.perf_counter()
+        try:
+            resp = self._transport_request(method, url, hedge, kwargs)
+        except Exception:
+            timing.finish()
+            raise
+        total_s = time.perf_counter() - started
+        try:
+            headers_s = _headers_elapsed(resp, total_s)
+            setup_s = call.phases.get("connect", 0.0) + call.phases.get("tls", 0.0)
+            call.add("ttfb", headers_s - setup_s)
+            call.add("download", total_s - headers_s)
+        except Exception:
+            # A streamed response holds its connection until closed.
+            resp.close()
+            timing.finish()
+            raise
+        return resp
+
+    def _transport_request(self, method: str, url: str, hedge: bool, kwargs: Dict[str, Any]) -> Response:
+        if not hedge or self.hedger is None:
+            return self.transport.request(method, url, timeout=self.timeout_s, **kwargs)
+        from .instrumentation import endpoint_label
+
+        # Only idempotent reads pass hedge=True.
+        return self.hedger.run(
+            endpoint_label(url[len(self.base_url):]),
+            functools.partial(self.transport.request, method, url, timeout=self.timeout_s, **kwargs),
+            acquire=self._rate_limiter.try_acquire,
+            on_hedge=self._record_hedge,
+        )
+
     def _sites_headers(self) -> Dict[str, str]:
         return {
             "Authorization": f"Bearer {self.sites_api_key}",
@@ -332,6 +943,17 @@ class PlausibleClient:
             raise PlausibleAuthError("Sites API key missing. Set PLAUSIBLE_SITES_API_KEY or pass sites_api_key.")
 
     def _handle_response(self, resp: Response) -> Dict[str, Any]:
+        call = timing.current()
+        if call is None:
+            return self._parse_response(resp)
+        started = time.perf_counter()
+        try:
+            return self._parse_response(resp)
+        finally:
+            call.add("parse", time.perf_counter() - started)
+            timing.finish()
+
+    def _parse_response(self, resp: Response) -> Dict[str, Any]:
         # Rate limit responses
         if resp.status_code == 429:
             raise PlausibleRateLimitError("Rate limit exceeded", status_code=resp.status_code, response_text=resp.text)
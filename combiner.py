@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .errors import PlausibleAPIError
+from .models import StatsQuery
+
+
+def merge_key(query: StatsQuery) -> Optional[str]:
+    """
+    Key under which queries can share one upstream call: everything but `metrics`.
+
+    Without an explicit order_by the upstream sorts dimensional results by the first
+    metric, so in that case the first metric is part of the key as well.
+    Returns None for queries that cannot be combined.
+    """
+    metrics = query.get("metrics")
+    if not isinstance(metrics, list) or not metrics:
+        return None
+    rest = {k: v for k, v in query.items() if k != "metrics"}
+    if query.get("dimensions") and not query.get("order_by"):
+        rest["__first_metric__"] = metrics[0]
+    try:
+        return json.dumps(rest, sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return None
+
+
+class QueryGroup:
+    """Queries sharing a merge key, answered by one upstream query with the union of metrics."""
+
+    __slots__ = ("key", "members", "metrics")
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.members: List[StatsQuery] = []
+        self.metrics: List[str] = []
+
+    def add(self, query: StatsQuery) -> None:
+        self.members.append(query)
+        for metric in query["metrics"]:
+            if metric not in self.metrics:
+                self.metrics.append(metric)
+
+    def merged_query(self) -> StatsQuery:
+        merged: StatsQuery = dict(self.members[0])  # type: ignore[assignment]
+        merged["metrics"] = list(self.metrics)
+        return merged
+
+    def split(self, response: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Project the merged response back onto each member's metrics."""
+        if len(self.members) == 1:
+            return [response]
+        position = {metric: i for i, metric in enumerate(self.metrics)}
+        rows = response.get("results") or []
+        out: List[Dict[str, Any]] = []
+        for member in self.members:
+            idx = [position[m] for m in member["metrics"]]
+            echoed = dict(response.get("query") or {})
+            if echoed:
+                echoed["metrics"] = list(member["metrics"])
+            out.append(
+                {
+                    **response,
+                    "results": [
+                        {**row, "metrics": [row["metrics"][i] for i in idx]}
+                        for row in rows
+                    ],
+                    "query": echoed,
+                }
+            )
+        return out
+
+
+def plan(queries: Sequence[StatsQuery]) -> Tuple[List[QueryGroup], List[Tuple[int, int]]]:
+    """
+    Group compatible queries.
+    Returns (groups, placement) where placement[i] = (group index, member index) of queries[i].
+    """
+    groups: List[QueryGroup] = []
+    by_key: Dict[str, int] = {}
+    placement: List[Tuple[int, int]] = []
+    for i, query in enumerate(queries):
+        key = merge_key(query)
+        if key is None:
+            key = f"__single__{i}"
+        gi = by_key.get(key)
+        if gi is None:
+            gi = by_key[key] = len(groups)
+            groups.append(QueryGroup(key))
+        groups[gi].add(query)
+        placement.append((gi, len(groups[gi].members) - 1))
+    return groups, placement
+
+
+class _RunAlone(Exception):
+    """Set on every member of a group whose merged query was rejected."""
+
+
+class QueryBatcher:
+    """
+    Combines concurrent query_stats calls arriving within window_s of each other.
+
+    The first caller for a merge key becomes the group leader: it waits window_s
+    (or until max_group_size members joined), closes the group, issues the merged
+    query via execute() and hands each follower its projected result (or the exception).
+    If the upstream rejects a merged query of several members (a 4xx PlausibleAPIError,
+    e.g. one member's unknown metric), every member re-runs its own query alone, so
+    the error only reaches the caller whose query caused it.
+
+    One batcher can be shared by every client using the same API key: each caller
+    passes its own execute/on_group to submit(), and the leader's are used.
+    """
+
+    def __init__(
+        self,
+        execute: Optional[Callable[[StatsQuery], Dict[str, Any]]] = None,
+        *,
+        window_s: float = 0.01,
+        max_group_size: int = 32,
+        on_group: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        self.execute = execute
+        self.on_group = on_group
+        self.window_s = window_s
+        self.max_group_size = max_group_size
+        self._lock = threading.Lock()
+        self._open: Dict[str, Tuple[QueryGroup, List["Future[Dict[str, Any]]"], threading.Event]] = {}
+
+    def submit(
+        self,
+        query: StatsQuery,
+        *,
+        execute: Optional[Callable[[StatsQuery], Dict[str, Any]]] = None,
+        on_group: Optional[Callable[[int], None]] = None,
+    ) -> Dict[str, Any]:
+        execute = execute or self.execute
+        if execute is None:
+            raise ValueError("QueryBatcher.submit needs execute= when the batcher has none")
+        on_group = on_group or self.on_group
+        key = merge_key(query)
+        if key is None:
+            return execute(query)
+
+        future: "Future[Dict[str, Any]]" = Future()
+        with self._lock:
+            entry = self._open.get(key)
+            is_leader = entry is None
+            if entry is None:
+                entry = self._open[key] = (QueryGroup(key), [], threading.Event())
+            group, futures, full = entry
+            group.add(query)
+            futures.append(future)
+            if len(group.members) >= self.max_group_size:
+                del self._open[key]
+                full.set()
+        if is_leader:
+            full.wait(self.window_s)
+            with self._lock:
+                if self._open.get(key) is entry:
+                    del self._open[key]
+            self._run(group, futures, execute, on_group)
+        try:
+            return future.result()
+        except _RunAlone:
+            return execute(query)
+
+    def _run(
+        self,
+        group: QueryGroup,
+        futures: List["Future[Dict[str, Any]]"],
+        execute: Callable[[StatsQuery], Dict[str, Any]],
+        on_group: Optional[Callable[[int], None]],
+    ) -> None:
+        if on_group is not None:
+            on_group(len(group.members))
+        try:
+            response = execute(group.merged_query())
+        except PlausibleAPIError as exc:
+            rejected = exc.status_code is not None and 400 <= exc.status_code < 500
+            for f in futures:
+                f.set_exception(_RunAlone() if rejected and len(futures) > 1 else exc)
+            return
+        except BaseException as exc:
+            for f in futures:
+                f.set_exception(exc)
+            return
+        for f, result in zip(futures, group.split(response)):
+            f.set_result(result)
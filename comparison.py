@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import calendar
+from datetime import date, datetime, timedelta, timezone as _tz
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from .errors import PlausibleQueryValidationError
+from .models import StatsQuery
+from .validation import QueryIssue
+
+
+COMPARE_MODES = ("previous_period", "year_over_year")
+DateRange = Tuple[date, date]
+
+
+def today_in(timezone: Optional[str] = None) -> date:
+    """Today's date in an IANA timezone (UTC when None), i.e. the site's "today"."""
+    if timezone is None:
+        return datetime.now(_tz.utc).date()
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+    try:
+        zone = ZoneInfo(timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        message = f"unknown timezone {timezone!r}"
+        raise PlausibleQueryValidationError(message, issues=[QueryIssue("timezone", "unknown_timezone", message)]) from None
+    return datetime.now(zone).date()
+
+
+def _not_comparable(message: str) -> PlausibleQueryValidationError:
+    return PlausibleQueryValidationError(message, issues=[QueryIssue("date_range", "not_comparable", message)])
+
+
+def _month_end(day: date) -> date:
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def _add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(index, 12)
+    return date(year, month + 1, min(day.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def resolve_date_range(date_range: Any, today: date) -> DateRange:
+    """
+    Concrete [first, last] days of a query date_range, following Plausible's
+    definitions: "7d"/"28d"/"30d"/"91d" end yesterday, "month"/"year" are the whole
+    current calendar period, "6mo"/"12mo" end with the current month.
+    "24h" and "all" have no comparable previous period and are rejected.
+    """
+    if isinstance(date_range, list) and len(date_range) == 2:
+        try:
+            first, last = (date.fromisoformat(str(v)[:10]) for v in date_range)
+        except ValueError:
+            raise _not_comparable("custom date_range must be two ISO8601 dates") from None
+        if first > last:
+            raise _not_comparable("date_range start is after its end")
+        return first, last
+    if date_range == "day":
+        return today, today
+    if date_range in ("7d", "28d", "30d", "91d"):
+        last = today - timedelta(days=1)
+        return last - timedelta(days=int(date_range[:-1]) - 1), last
+    if date_range == "month":
+        return today.replace(day=1), _month_end(today)
+    if date_range == "year":
+        return date(today.year, 1, 1), date(today.year, 12, 31)
+    if date_range in ("6mo", "12mo"):
+        last = _month_end(today)
+        return _add_months(today.replace(day=1), -(int(date_range[:-2]) - 1)), last
+    raise _not_comparable(f"date_range {date_range!r} cannot be compared with a previous period")
+
+
+def previous_range(current: DateRange, mode: str = "previous_period") -> DateRange:
+    """
+    The period current is compared with.
+
+    previous_period: the same number of whole months before when current spans whole
+    calendar months, otherwise the same number of days ending the day before.
+    year_over_year: the same dates one year earlier (Feb 29 becomes Feb 28).
+    """
+    first, last = current
+    if mode == "year_over_year":
+        return _add_months(first, -12), _add_months(last, -12)
+    if mode != "previous_period":
+        raise ValueError(f"compare mode must be one of {COMPARE_MODES}")
+    if first.day == 1 and last == _month_end(last):
+        months = (last.year - first.year) * 12 + last.month - first.month + 1
+        return _add_months(first, -months), first - timedelta(days=1)
+    days = (last - first).days + 1
+    return first - timedelta(days=days), first - timedelta(days=1)
+
+
+def with_date_range(query: StatsQuery, date_range: DateRange) -> StatsQuery:
+    return {**query, "date_range": [date_range[0].isoformat(), date_range[1].isoformat()]}
+
+
+# ---------
+# Row join
+# ---------
+def _time_offset(dimension: str, value: Any, first: date) -> Any:
+    """Position of a time bucket within its period, so buckets line up across periods."""
+    try:
+        when = datetime.fromisoformat(str(value))
+    except ValueError:
+        return value
+    start = datetime(first.year, first.month, first.day)
+    if dimension == "time:month":
+        return (when.year - start.year) * 12 + when.month - start.month
+    if dimension == "time:week":
+        return (when - start).days // 7
+    if dimension == "time:day":
+        return (when - start).days
+    if dimension == "time:hour":
+        return int((when - start).total_seconds() // 3600)
+    if dimension == "time:minute":
+        return int((when - start).total_seconds() // 60)
+    return value
+
+
+def _auto_granularity(date_range: DateRange, values: Sequence[Any]) -> str:
+    """
+    Bucket size Plausible picks for the bare "time" dimension: hours for a single
+    day (the values then carry a time of day), months beyond 40 days, else days.
+    """
+    if any(len(str(v)) > 10 for v in values):
+        return "time:hour"
+    if (date_range[1] - date_range[0]).days + 1 > 40:
+        return "time:month"
+    return "time:day"
+
+
+def row_keys(rows: Sequence[Dict[str, Any]], dimensions: Sequence[str], date_range: DateRange) -> List[Hashable]:
+    """
+    Join keys for result rows: the dimension values, with time dimensions replaced
+    by their offset from the period start. The auto-granularity "time" dimension is
+    offset by the bucket size Plausible would have picked for the range, so periods
+    with missing (empty) buckets still line up.
+    """
+    time_positions = [i for i, d in enumerate(dimensions) if d.startswith("time")]
+    if not time_positions:
+        return [tuple(row.get("dimensions") or ()) for row in rows]
+    granularity = {i: dimensions[i] for i in time_positions}
+    for i in time_positions:
+        if dimensions[i] == "time":
+            granularity[i] = _auto_granularity(date_range, [row["dimensions"][i] for row in rows])
+    keys: List[Hashable] = []
+    for row in rows:
+        values = list(row.get("dimensions") or ())
+        for i in time_positions:
+            values[i] = _time_offset(granularity[i], values[i], date_range[0])
+        keys.append(tuple(values))
+    return keys
+
+
+def _change(current: Any, previous: Any) -> Tuple[Any, Any]:
+    if not isinstance(current, (int, float)) or not isinstance(previous, (int, float)):
+        return None, None
+    change = current - previous
+    if isinstance(change, float):
+        change = round(change, 2)
+    if previous == 0:
+        return change, None
+    return change, round(change / previous * 100, 1)
+
+
+def compare_results(
+    current: Dict[str, Any],
+    previous: Dict[str, Any],
+    *,
+    dimensions: Sequence[str] = (),
+    current_range: DateRange,
+    previous_range: DateRange,
+) -> List[Dict[str, Any]]:
+    """
+    Current rows, each with a `comparison` holding the matching previous row's
+    dimensions and metrics plus change (current - previous) and percent_change
+    per metric. Rows absent from the previous period get comparison None.
+    Previous rows are indexed in a dict, so the join is O(current + previous).
+    """
+    previous_rows = previous.get("results") or []
+    index = dict(zip(row_keys(previous_rows, dimensions, previous_range), previous_rows))
+    current_rows = current.get("results") or []
+    out = []
+    for key, row in zip(row_keys(current_rows, dimensions, current_range), current_rows):
+        match = index.get(key)
+        comparison = None
+        if match is not None:
+            changes = [_change(c, p) for c, p in zip(row["metrics"], match["metrics"])]
+            comparison = {
+                "dimensions": match.get("dimensions", []),
+                "metrics": match["metrics"],
+                "change": [c for c, _ in changes],
+                "percent_change": [p for _, p in changes],
+            }
+        out.append({**row, "comparison": comparison})
+    return out
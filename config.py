@@ -1,10 +1,19 @@
 from __future__ import annotations
 
+import hashlib
 import os
 from functools import lru_cache
 from typing import Optional
 
 from backend.app.core.landing_page.plausible import PlausibleClient
+from backend.app.core.landing_page.plausible.cache import CacheBackend, MemoryCache, SQLiteCache
+from backend.app.core.landing_page.plausible.combiner import QueryBatcher
+from backend.app.core.landing_page.plausible.dedup import EventDeduplicator
+from backend.app.core.landing_page.plausible.hedging import Hedger
+from backend.app.core.landing_page.plausible.metrics import MetricsRegistry, default_registry
+from backend.app.core.landing_page.plausible.prewarm import HotQueryRegistry
+from backend.app.core.landing_page.plausible.resolver import DNSCache
+from backend.app.core.landing_page.plausible.shipper import ShipperSink
 
 
 class PlausibleSettings:
@@ -16,12 +25,84 @@ class PlausibleSettings:
         base_url: str = "https://plausible.io",
         timeout_s: int = 30,
         rate_limit_per_hour: int = 600,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        http2: bool = False,
+        compress_requests: bool = False,
+        metrics_enabled: bool = False,
+        metrics_token: Optional[str] = None,
+        timing_sample_rate: float = 0.0,
+        validate_queries: bool = False,
+        combine_window_s: float = 0.0,
+        cache_ttl_s: float = 0.0,
+        cache_max_stale_s: float = 0.0,
+        cache_closed_ttl_s: float = 86400.0,
+        cache_max_entries: int = 1024,
+        cache_path: Optional[str] = None,
+        cache_max_bytes: int = 64 * 1024 * 1024,
+        learn_hot_queries: bool = False,
+        dedup_window_s: float = 0.0,
+        dedup_capacity: int = 100_000,
+        dedup_false_positive_rate: float = 0.001,
+        event_shipper_socket: Optional[str] = None,
+        max_response_bytes: Optional[int] = None,
+        hedge_percentile: float = 0.0,
+        hedge_budget_fraction: float = 0.05,
+        dns_cache_ttl_s: float = 60.0,
+        warm_connections: int = 2,
+        shutdown_timeout_s: float = 5.0,
     ) -> None:
         self.stats_api_key = stats_api_key or os.getenv("PLAUSIBLE_STATS_API_KEY")
         self.sites_api_key = sites_api_key or os.getenv("PLAUSIBLE_SITES_API_KEY")
         self.base_url = os.getenv("PLAUSIBLE_BASE_URL", base_url)
         self.timeout_s = int(os.getenv("PLAUSIBLE_TIMEOUT_S", str(timeout_s)))
         self.rate_limit_per_hour = int(os.getenv("PLAUSIBLE_RATE_LIMIT_PER_HOUR", str(rate_limit_per_hour)))
+        self.pool_maxsize = int(os.getenv("PLAUSIBLE_POOL_MAXSIZE", str(pool_maxsize)))
+        self.pool_block = _env_bool("PLAUSIBLE_POOL_BLOCK", pool_block)
+        self.http2 = _env_bool("PLAUSIBLE_HTTP2", http2)
+        self.compress_requests = _env_bool("PLAUSIBLE_COMPRESS_REQUESTS", compress_requests)
+        self.metrics_enabled = _env_bool("PLAUSIBLE_METRICS_ENABLED", metrics_enabled)
+        # Bearer token required by GET /plausible/metrics. Without one the route is open,
+        # so only mount the router where the network is internal.
+        self.metrics_token = os.getenv("PLAUSIBLE_METRICS_TOKEN", metrics_token)
+        self.timing_sample_rate = float(os.getenv("PLAUSIBLE_TIMING_SAMPLE_RATE", str(timing_sample_rate)))
+        self.validate_queries = _env_bool("PLAUSIBLE_VALIDATE_QUERIES", validate_queries)
+        self.combine_window_s = float(os.getenv("PLAUSIBLE_COMBINE_WINDOW_S", str(combine_window_s)))
+        # cache_ttl_s == 0 disables the stats cache.
+        self.cache_ttl_s = float(os.getenv("PLAUSIBLE_CACHE_TTL_S", str(cache_ttl_s)))
+        self.cache_max_stale_s = float(os.getenv("PLAUSIBLE_CACHE_MAX_STALE_S", str(cache_max_stale_s)))
+        # TTL for compare_stats periods that have already ended.
+        self.cache_closed_ttl_s = float(os.getenv("PLAUSIBLE_CACHE_CLOSED_TTL_S", str(cache_closed_ttl_s)))
+        self.cache_max_entries = int(os.getenv("PLAUSIBLE_CACHE_MAX_ENTRIES", str(cache_max_entries)))
+        # With a path the cache is an SQLite file shared by all worker processes.
+        self.cache_path = os.getenv("PLAUSIBLE_CACHE_PATH", cache_path)
+        self.cache_max_bytes = int(os.getenv("PLAUSIBLE_CACHE_MAX_BYTES", str(cache_max_bytes)))
+        self.learn_hot_queries = _env_bool("PLAUSIBLE_LEARN_HOT_QUERIES", learn_hot_queries)
+        # dedup_window_s == 0 disables duplicate-event suppression.
+        self.dedup_window_s = float(os.getenv("PLAUSIBLE_DEDUP_WINDOW_S", str(dedup_window_s)))
+        self.dedup_capacity = int(os.getenv("PLAUSIBLE_DEDUP_CAPACITY", str(dedup_capacity)))
+        self.dedup_false_positive_rate = float(
+            os.getenv("PLAUSIBLE_DEDUP_FALSE_POSITIVE_RATE", str(dedup_false_positive_rate))
+        )
+        # Unix socket of a running shipper process; events are handed to it instead of sent inline.
+        self.event_shipper_socket = os.getenv("PLAUSIBLE_EVENT_SHIPPER_SOCKET", event_shipper_socket)
+        raw_max_response = os.getenv("PLAUSIBLE_MAX_RESPONSE_BYTES")
+        self.max_response_bytes = int(raw_max_response) if raw_max_response else max_response_bytes
+        # hedge_percentile == 0 disables request hedging; e.g. 0.95 hedges calls slower than p95.
+        self.hedge_percentile = float(os.getenv("PLAUSIBLE_HEDGE_PERCENTILE", str(hedge_percentile)))
+        self.hedge_budget_fraction = float(os.getenv("PLAUSIBLE_HEDGE_BUDGET_FRACTION", str(hedge_budget_fraction)))
+        # dns_cache_ttl_s == 0 resolves the upstream host on every new connection.
+        self.dns_cache_ttl_s = float(os.getenv("PLAUSIBLE_DNS_CACHE_TTL_S", str(dns_cache_ttl_s)))
+        # Used by api.lifespan: connections opened at startup, and the drain deadline at shutdown.
+        self.warm_connections = int(os.getenv("PLAUSIBLE_WARM_CONNECTIONS", str(warm_connections)))
+        self.shutdown_timeout_s = float(os.getenv("PLAUSIBLE_SHUTDOWN_TIMEOUT_S", str(shutdown_timeout_s)))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() in ("1", "true", "yes", "on")
 
 
 @lru_cache(maxsize=1)
@@ -29,6 +110,85 @@ def get_settings() -> PlausibleSettings:
     return PlausibleSettings()
 
 
+def get_metrics() -> Optional[MetricsRegistry]:
+    return default_registry() if get_settings().metrics_enabled else None
+
+
+@lru_cache(maxsize=1)
+def get_cache() -> Optional[CacheBackend]:
+    """Process-wide stats cache shared by every client built from settings."""
+    s = get_settings()
+    if s.cache_ttl_s <= 0:
+        return None
+    if s.cache_path:
+        return SQLiteCache(s.cache_path, max_bytes=s.cache_max_bytes)
+    return MemoryCache(max_entries=s.cache_max_entries)
+
+
+@lru_cache(maxsize=1)
+def get_hot_queries() -> Optional[HotQueryRegistry]:
+    s = get_settings()
+    if s.cache_ttl_s <= 0 or not s.learn_hot_queries:
+        return None
+    return HotQueryRegistry()
+
+
+@lru_cache(maxsize=1)
+def get_deduplicator() -> Optional[EventDeduplicator]:
+    s = get_settings()
+    if s.dedup_window_s <= 0:
+        return None
+    return EventDeduplicator(
+        window_s=s.dedup_window_s,
+        capacity=s.dedup_capacity,
+        false_positive_rate=s.dedup_false_positive_rate,
+    )
+
+
+def get_batcher(base_url: str, stats_api_key: Optional[str]) -> Optional[QueryBatcher]:
+    """
+    Process-wide QueryBatcher per (base_url, stats key), so per-request clients
+    using the same key combine their concurrent queries.
+    """
+    if get_settings().combine_window_s <= 0 or not stats_api_key:
+        return None
+    return _batcher_for(base_url, hashlib.sha256(stats_api_key.encode("utf-8")).hexdigest())
+
+
+@lru_cache(maxsize=256)
+def _batcher_for(base_url: str, key_digest: str) -> QueryBatcher:
+    # Keyed by a digest so API keys are not held in the cache.
+    return QueryBatcher(window_s=get_settings().combine_window_s)
+
+
+@lru_cache(maxsize=1)
+def get_hedger() -> Optional[Hedger]:
+    s = get_settings()
+    if s.hedge_percentile <= 0:
+        return None
+    return Hedger(
+        percentile=s.hedge_percentile,
+        budget_fraction=s.hedge_budget_fraction,
+        rate_limit_per_hour=s.rate_limit_per_hour,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_dns_cache() -> Optional[DNSCache]:
+    s = get_settings()
+    if s.dns_cache_ttl_s <= 0:
+        return None
+    return DNSCache(ttl_s=s.dns_cache_ttl_s)
+
+
+@lru_cache(maxsize=1)
+def get_event_sink() -> Optional[ShipperSink]:
+    s = get_settings()
+    if not s.event_shipper_socket:
+        return None
+    return ShipperSink(s.event_shipper_socket)
+
+
 def get_client() -> PlausibleClient:
     s = get_settings()
     return PlausibleClient(
@@ -37,4 +197,23 @@ def get_client() -> PlausibleClient:
         base_url=s.base_url,
         timeout_s=s.timeout_s,
         rate_limit_per_hour=s.rate_limit_per_hour,
+        pool_maxsize=s.pool_maxsize,
+        pool_block=s.pool_block,
+        http2=s.http2,
+        compress_requests=s.compress_requests,
+        metrics=get_metrics(),
+        timing_sample_rate=s.timing_sample_rate,
+        validate_queries=s.validate_queries,
+        combine_window_s=s.combine_window_s,
+        batcher=get_batcher(s.base_url, s.stats_api_key),
+        cache=get_cache(),
+        cache_ttl_s=s.cache_ttl_s,
+        cache_max_stale_s=s.cache_max_stale_s,
+        cache_closed_ttl_s=s.cache_closed_ttl_s,
+        hot_queries=get_hot_queries(),
+        deduplicator=get_deduplicator(),
+        event_sink=get_event_sink(),
+        max_response_bytes=s.max_response_bytes,
+        hedger=get_hedger(),
+        dns_cache=get_dns_cache(),
     )
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import threading
+import time
+from typing import TYPE_CHECKING, Iterator, List, Optional, Set, Tuple
+
+from .events import Event
+
+if TYPE_CHECKING:
+    from .metrics import MetricsRegistry
+
+
+def describe_metrics(registry: MetricsRegistry) -> None:
+    registry.describe("plausible_events_deduplicated_total", "Events dropped as repeats within the dedup window.")
+
+
+def event_fingerprint(event: Event) -> bytes:
+    """16-byte digest of (domain, name, url, user_agent, client_ip, props)."""
+    props = json.dumps(event.props, sort_keys=True, separators=(",", ":"), default=str) if event.props else ""
+    key = "\x1f".join((event.domain, event.name, event.url, event.user_agent, event.client_ip or "", props))
+    return hashlib.blake2b(key.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 16-byte digests (double hashing on the two 64-bit halves)."""
+
+    __slots__ = ("num_bits", "num_hashes", "bits", "count")
+
+    def __init__(self, capacity: int, false_positive_rate: float) -> None:
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest: bytes) -> List[int]:
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def contains_positions(self, positions: List[int]) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def add_positions(self, positions: List[int]) -> None:
+        bits = self.bits
+        for p in positions:
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        return self.contains_positions(self._positions(digest))
+
+    def add(self, digest: bytes) -> None:
+        self.add_positions(self._positions(digest))
+
+    def estimated_false_positive_rate(self) -> float:
+        return (1.0 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class EventDeduplicator:
+    """
+    Suppresses repeats of the same event within window_s using rotating Bloom filters.
+
+    Time is cut into slices of window_s / (generations - 1); one filter per slice
+    is kept and the oldest dropped on rotation. A repeat within window_s is always
+    caught; an event is forgotten at most window_s * generations / (generations - 1)
+    after it was first seen.
+
+    Each filter is sized for capacity events per slice; the chance that a new event
+    is wrongly suppressed is about false_positive_rate while slices stay within
+    capacity (estimated_false_positive_rate() reports the current figure).
+    Memory is fixed: generations * ~1.44 * log2(1/p) * capacity bits.
+
+    seen() records an event at once. reserve() only holds it pending (repeats are
+    still suppressed meanwhile) until commit() records it after a successful send or
+    release() forgets it after a failed one, so a failed send can be retried.
+    """
+
+    def __init__(
+        self,
+        *,
+        window_s: float = 10.0,
+        capacity: int = 100_000,
+        false_positive_rate: float = 0.001,
+        generations: int = 2,
+    ) -> None:
+        if window_s <= 0:
+            raise ValueError("window_s must be > 0")
+        if capacity <= 0:
+            raise ValueError("capacity must be > 0")
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("false_positive_rate must be in (0, 1)")
+        if generations < 2:
+            raise ValueError("generations must be >= 2")
+        self.window_s = window_s
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.generations = generations
+        self.slice_s = window_s / (generations - 1)
+        # Each lookup probes every generation, so split the error budget between them.
+        self._per_filter_fp = false_positive_rate / generations
+        self._filters: List[BloomFilter] = [self._new_filter()]
+        self._slice_started = time.monotonic()
+        # Fingerprints of reserved events whose send is in flight.
+        self._pending: Set[bytes] = set()
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.suppressed = 0
+
+    def _new_filter(self) -> BloomFilter:
+        return BloomFilter(self.capacity, self._per_filter_fp)
+
+    def _rotate(self, now: float) -> None:
+        elapsed = int((now - self._slice_started) // self.slice_s)
+        if elapsed <= 0:
+            return
+        for _ in range(min(elapsed, self.generations)):
+            self._filters.insert(0, self._new_filter())
+        del self._filters[self.generations :]
+        self._slice_started += elapsed * self.slice_s
+
+    def seen(self, event: Event) -> bool:
+        """Record event; True if it is a repeat within the window (and should be dropped)."""
+        key = self.reserve(event)
+        if key is None:
+            return True
+        self.commit(key)
+        return False
+
+    def reserve(self, event: Event) -> Optional[bytes]:
+        """None if event is a repeat (seen or reserved); else a key for commit() / release()."""
+        key = event_fingerprint(event)
+        # All generations share num_bits / num_hashes, so positions are computed once.
+        positions = self._filters[0]._positions(key)
+        with self._lock:
+            self._rotate(time.monotonic())
+            self.checked += 1
+            if key in self._pending or any(bloom.contains_positions(positions) for bloom in self._filters):
+                self.suppressed += 1
+                return None
+            self._pending.add(key)
+            return key
+
+    def commit(self, key: bytes) -> None:
+        """Record a reserved event as seen."""
+        positions = self._filters[0]._positions(key)
+        with self._lock:
+            self._rotate(time.monotonic())
+            self._filters[0].add_positions(positions)
+            self._pending.discard(key)
+
+    def release(self, key: bytes) -> None:
+        """Forget a reserved event, so the next identical event is not suppressed."""
+        with self._lock:
+            self._pending.discard(key)
+
+    def estimated_false_positive_rate(self) -> float:
+        """Current chance that an unseen event is reported as seen."""
+        with self._lock:
+            miss = 1.0
+            for bloom in self._filters:
+                miss *= 1.0 - bloom.estimated_false_positive_rate()
+            return 1.0 - miss
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._filters[0].bits) * self.generations
+
+    def collect_metrics(self) -> Iterator[Tuple[str, dict, float]]:
+        """Gauges for MetricsRegistry collectors."""
+        yield "plausible_dedup_false_positive_rate_configured", {}, self.false_positive_rate
+        yield "plausible_dedup_false_positive_rate_estimated", {}, self.estimated_false_positive_rate()
+        yield "plausible_dedup_window_seconds", {}, self.window_s
+        yield "plausible_dedup_memory_bytes", {}, float(self.memory_bytes)
+
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional, Any
+from typing import Any, List, Optional
 
 
 class PlausibleError(Exception):
@@ -34,3 +34,19 @@ class PlausibleAPIError(PlausibleError):
         self.status_code = status_code
         self.response_text = response_text
         self.payload = payload
+
+
+class PlausibleQueryValidationError(PlausibleError):
+    """Raised before sending when a stats query fails local validation (see validation.QueryValidator)."""
+
+    def __init__(self, message: str, *, issues: Optional[List[Any]] = None) -> None:
+        super().__init__(message)
+        self.issues = list(issues or [])
+
+
+class PlausibleResponseTooLargeError(PlausibleError):
+    """Raised while reading an upstream response body larger than the client's max_response_bytes."""
+
+    def __init__(self, message: str, *, limit_bytes: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.limit_bytes = limit_bytes
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import sys
+from json.encoder import encode_basestring_ascii
+from typing import Any, Dict, Iterable, Optional
+
+from .models import EventPayload
+
+
+_COMPACT = json.JSONEncoder(separators=(",", ":"), ensure_ascii=True).encode
+
+
+class Event:
+    """
+    Compact runtime form of a Plausible event (see models.EventPayload).
+
+    Carries the request-level fields (user_agent, client_ip) alongside the payload
+    so the same record can be encoded for send_event or handed to a queue.
+    """
+
+    __slots__ = (
+        "domain",
+        "name",
+        "url",
+        "user_agent",
+        "client_ip",
+        "referrer",
+        "props",
+        "revenue",
+        "interactive",
+    )
+
+    def __init__(
+        self,
+        *,
+        domain: str,
+        name: str,
+        url: str,
+        user_agent: str,
+        client_ip: Optional[str] = None,
+        referrer: Optional[str] = None,
+        props: Optional[Dict[str, Any]] = None,
+        revenue: Optional[Dict[str, Any]] = None,
+        interactive: bool = True,
+    ) -> None:
+        self.domain = domain
+        self.name = name
+        self.url = url
+        self.user_agent = user_agent
+        self.client_ip = client_ip
+        self.referrer = referrer
+        self.props = props
+        self.revenue = revenue
+        self.interactive = interactive
+
+    def payload(self) -> EventPayload:
+        payload: EventPayload = {
+            "domain": self.domain,
+            "name": self.name,
+            "url": self.url,
+            "interactive": self.interactive,
+        }
+        if self.referrer is not None:
+            payload["referrer"] = self.referrer
+        if self.props is not None:
+            payload["props"] = self.props
+        if self.revenue is not None:
+            payload["revenue"] = self.revenue
+        return payload
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Event):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"Event(domain={self.domain!r}, name={self.name!r}, url={self.url!r})"
+
+
+class EventEncoder:
+    """
+    Encodes Event records straight to JSON bytes for POST /api/event.
+
+    Low-cardinality values (domain, event name) are encoded once and reused;
+    header dicts are built once per user agent and shared between calls.
+    Returned header dicts must be treated as read-only.
+
+    max_cached: per-cache entry bound; a cache is cleared when it fills up.
+    """
+
+    def __init__(self, *, max_cached: int = 4096) -> None:
+        self.max_cached = max_cached
+        self._fragments: Dict[str, bytes] = {}
+        self._headers: Dict[str, Dict[str, str]] = {}
+
+    def _fragment(self, value: str) -> bytes:
+        frag = self._fragments.get(value)
+        if frag is None:
+            if len(self._fragments) >= self.max_cached:
+                self._fragments.clear()
+            frag = encode_basestring_ascii(value).encode("ascii")
+            self._fragments[value] = frag
+        return frag
+
+    def encode(self, event: Event) -> bytes:
+        parts = [
+            b'{"domain":',
+            self._fragment(event.domain),
+            b',"name":',
+            self._fragment(event.name),
+            b',"url":',
+            encode_basestring_ascii(event.url).encode("ascii"),
+            b',"interactive":true' if event.interactive else b',"interactive":false',
+        ]
+        if event.referrer is not None:
+            parts.append(b',"referrer":')
+            parts.append(encode_basestring_ascii(event.referrer).encode("ascii"))
+        if event.props is not None:
+            parts.append(b',"props":')
+            parts.append(_COMPACT(event.props).encode("ascii"))
+        if event.revenue is not None:
+            parts.append(b',"revenue":')
+            parts.append(_COMPACT(event.revenue).encode("ascii"))
+        parts.append(b"}")
+        return b"".join(parts)
+
+    def encode_batch(self, events: Iterable[Event]) -> bytes:
+        """Encode several events into one JSON array buffer."""
+        return b"[" + b",".join([self.encode(e) for e in events]) + b"]"
+
+    def headers(self, event: Event, *, debug: bool = False) -> Dict[str, str]:
+        return self.request_headers(event.user_agent, event.client_ip, debug=debug)
+
+    def request_headers(self, user_agent: str, client_ip: Optional[str] = None, *, debug: bool = False) -> Dict[str, str]:
+        base = self._headers.get(user_agent)
+        if base is None:
+            if len(self._headers) >= self.max_cached:
+                self._headers.clear()
+            base = {
+                "Content-Type": "application/json",
+                "User-Agent": sys.intern(user_agent),
+            }
+            self._headers[user_agent] = base
+        if not client_ip and not debug:
+            return base
+        headers = dict(base)
+        if client_ip:
+            headers["X-Forwarded-For"] = client_ip
+        if debug:
+            headers["X-Debug-Request"] = "true"
+        return headers
@@ -0,0 +1,378 @@
+"""
+Resumable export of daily stats for many sites into local NDJSON or CSV files.
+
+Work is planned as (site × metric set × day) units. Units for the same site and
+day are fetched together through PlausibleClient.query_stats_many(), so metric
+sets sharing dimensions cost one upstream call. Units run concurrently on a
+thread pool and every call goes through the client's rate limiter.
+
+Rows are appended to one file per metric set ({out}/{metric_set}.ndjson|.csv).
+After each (site, day) group is written, its unit keys and the data file sizes
+are appended to {out}/checkpoint.ndjson. On restart, completed units are skipped
+and data files are truncated back to the last checkpointed size, so a crash
+never leaves duplicate or partial rows.
+
+    python -m backend.app.core.landing_page.plausible.export --out /tmp/export \\
+        --start 2024-01-01 --end 2024-01-31 \\
+        --metric-set totals=visitors,pageviews,bounce_rate \\
+        --metric-set pages=visitors,pageviews/event:page
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from .client import PlausibleClient
+from .errors import PlausibleAPIError, PlausibleRateLimitError
+from .models import StatsQuery
+from .validation import MAX_PAGINATION_LIMIT
+
+
+CHECKPOINT_FILE = "checkpoint.ndjson"
+FORMATS = ("ndjson", "csv")
+
+
+class MetricSet(NamedTuple):
+    name: str
+    metrics: Tuple[str, ...]
+    dimensions: Tuple[str, ...] = ()
+
+    @classmethod
+    def parse(cls, spec: str) -> "MetricSet":
+        """Parse NAME=METRIC[,METRIC...][/DIMENSION[,DIMENSION...]]."""
+        name, sep, rest = spec.partition("=")
+        if not sep or not name or not rest:
+            raise ValueError(f"invalid metric set {spec!r}; expected NAME=METRICS[/DIMENSIONS]")
+        metrics, _, dimensions = rest.partition("/")
+        return cls(name, tuple(m for m in metrics.split(",") if m), tuple(d for d in dimensions.split(",") if d))
+
+
+class WorkUnit(NamedTuple):
+    site_id: str
+    metric_set: MetricSet
+    day: date
+
+    @property
+    def key(self) -> str:
+        return f"{self.site_id}|{self.metric_set.name}|{self.day.isoformat()}"
+
+    def query(self, *, limit: int = MAX_PAGINATION_LIMIT, offset: int = 0) -> StatsQuery:
+        day = self.day.isoformat()
+        query: StatsQuery = {"site_id": self.site_id, "metrics": list(self.metric_set.metrics), "date_range": [day, day]}
+        if self.metric_set.dimensions:
+            query["dimensions"] = list(self.metric_set.dimensions)
+            query["pagination"] = {"limit": limit, "offset": offset}
+        return query
+
+
+def iter_days(start: date, end: date) -> Iterator[date]:
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def enumerate_sites(client: PlausibleClient, *, page_size: int = 100) -> List[str]:
+    """All site domains visible to the Sites API key, following the `after` cursor."""
+    sites: List[str] = []
+    after: Optional[str] = None
+    while True:
+        page = client.list_sites(after=after, limit=page_size)
+        sites.extend(site["domain"] for site in page.get("sites", []))
+        after = (page.get("meta") or {}).get("after")
+        if not after:
+            return sites
+
+
+def plan_units(sites: Iterable[str], metric_sets: Sequence[MetricSet], start: date, end: date) -> List[WorkUnit]:
+    return [WorkUnit(site, ms, day) for site in sites for day in iter_days(start, end) for ms in metric_sets]
+
+
+class ExportReport:
+    def __init__(self) -> None:
+        self.units_total = 0
+        self.units_skipped = 0
+        self.units_done = 0
+        self.rows = 0
+        self.failed: Dict[str, str] = {}
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    @property
+    def elapsed_s(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def units_per_s(self) -> float:
+        return self.units_done / self.elapsed_s if self.elapsed_s else 0.0
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.rows / self.elapsed_s if self.elapsed_s else 0.0
+
+    def format(self) -> str:
+        remaining = self.units_total - self.units_skipped - self.units_done - len(self.failed)
+        eta = remaining / self.units_per_s if self.units_per_s else float("inf")
+        return (
+            f"units {self.units_done + self.units_skipped}/{self.units_total} "
+            f"(skipped {self.units_skipped}, failed {len(self.failed)}) rows {self.rows} "
+            f"in {self.elapsed_s:.1f}s: {self.units_per_s:.2f} units/s {self.rows_per_s:.1f} rows/s"
+            + (f" eta {eta:.0f}s" if remaining > 0 and eta != float("inf") else "")
+        )
+
+
+class _Writer:
+    """Appends rows to per-metric-set files and checkpoints them, under one lock."""
+
+    def __init__(self, out_dir: str, fmt: str, metric_sets: Sequence[MetricSet]) -> None:
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.metric_sets = {ms.name: ms for ms in metric_sets}
+        self.lock = threading.Lock()
+        self.done: Set[str] = set()
+        offsets = self._load_checkpoint()
+        self.files: Dict[str, Any] = {}
+        for name in self.metric_sets:
+            path = self.path(name)
+            fh = open(path, "a+b")
+            fh.truncate(offsets.get(path, 0))
+            fh.seek(0, os.SEEK_END)
+            self.files[path] = fh
+            if fmt == "csv" and fh.tell() == 0:
+                fh.write(self._csv_line(["site_id", "date", *self.metric_sets[name].dimensions, *self.metric_sets[name].metrics]))
+        self.checkpoint = open(os.path.join(out_dir, CHECKPOINT_FILE), "a", encoding="utf-8")
+
+    def path(self, metric_set: str) -> str:
+        return os.path.join(self.out_dir, f"{metric_set}.{self.fmt}")
+
+    def _load_checkpoint(self) -> Dict[str, int]:
+        offsets: Dict[str, int] = {}
+        path = os.path.join(self.out_dir, CHECKPOINT_FILE)
+        if not os.path.exists(path):
+            return offsets
+        good = 0
+        with open(path, "r+b") as fh:
+            for line in fh:
+                if not line.endswith(b"\n"):
+                    break  # torn last line from a crash
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self.done.update(record["units"])
+                offsets.update(record["offsets"])
+                good += len(line)
+            # Drop the torn tail so the next record starts on a line of its own.
+            fh.truncate(good)
+        return offsets
+
+    @staticmethod
+    def _csv_line(values: Sequence[Any]) -> bytes:
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerow(values)
+        return buf.getvalue().encode("utf-8")
+
+    def _encode(self, unit: WorkUnit, rows: Sequence[Dict[str, Any]]) -> bytes:
+        ms = unit.metric_set
+        day = unit.day.isoformat()
+        if self.fmt == "csv":
+            return b"".join(self._csv_line([unit.site_id, day, *row.get("dimensions", ()), *row["metrics"]]) for row in rows)
+        out = []
+        for row in rows:
+            record: Dict[str, Any] = {"site_id": unit.site_id, "date": day}
+            record.update(zip(ms.dimensions, row.get("dimensions", ())))
+            record.update(zip(ms.metrics, row["metrics"]))
+            out.append(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+        return b"".join(out)
+
+    def write(self, results: Sequence[Tuple[WorkUnit, Sequence[Dict[str, Any]]]]) -> None:
+        chunks = [(self.path(unit.metric_set.name), self._encode(unit, rows)) for unit, rows in results]
+        with self.lock:
+            for path, data in chunks:
+                self.files[path].write(data)
+            offsets = {}
+            for path, fh in self.files.items():
+                fh.flush()
+                os.fsync(fh.fileno())
+                offsets[path] = fh.tell()
+            units = [unit.key for unit, _ in results]
+            self.checkpoint.write(json.dumps({"units": units, "offsets": offsets}) + "\n")
+            self.checkpoint.flush()
+            os.fsync(self.checkpoint.fileno())
+            self.done.update(units)
+
+    def close(self) -> None:
+        for fh in self.files.values():
+            fh.close()
+        self.checkpoint.close()
+
+
+class ExportJob:
+    """
+    Export daily stats for sites × metric sets × days into out_dir.
+
+    sites: site domains; None enumerates every site via the Sites API.
+    progress: called with the ExportReport every progress_interval_s while running.
+    Failed units (after max_attempts, including connection errors and timeouts, or
+    at once for a malformed response body) are reported and left unchecked, so the
+    next run retries them.
+    """
+
+    def __init__(
+        self,
+        client: PlausibleClient,
+        out_dir: str,
+        *,
+        start: date,
+        end: date,
+        metric_sets: Sequence[MetricSet],
+        sites: Optional[Sequence[str]] = None,
+        fmt: str = "ndjson",
+        workers: int = 4,
+        max_attempts: int = 3,
+        retry_backoff_s: float = 5.0,
+        progress: Optional[Callable[[ExportReport], None]] = None,
+        progress_interval_s: float = 10.0,
+    ) -> None:
+        if fmt not in FORMATS:
+            raise ValueError(f"fmt must be one of {FORMATS}")
+        if not metric_sets:
+            raise ValueError("at least one metric set is required")
+        if len({ms.name for ms in metric_sets}) != len(metric_sets):
+            raise ValueError("metric set names must be unique")
+        if end < start:
+            raise ValueError("end must not be before start")
+        self.client = client
+        self.out_dir = out_dir
+        self.start = start
+        self.end = end
+        self.metric_sets = list(metric_sets)
+        self.sites = list(sites) if sites is not None else None
+        self.fmt = fmt
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff_s = retry_backoff_s
+        self.progress = progress
+        self.progress_interval_s = progress_interval_s
+
+    def plan(self) -> List[WorkUnit]:
+        sites = self.sites if self.sites is not None else enumerate_sites(self.client)
+        return plan_units(sites, self.metric_sets, self.start, self.end)
+
+    def run(self) -> ExportReport:
+        os.makedirs(self.out_dir, exist_ok=True)
+        report = ExportReport()
+        units = self.plan()
+        report.units_total = len(units)
+        writer = _Writer(self.out_dir, self.fmt, self.metric_sets)
+        try:
+            groups: Dict[Tuple[str, date], List[WorkUnit]] = {}
+            for unit in units:
+                if unit.key in writer.done:
+                    report.units_skipped += 1
+                else:
+                    groups.setdefault((unit.site_id, unit.day), []).append(unit)
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                pending = {pool.submit(self._run_group, group, writer): group for group in groups.values()}
+                last_progress = time.perf_counter()
+                while pending:
+                    done, _ = wait(pending, timeout=self.progress_interval_s, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        group = pending.pop(future)
+                        try:
+                            report.rows += future.result()
+                            report.units_done += len(group)
+                        except Exception as exc:
+                            # Upstream errors and malformed bodies alike fail only this group.
+                            for unit in group:
+                                report.failed[unit.key] = f"{type(exc).__name__}: {exc}"
+                    if self.progress is not None and time.perf_counter() - last_progress >= self.progress_interval_s:
+                        self.progress(report)
+                        last_progress = time.perf_counter()
+        finally:
+            writer.close()
+            report.finished = time.perf_counter()
+        return report
+
+    def _run_group(self, units: List[WorkUnit], writer: _Writer) -> int:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                results = self._fetch_group(units)
+                break
+            except (PlausibleRateLimitError, PlausibleAPIError, OSError) as exc:
+                # requests' ConnectionError and Timeout are OSErrors and, like 429 and 5xx, transient.
+                retryable = not isinstance(exc, PlausibleAPIError) or (exc.status_code or 0) >= 500
+                if not retryable or attempt == self.max_attempts:
+                    raise
+                time.sleep(self.retry_backoff_s * attempt)
+        writer.write(results)
+        return sum(len(rows) for _, rows in results)
+
+    def _fetch_group(self, units: List[WorkUnit]) -> List[Tuple[WorkUnit, List[Dict[str, Any]]]]:
+        responses = self.client.query_stats_many([unit.query() for unit in units])
+        results = []
+        for unit, response in zip(units, responses):
+            rows = list(response.get("results") or [])
+            # Only dimensional queries paginate; keep reading while pages come back full.
+            page = rows
+            while unit.metric_set.dimensions and len(page) == MAX_PAGINATION_LIMIT:
+                page = list(self.client.query_stats(unit.query(offset=len(rows))).get("results") or [])
+                rows.extend(page)
+            results.append((unit, rows))
+        return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="output directory (also holds the checkpoint)")
+    parser.add_argument("--start", required=True, type=date.fromisoformat)
+    parser.add_argument("--end", required=True, type=date.fromisoformat)
+    parser.add_argument(
+        "--metric-set",
+        action="append",
+        required=True,
+        type=MetricSet.parse,
+        dest="metric_sets",
+        help="NAME=METRIC[,METRIC...][/DIMENSION[,...]]; repeatable",
+    )
+    parser.add_argument("--site", action="append", dest="sites", help="site domain; repeatable (default: all sites)")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--rate-limit-per-hour", type=int, default=600)
+    args = parser.parse_args(argv)
+
+    kwargs: Dict[str, Any] = {"rate_limit_per_hour": args.rate_limit_per_hour}
+    if args.base_url:
+        kwargs["base_url"] = args.base_url
+    with PlausibleClient(**kwargs) as client:
+        job = ExportJob(
+            client,
+            args.out,
+            start=args.start,
+            end=args.end,
+            metric_sets=args.metric_sets,
+            sites=args.sites,
+            fmt=args.format,
+            workers=args.workers,
+            progress=lambda report: print(report.format(), flush=True),
+        )
+        report = job.run()
+    print(report.format())
+    for key, error in sorted(report.failed.items()):
+        print(f"failed {key}: {error}")
+    if report.failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+from .rate_limiter import RateLimiter
+
+if TYPE_CHECKING:
+    from .metrics import MetricsRegistry
+
+
+def describe_metrics(registry: MetricsRegistry) -> None:
+    registry.describe(
+        "plausible_client_hedges_total",
+        "Hedged upstream calls by outcome (won, lost, error) or skip reason (budget, rate_limit).",
+    )
+
+
+class LatencyWindow:
+    """The last `size` latencies of one endpoint, for percentile lookups."""
+
+    __slots__ = ("_samples", "_sorted")
+
+    def __init__(self, size: int = 512) -> None:
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._sorted: Optional[list] = None
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._sorted = None
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank q-quantile (0 < q < 1), or None without samples."""
+        if not self._samples:
+            return None
+        ordered = self._sorted
+        if ordered is None:
+            ordered = self._sorted = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class Hedger:
+    """
+    Sends a second copy of a slow idempotent request and keeps whichever answers first.
+
+    The hedge delay for an endpoint is the `percentile` of its recent latencies,
+    clamped to [min_delay_s, max_delay_s]; endpoints with fewer than min_samples
+    recorded calls are never hedged. Hedges draw from a budget of budget_fraction
+    of rate_limit_per_hour, so at most that share of calls is ever duplicated.
+
+    Both attempts run on a worker pool; the loser cannot be interrupted mid-flight,
+    so its response is closed as soon as it arrives (returning the connection to
+    the pool). When the pool is busy the request is sent inline without hedging.
+    One Hedger is meant to be shared by every client in a process so latency
+    history survives per-request clients.
+    """
+
+    def __init__(
+        self,
+        *,
+        percentile: float = 0.95,
+        min_delay_s: float = 0.05,
+        max_delay_s: Optional[float] = None,
+        min_samples: int = 20,
+        window: int = 512,
+        budget_fraction: float = 0.05,
+        rate_limit_per_hour: int = 600,
+        max_workers: int = 32,
+    ) -> None:
+        if not 0 < percentile < 1:
+            raise ValueError("percentile must be in (0, 1)")
+        if not 0 < budget_fraction <= 1:
+            raise ValueError("budget_fraction must be in (0, 1]")
+        if max_workers < 2:
+            raise ValueError("max_workers must be >= 2")
+        self.percentile = percentile
+        self.min_delay_s = min_delay_s
+        self.max_delay_s = max_delay_s
+        self.min_samples = min_samples
+        self.window = window
+        self.budget_fraction = budget_fraction
+        self.budget = RateLimiter(capacity=max(1, int(rate_limit_per_hour * budget_fraction)), refill_window_s=3600)
+        self.max_workers = max_workers
+        self._windows: Dict[str, LatencyWindow] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plausible-hedge")
+        self._in_flight = 0
+
+    def delay_for(self, endpoint: str) -> Optional[float]:
+        """Seconds to wait before hedging a call to endpoint, or None to not hedge it."""
+        with self._lock:
+            latencies = self._windows.get(endpoint)
+            if latencies is None or len(latencies) < self.min_samples:
+                return None
+            delay = latencies.percentile(self.percentile)
+        delay = max(delay, self.min_delay_s)
+        if self.max_delay_s is not None:
+            delay = min(delay, self.max_delay_s)
+        return delay
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            latencies = self._windows.get(endpoint)
+            if latencies is None:
+                latencies = self._windows[endpoint] = LatencyWindow(self.window)
+            latencies.record(seconds)
+
+    def run(
+        self,
+        endpoint: str,
+        send: Callable[[], Any],
+        *,
+        acquire: Optional[Callable[[], bool]] = None,
+        on_hedge: Optional[Callable[[str, str], None]] = None,
+    ) -> Any:
+        """
+        Call send(), hedging it with a second send() if it is slower than delay_for(endpoint).
+
+        acquire() is asked for a token (e.g. the client's rate limiter) before hedging.
+        on_hedge(endpoint, outcome) reports won / lost / error for sent hedges and
+        budget / rate_limit for hedges skipped.
+        """
+        delay = self.delay_for(endpoint)
+        if delay is None or not self._reserve(2):
+            return self._timed(endpoint, send)
+
+        primary = self._submit(endpoint, send)
+        done, _ = wait((primary,), timeout=delay)
+        if done:
+            self._release(1)
+            return primary.result()
+
+        reason = None
+        if not self.budget.try_acquire():
+            reason = "budget"
+        elif acquire is not None and not acquire():
+            reason = "rate_limit"
+        if reason is not None:
+            self._release(1)
+            if on_hedge is not None:
+                on_hedge(endpoint, reason)
+            return primary.result()
+
+        hedge = self._submit(endpoint, send)
+        attempts = (primary, hedge)
+        pending = set(attempts)
+        winner: Optional[Future] = None
+        while pending and winner is None:
+            _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in attempts if f.done() and f.exception() is None), None)
+        for future in attempts:
+            if future is not winner:
+                future.add_done_callback(_discard)
+        if on_hedge is not None:
+            on_hedge(endpoint, "error" if winner is None else "won" if winner is hedge else "lost")
+        if winner is None:
+            return primary.result()
+        return winner.result()
+
+    def _timed(self, endpoint: str, send: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        resp = send()
+        self.record(endpoint, time.perf_counter() - started)
+        return resp
+
+    def _submit(self, endpoint: str, send: Callable[[], Any]) -> "Future[Any]":
+        future = self._executor.submit(self._timed, endpoint, send)
+        future.add_done_callback(lambda _: self._release(1))
+        return future
+
+    def _reserve(self, slots: int) -> bool:
+        # Held until each attempt finishes; the primary's spare slot is given back
+        # at once when no hedge is sent.
+        with self._lock:
+            if self._in_flight + slots > self.max_workers:
+                return False
+            self._in_flight += slots
+            return True
+
+    def _release(self, slots: int) -> None:
+        with self._lock:
+            self._in_flight -= slots
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def collect_metrics(self) -> Iterator[Tuple[str, dict, float]]:
+        """Gauges for MetricsRegistry collectors."""
+        with self._lock:
+            endpoints = list(self._windows)
+        for endpoint in endpoints:
+            delay = self.delay_for(endpoint)
+            if delay is not None:
+                yield "plausible_hedge_delay_seconds", {"endpoint": endpoint}, delay
+        yield "plausible_hedge_budget_fraction", {}, self.budget_fraction
+
+
+def _discard(future: "Future[Any]") -> None:
+    """Release the losing attempt's response (and its connection) once it arrives."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    close = getattr(future.result(), "close", None)
+    if close is not None:
+        close()
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Optional
+
+from .metrics import SIZE_BUCKETS_BYTES, MetricsRegistry
+
+
+_STATIC_ENDPOINTS = frozenset(
+    {
+        "/api/v2/query",
+        "/api/event",
+        "/api/v1/sites",
+        "/api/v1/sites/teams",
+        "/api/v1/sites/goals",
+        "/api/v1/sites/guests",
+        "/api/v1/sites/shared-links",
+    }
+)
+
+
+def endpoint_label(path: str) -> str:
+    """Map a request path to a low-cardinality endpoint label (ids replaced by placeholders)."""
+    if path in _STATIC_ENDPOINTS:
+        return path
+    if path.startswith("/api/v1/sites/goals/"):
+        return "/api/v1/sites/goals/{goal_id}"
+    if path.startswith("/api/v1/sites/guests/"):
+        return "/api/v1/sites/guests/{email}"
+    if path.startswith("/api/v1/sites/"):
+        return "/api/v1/sites/{site_id}"
+    return "other"
+
+
+class RequestContext:
+    """State of one upstream call, passed to RequestHook callbacks."""
+
+    __slots__ = (
+        "method",
+        "url",
+        "endpoint",
+        "started_at",
+        "duration_s",
+        "rate_limit_wait_s",
+        "status_code",
+        "response_bytes",
+        "retries",
+        "error",
+    )
+
+    def __init__(self, method: str, url: str, endpoint: str, *, rate_limit_wait_s: float = 0.0) -> None:
+        self.method = method
+        self.url = url
+        self.endpoint = endpoint
+        self.started_at = time.perf_counter()
+        self.duration_s = 0.0
+        self.rate_limit_wait_s = rate_limit_wait_s
+        self.status_code: Optional[int] = None
+        self.response_bytes = 0
+        self.retries = 0
+        self.error: Optional[BaseException] = None
+
+    def finish(self, resp: Any = None, error: Optional[BaseException] = None) -> None:
+        self.duration_s = time.perf_counter() - self.started_at
+        self.error = error
+        if resp is not None:
+            self.status_code = resp.status_code
+            # Streamed bodies are not read here; fall back to Content-Length.
+            # httpx marks unread streamed responses with is_stream_consumed=False.
+            if getattr(resp, "_content_consumed", True) and getattr(resp, "is_stream_consumed", True):
+                self.response_bytes = len(resp.content or b"")
+            else:
+                self.response_bytes = int(resp.headers.get("Content-Length") or 0)
+            retries = getattr(getattr(resp, "raw", None), "retries", None)
+            if retries is not None:
+                self.retries = len(getattr(retries, "history", ()) or ())
+
+
+class RequestHook:
+    """
+    Base class for request start/end callbacks on PlausibleClient.
+    Hooks run synchronously on the calling thread and must not raise.
+    """
+
+    def on_request_start(self, ctx: RequestContext) -> None:
+        pass
+
+    def on_request_end(self, ctx: RequestContext) -> None:
+        pass
+
+
+class MetricsHook(RequestHook):
+    """Records per-endpoint counters and histograms into a MetricsRegistry."""
+
+    def __init__(self, registry: MetricsRegistry) -> None:
+        self.registry = registry
+        registry.describe("plausible_client_requests_total", "Upstream Plausible API calls by endpoint and status.")
+        registry.describe("plausible_client_request_duration_seconds", "Upstream call latency by endpoint.")
+        registry.describe(
+            "plausible_client_response_bytes",
+            "Upstream response body size by endpoint.",
+            buckets=SIZE_BUCKETS_BYTES,
+        )
+        registry.describe("plausible_client_retries_total", "Retries performed by the transport (urllib3 Retry).")
+        registry.describe("plausible_client_rate_limited_total", "Upstream 429 responses by endpoint.")
+        registry.describe("plausible_client_errors_total", "Upstream calls that raised before a response.")
+        registry.describe("plausible_rate_limiter_wait_seconds", "Time spent blocked in RateLimiter.acquire().")
+        registry.describe("plausible_client_queries_combined_total", "Stats queries answered by another query's upstream call.")
+
+    def on_request_end(self, ctx: RequestContext) -> None:
+        reg = self.registry
+        endpoint = {"endpoint": ctx.endpoint}
+        reg.observe("plausible_client_request_duration_seconds", ctx.duration_s, endpoint)
+        reg.observe("plausible_rate_limiter_wait_seconds", ctx.rate_limit_wait_s)
+        if ctx.error is not None:
+            reg.inc("plausible_client_errors_total", labels={"endpoint": ctx.endpoint, "error": type(ctx.error).__name__})
+            return
+        reg.inc(
+            "plausible_client_requests_total",
+            labels={"endpoint": ctx.endpoint, "method": ctx.method, "status": str(ctx.status_code)},
+        )
+        reg.observe("plausible_client_response_bytes", ctx.response_bytes, endpoint)
+        if ctx.retries:
+            reg.inc("plausible_client_retries_total", ctx.retries, endpoint)
+        if ctx.status_code == 429:
+            reg.inc("plausible_client_rate_limited_total", labels=endpoint)
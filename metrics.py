@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import weakref
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _labels(labels: Optional[Dict[str, str]]) -> Labels:
+    if not labels:
+        return ()
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels)
+    if extra is not None:
+        items.append(extra)
+    if not items:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in items)
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Minimal thread-safe metrics registry (counters, gauges, histograms)
+    rendered in the Prometheus text exposition format.
+
+    Collectors are objects exposing collect_metrics() -> Iterable[(name, labels, value)]
+    whose samples are rendered as gauges at scrape time (e.g. connection pool stats).
+    They are held weakly so short-lived clients do not leak.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._buckets: Dict[str, Sequence[float]] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: "weakref.WeakSet" = weakref.WeakSet()
+
+    def describe(self, name: str, help_text: str, *, buckets: Optional[Sequence[float]] = None) -> None:
+        self._help[name] = help_text
+        if buckets is not None:
+            self._buckets[name] = tuple(sorted(buckets))
+
+    def inc(self, name: str, value: float = 1.0, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(self._buckets.get(name, LATENCY_BUCKETS_S))
+            hist.observe(value)
+
+    def add_collector(self, collector: object) -> None:
+        with self._lock:
+            self._collectors.add(collector)
+
+    def counter_value(self, name: str, labels: Optional[Dict[str, str]] = None) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_labels(labels), 0.0)
+
+    def histogram_count(self, name: str, labels: Optional[Dict[str, str]] = None) -> int:
+        with self._lock:
+            hist = self._histograms.get(name, {}).get(_labels(labels))
+            return hist.count if hist is not None else 0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def _collected_gauges(self) -> Dict[str, Dict[Labels, float]]:
+        gauges: Dict[str, Dict[Labels, float]] = {}
+        for collector in list(self._collectors):
+            for name, labels, value in collector.collect_metrics():
+                series = gauges.setdefault(name, {})
+                key = _labels(labels)
+                series[key] = series.get(key, 0.0) + value
+        return gauges
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            gauges = {n: dict(s) for n, s in self._gauges.items()}
+            histograms = {
+                n: {k: (h.buckets, list(h.counts), h.total, h.count) for k, h in s.items()}
+                for n, s in self._histograms.items()
+            }
+        for name, series in self._collected_gauges().items():
+            gauges.setdefault(name, {}).update(series)
+
+        lines: List[str] = []
+
+        def header(name: str, kind: str) -> None:
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name in sorted(counters):
+            header(name, "counter")
+            for labels, value in sorted(counters[name].items()):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for name in sorted(gauges):
+            header(name, "gauge")
+            for labels, value in sorted(gauges[name].items()):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for name in sorted(histograms):
+            header(name, "histogram")
+            for labels, (buckets, counts, total, count) in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, n in zip(list(buckets) + [float("inf")], counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+_default_registry: Optional[MetricsRegistry] = None
+_default_lock = threading.Lock()
+
+
+def default_registry() -> MetricsRegistry:
+    """Process-wide registry used by the FastAPI router's /metrics route."""
+    global _default_registry
+    if _default_registry is None:
+        with _default_lock:
+            if _default_registry is None:
+                _default_registry = MetricsRegistry()
+    return _default_registry
+
+
+def serve_prometheus(registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 0) -> Any:
+    """
+    Serve registry in Prometheus text format at GET /metrics from a daemon thread,
+    for processes without the FastAPI app (e.g. the event shipper). Returns the
+    http.server instance; server_address holds the bound port, shutdown() stops it.
+    """
+    import http.server
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="plausible-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from .cache import cache_key
+from .models import StatsQuery
+from .rate_limiter import RateLimiter
+
+if TYPE_CHECKING:
+    from .client import PlausibleClient
+
+
+class HotQueryRegistry:
+    """
+    Stats queries worth keeping warm.
+
+    Queries come from two places:
+    - pinned: passed in or add()-ed explicitly, always refreshed;
+    - learned: record()-ed from live traffic by PlausibleClient (hot_queries=...).
+      Each hit adds 1 to a score that decay() multiplies down, so the top
+      max_learned queries with score >= min_score are the recently popular ones.
+    """
+
+    def __init__(
+        self,
+        queries: Iterable[StatsQuery] = (),
+        *,
+        max_learned: int = 20,
+        min_score: float = 3.0,
+        decay_factor: float = 0.5,
+        max_tracked: int = 1000,
+    ) -> None:
+        self.max_learned = max_learned
+        self.min_score = min_score
+        self.decay_factor = decay_factor
+        self.max_tracked = max_tracked
+        self._pinned: Dict[str, StatsQuery] = {cache_key(q): q for q in queries}
+        # key -> [query, score]
+        self._learned: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def add(self, query: StatsQuery) -> None:
+        with self._lock:
+            self._pinned[cache_key(query)] = query
+
+    def remove(self, query: StatsQuery) -> None:
+        key = cache_key(query)
+        with self._lock:
+            self._pinned.pop(key, None)
+            self._learned.pop(key, None)
+
+    def record(self, query: StatsQuery, key: Optional[str] = None) -> None:
+        key = key or cache_key(query)
+        with self._lock:
+            if key in self._pinned:
+                return
+            item = self._learned.get(key)
+            if item is not None:
+                item[1] += 1.0
+                return
+            if len(self._learned) >= self.max_tracked:
+                coldest = min(self._learned, key=lambda k: self._learned[k][1])
+                del self._learned[coldest]
+            self._learned[key] = [query, 1.0]
+
+    def decay(self) -> None:
+        with self._lock:
+            for key in list(self._learned):
+                item = self._learned[key]
+                item[1] *= self.decay_factor
+                if item[1] < 0.1:
+                    del self._learned[key]
+
+    def hot(self) -> List[Tuple[str, StatsQuery]]:
+        """(cache key, query) pairs: pinned first, then learned by descending score."""
+        with self._lock:
+            learned = sorted(
+                ((key, item) for key, item in self._learned.items() if item[1] >= self.min_score),
+                key=lambda kv: -kv[1][1],
+            )[: self.max_learned]
+            return list(self._pinned.items()) + [(key, item[0]) for key, item in learned]
+
+
+class Prewarmer:
+    """
+    Background thread refreshing hot queries in the client's cache before they expire.
+
+    Every interval_s it refreshes each hot query that is missing from the cache or
+    expires within refresh_ahead_s. Refreshes draw from a reserved budget of
+    reserved_fraction of the client's rate limit and never wait on the client's own
+    limiter: when either is empty the cycle stops, so foreground calls keep priority.
+    """
+
+    def __init__(
+        self,
+        client: PlausibleClient,
+        registry: Optional[HotQueryRegistry] = None,
+        *,
+        reserved_fraction: float = 0.1,
+        refresh_ahead_s: float = 30.0,
+        interval_s: float = 10.0,
+    ) -> None:
+        if client.cache is None:
+            raise ValueError("Prewarmer requires a client configured with cache=")
+        registry = registry or client.hot_queries
+        if registry is None:
+            raise ValueError("Prewarmer requires a HotQueryRegistry (pass registry= or client hot_queries=)")
+        if not 0 < reserved_fraction <= 1:
+            raise ValueError("reserved_fraction must be in (0, 1]")
+        self.client = client
+        self.registry = registry
+        self.refresh_ahead_s = refresh_ahead_s
+        self.interval_s = interval_s
+        limiter = client.rate_limiter
+        if client.metrics is not None:
+            client.metrics.describe("plausible_prewarm_skipped_total", "Prewarm cycles cut short, by reason (budget, rate_limit).")
+        self.budget = RateLimiter(
+            capacity=max(1, int(limiter.capacity * reserved_fraction)),
+            refill_window_s=int(limiter.refill_window_s),
+        )
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        """Run one refresh cycle; returns the number of queries refreshed."""
+        cache = self.client.cache
+        refreshed = 0
+        now = time.time()
+        for key, query in self.registry.hot():
+            if self._stop.is_set():
+                break
+            entry = cache.get(key)
+            if entry is not None and entry.expires_at - now > self.refresh_ahead_s:
+                continue
+            outcome = self.client.refresh_if_idle(query, budget=self.budget, source="prewarm")
+            if outcome == "refreshed":
+                refreshed += 1
+            elif outcome in ("budget", "rate_limit"):
+                self._skipped(outcome)
+                break
+            # "in_flight": another refresh is writing it; "error": retried next cycle.
+        self.registry.decay()
+        return refreshed
+
+    def start(self) -> "Prewarmer":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="plausible-prewarm", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval_s)
+
+    def _skipped(self, reason: str) -> None:
+        if self.client.metrics is not None:
+            self.client.metrics.inc("plausible_prewarm_skipped_total", labels={"reason": reason})
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import threading
 import time
+from typing import Optional
 
 
 class RateLimiter:
@@ -11,7 +12,10 @@ class RateLimiter:
     capacity: max tokens per window
     refill_window_s: seconds to fully refill the bucket from 0 to capacity
 
-    acquire() blocks until a token is available, then consumes one token.
+    acquire() blocks until a token is available, then consumes one token,
+    and returns the number of seconds spent waiting.
+    try_acquire() consumes a token only if one is available right now.
+    release() returns a token that was acquired but not used.
     Thread-safe for simple SDK usage.
     """
 
@@ -36,15 +40,30 @@ class RateLimiter:
         self._tokens = min(self.capacity, self._tokens + elapsed * rate_per_sec)
         self._last_refill = now
 
-    def acquire(self) -> None:
+    def acquire(self) -> float:
+        started: Optional[float] = None
         while True:
             with self._lock:
                 self._refill()
                 if self._tokens >= 1.0:
                     self._tokens -= 1.0
-                    return
+                    return 0.0 if started is None else time.monotonic() - started
                 # time until next token
                 rate_per_sec = self.capacity / self.refill_window_s
                 needed = 1.0 - self._tokens
                 wait_s = max(needed / rate_per_sec, 0.01)
+            if started is None:
+                started = time.monotonic()
             time.sleep(min(wait_s, 1.0))
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    def release(self) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1.0)
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class DNSCache:
+    """
+    Caches host name resolution for ttl_s so new pooled connections skip the lookup.
+
+    If a refresh fails, the expired addresses keep being used for up to stale_if_error_s,
+    so a resolver hiccup does not fail requests to a host whose address is known.
+    invalidate() drops a host after a failed connect, forcing a fresh lookup on the
+    next attempt. Thread-safe; lookups for different hosts do not block each other.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_s: float = 60.0,
+        stale_if_error_s: float = 300.0,
+        getaddrinfo: Callable[..., List[Any]] = socket.getaddrinfo,
+    ) -> None:
+        if ttl_s <= 0:
+            raise ValueError("ttl_s must be > 0")
+        self.ttl_s = ttl_s
+        self.stale_if_error_s = stale_if_error_s
+        self._getaddrinfo = getaddrinfo
+        # (host, port) -> (addresses, expires_at)
+        self._entries: Dict[Tuple[str, int], Tuple[List[str], float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, host: str, port: int) -> List[str]:
+        """IP addresses for host, in resolver order."""
+        key = (host, port)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and now < entry[1]:
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        try:
+            infos = self._getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        except OSError:
+            if entry is not None and now < entry[1] + self.stale_if_error_s:
+                return entry[0]
+            raise
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        if not addresses:
+            raise socket.gaierror(f"no addresses for {host!r}")
+        with self._lock:
+            self._entries[key] = (addresses, now + self.ttl_s)
+        return addresses
+
+    def invalidate(self, host: str, port: Optional[int] = None) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == host and (port is None or k[1] == port)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def collect_metrics(self) -> Iterator[Tuple[str, dict, float]]:
+        """Gauges for MetricsRegistry collectors."""
+        yield "plausible_dns_cache_hits", {}, float(self.hits)
+        yield "plausible_dns_cache_misses", {}, float(self.misses)
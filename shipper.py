@@ -0,0 +1,622 @@
+"""
+Out-of-process event shipping.
+
+Web workers hand events to one sidecar shipper process per host, which owns the
+upstream connection pool, rate limiter and retries for POST /api/event.
+
+Producer side (in each web worker): ShipperSink, passed as PlausibleClient(event_sink=...).
+Each worker process creates its own single-producer/single-consumer ring in shared
+memory and registers it with the shipper over a Unix domain socket; submitting an
+event is then an encode plus a copy into the ring. Where shared memory cannot be
+used (no multiprocessing.shared_memory, or a CPU without total store order, see
+shm_supported()) frames are written to the socket instead.
+
+Consumer side: EventShipper, normally run as
+
+    python -m backend.app.core.landing_page.plausible.shipper --socket /run/plausible-events.sock
+
+(add --metrics-port 9464 to expose its send counters and upstream latencies to Prometheus).
+
+Rings outlive a killed worker: once registered, a segment belongs to the shipper,
+which drains what is left after the worker's socket closes and then unlinks it.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import platform
+import re
+import select
+import signal
+import socket
+import struct
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .events import Event, EventEncoder
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------
+# Frame encoding
+# ----------------
+_FRAME_HEAD = struct.Struct("<HH")
+
+
+def encode_frame(event: Event, encoder: EventEncoder) -> bytes:
+    """user_agent length, client_ip length, user_agent, client_ip, JSON body."""
+    ua = event.user_agent.encode("utf-8")
+    ip = (event.client_ip or "").encode("ascii")
+    return b"".join((_FRAME_HEAD.pack(len(ua), len(ip)), ua, ip, encoder.encode(event)))
+
+
+def decode_frame(frame: bytes) -> Tuple[bytes, str, Optional[str]]:
+    """Returns (body, user_agent, client_ip)."""
+    ua_len, ip_len = _FRAME_HEAD.unpack_from(frame)
+    start = _FRAME_HEAD.size
+    ua = frame[start : start + ua_len].decode("utf-8")
+    ip = frame[start + ua_len : start + ua_len + ip_len].decode("ascii") or None
+    return frame[start + ua_len + ip_len :], ua, ip
+
+
+# -----------------
+# Shared-memory ring
+# -----------------
+def shm_supported() -> bool:
+    """
+    The ring publishes positions with plain aligned 8-byte stores and no fences,
+    which is only safe across processes on total-store-order CPUs (x86/x86-64).
+    """
+    try:
+        from multiprocessing import shared_memory  # noqa: F401
+    except ImportError:
+        return False
+    return platform.machine().lower() in ("x86_64", "amd64", "i386", "i686", "x86")
+
+
+_U64 = struct.Struct("<Q")
+_U32 = struct.Struct("<I")
+_WRITE_POS = 0  # producer-owned, own cache line
+_READ_POS = 64  # consumer-owned, own cache line
+_MAGIC_POS = 120  # written once by create(), checked by attach()
+_MAGIC = struct.Struct("<4sI")
+_RING_MAGIC = b"PLER"
+_RING_VERSION = 1
+_HEADER = 128
+_WRAP = 0xFFFFFFFF
+# Names of segments made by EventRing.create(); the shipper attaches to no others.
+_RING_NAME = re.compile(r"plausible-ring-[0-9]+-[0-9a-f]{8}\Z")
+
+
+class EventRing:
+    """
+    Single-producer/single-consumer byte ring in a SharedMemory segment.
+
+    Records are a u32 length followed by the payload, padded to 4 bytes so a length
+    never straddles the end; a _WRAP length marks the unused tail before wrapping.
+    Positions are monotonically increasing u64 byte counts (offset = pos % capacity),
+    so full and empty are never ambiguous. Each side only writes its own position.
+    """
+
+    def __init__(self, shm: Any) -> None:
+        self.shm = shm
+        self.buf = shm.buf
+        self.capacity = len(shm.buf) - _HEADER
+        self.capacity -= self.capacity % 4
+        self._write = _U64.unpack_from(self.buf, _WRITE_POS)[0]
+        self._read = _U64.unpack_from(self.buf, _READ_POS)[0]
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @classmethod
+    def create(cls, size: int = 1 << 20, name: Optional[str] = None) -> "EventRing":
+        from multiprocessing import shared_memory
+
+        shm = shared_memory.SharedMemory(name=name or f"plausible-ring-{os.getpid()}-{uuid.uuid4().hex[:8]}", create=True, size=_HEADER + size)
+        shm.buf[:_HEADER] = bytes(_HEADER)
+        _MAGIC.pack_into(shm.buf, _MAGIC_POS, _RING_MAGIC, _RING_VERSION)
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, name: str) -> "EventRing":
+        """Map an existing ring; ValueError if the segment was not made by create()."""
+        from multiprocessing import shared_memory
+
+        shm = shared_memory.SharedMemory(name=name)
+        # Before 3.13 attaching also registers the segment with this process's
+        # resource tracker, which would unlink it when the shipper exits.
+        _untrack(shm)
+        if len(shm.buf) < _HEADER + 8 or _MAGIC.unpack_from(shm.buf, _MAGIC_POS) != (_RING_MAGIC, _RING_VERSION):
+            shm.close()
+            raise ValueError(f"shared memory segment {name!r} is not an event ring")
+        return cls(shm)
+
+    def push(self, payload: bytes) -> bool:
+        """Producer: copy payload into the ring; False if it does not fit right now."""
+        n = len(payload)
+        padded = (4 + n + 3) & ~3
+        if padded > self.capacity // 2:
+            return False
+        buf = self.buf
+        cap = self.capacity
+        write = self._write
+        read = _U64.unpack_from(buf, _READ_POS)[0]
+        off = write % cap
+        tail = cap - off
+        if padded > tail:
+            if write + tail + padded - read > cap:
+                return False
+            _U32.pack_into(buf, _HEADER + off, _WRAP)
+            write += tail
+            off = 0
+        elif write + padded - read > cap:
+            return False
+        start = _HEADER + off
+        buf[start + 4 : start + 4 + n] = payload
+        _U32.pack_into(buf, start, n)
+        write += padded
+        self._write = write
+        _U64.pack_into(buf, _WRITE_POS, write)  # publish
+        return True
+
+    def pop_many(self, max_items: int = 256) -> List[bytes]:
+        """Consumer: take up to max_items payloads."""
+        buf = self.buf
+        cap = self.capacity
+        read = self._read
+        write = _U64.unpack_from(buf, _WRITE_POS)[0]
+        out: List[bytes] = []
+        while read < write and len(out) < max_items:
+            off = read % cap
+            n = _U32.unpack_from(buf, _HEADER + off)[0]
+            if n == _WRAP:
+                read += cap - off
+                continue
+            if 4 + n > cap // 2:
+                # push() never writes such a record: the producer side is corrupt.
+                raise ValueError(f"corrupt record length {n} in ring {self.name!r}")
+            start = _HEADER + off + 4
+            out.append(bytes(buf[start : start + n]))
+            read += (4 + n + 3) & ~3
+        if read != self._read:
+            self._read = read
+            _U64.pack_into(buf, _READ_POS, read)
+        return out
+
+    def pending_bytes(self) -> int:
+        return _U64.unpack_from(self.buf, _WRITE_POS)[0] - _U64.unpack_from(self.buf, _READ_POS)[0]
+
+    def close(self, *, unlink: bool = False) -> None:
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _untrack(shm: Any) -> None:
+    try:
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    except Exception:
+        pass
+
+
+# -------------
+# Producer side
+# -------------
+# Control/fallback stream: 1-byte kind, u32 length, body.
+_KIND_RING = b"R"
+_KIND_FRAME = b"F"
+_MSG_HEAD = struct.Struct("<cI")
+
+
+class EventSink:
+    """Destination for events taken off the request path (see PlausibleClient(event_sink=...))."""
+
+    def submit(self, event: Event) -> bool:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class ShipperSink(EventSink):
+    """
+    Hands events to an EventShipper listening on socket_path.
+
+    Connects lazily and again after fork, so it can be created before gunicorn forks
+    workers. submit() returns False when the ring is full or the shipper is
+    unreachable; PlausibleClient then sends the event itself.
+
+    A shipper that went away is noticed within reconnect_interval_s; events pushed
+    to its ring in that gap are sent only if it drained them before exiting.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        *,
+        ring_size: int = 1 << 20,
+        use_shm: Optional[bool] = None,
+        reconnect_interval_s: float = 1.0,
+    ) -> None:
+        self.socket_path = socket_path
+        self.ring_size = ring_size
+        self.use_shm = shm_supported() if use_shm is None else use_shm
+        self.reconnect_interval_s = reconnect_interval_s
+        self._encoder = EventEncoder()
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._sock: Optional[socket.socket] = None
+        self._ring: Optional[EventRing] = None
+        self._next_attempt = 0.0
+        self._next_check = 0.0
+
+    def _shipper_alive(self) -> bool:
+        """The shipper never writes to the socket, so readable means EOF or error."""
+        try:
+            readable, _, _ = select.select([self._sock], [], [], 0)
+            return not readable or self._sock.recv(1, socket.MSG_PEEK) != b""
+        except OSError:
+            return False
+
+    def _connect(self) -> bool:
+        if self._pid == os.getpid() and self._sock is not None:
+            return True
+        if self._pid != os.getpid():
+            # Inherited from the parent across fork: the ring and socket are the parent's.
+            self._sock = None
+            self._ring = None
+            self._pid = os.getpid()
+        now = time.monotonic()
+        if now < self._next_attempt:
+            return False
+        self._next_attempt = now + self.reconnect_interval_s
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(1.0)
+            sock.connect(self.socket_path)
+            if self.use_shm:
+                ring = EventRing.create(self.ring_size)
+                name = ring.name.encode("utf-8")
+                try:
+                    sock.sendall(_MSG_HEAD.pack(_KIND_RING, len(name)) + name)
+                except OSError:
+                    ring.close(unlink=True)
+                    raise
+                # The shipper owns the segment now and unlinks it after draining;
+                # our resource tracker must not unlink it when this worker exits.
+                _untrack(ring.shm)
+                self._ring = ring
+        except OSError:
+            sock.close()
+            return False
+        self._sock = sock
+        return True
+
+    def submit(self, event: Event) -> bool:
+        frame = encode_frame(event, self._encoder)
+        with self._lock:
+            if not self._connect():
+                return False
+            if self._ring is not None:
+                now = time.monotonic()
+                if now >= self._next_check:
+                    self._next_check = now + self.reconnect_interval_s
+                    if not self._shipper_alive():
+                        self._drop_connection()
+                        return False
+                return self._ring.push(frame)
+            try:
+                self._sock.sendall(_MSG_HEAD.pack(_KIND_FRAME, len(frame)) + frame)
+                return True
+            except OSError:
+                self._drop_connection()
+                return False
+
+    def _drop_connection(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if self._ring is not None:
+            # The shipper drains and unlinks the segment when it sees the socket close.
+            self._ring.close()
+            self._ring = None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                self._drop_connection()
+
+
+# -------------
+# Shipper side
+# -------------
+class EventShipper:
+    """
+    Drains producer rings and socket frames and sends them upstream with one
+    PlausibleClient (connection pool, rate limiter and retries shared by the host).
+
+    workers bounds concurrent upstream calls; frames wait in the rings (or the
+    socket buffers) while all workers are busy.
+
+    Failed sends are counted in `failed` (and plausible_shipper_events_total) and
+    logged as a warning at most once per log_interval_s, with the number of failures
+    since the last warning and the latest error.
+
+    The socket is created owner-only (0600), so producers run as the shipper's user.
+    Only segments named and laid out by EventRing.create() are attached; a ring that
+    fails to drain is logged and dropped without stopping the others.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        socket_path: str,
+        *,
+        workers: int = 8,
+        poll_interval_s: float = 0.002,
+        log_interval_s: float = 10.0,
+    ) -> None:
+        self.client = client
+        self.socket_path = socket_path
+        self.workers = workers
+        self.poll_interval_s = poll_interval_s
+        self.log_interval_s = log_interval_s
+        self.sent = 0
+        self.failed = 0
+        self._counts_lock = threading.Lock()
+        self._unlogged_failures = 0
+        self._last_failure_log = float("-inf")
+        self._rings: Dict[int, EventRing] = {}
+        self._closed_rings: List[EventRing] = []
+        self._rings_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plausible-ship")
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._conns: Dict[socket.socket, threading.Thread] = {}
+        self._conns_lock = threading.Lock()
+        self._server: Optional[socket.socket] = None
+        if client.metrics is not None:
+            client.metrics.describe("plausible_shipper_events_total", "Events sent upstream by the shipper process, by outcome.")
+
+    def start(self) -> "EventShipper":
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        # Registered segments are unlinked by the shipper: only our own user may connect.
+        os.chmod(self.socket_path, 0o600)
+        server.listen(128)
+        server.settimeout(0.2)
+        self._server = server
+        for target, name in ((self._accept_loop, "plausible-ship-accept"), (self._drain_loop, "plausible-ship-drain")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop accepting, drain what is queued in the rings, wait for in-flight sends."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        # Readers see EOF once buffered messages (late ring registrations) are consumed.
+        with self._conns_lock:
+            conns = list(self._conns.items())
+        for conn, thread in conns:
+            try:
+                conn.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+        for _, thread in conns:
+            thread.join(timeout)
+        with self._rings_lock:
+            rings = list(self._rings.values()) + self._closed_rings
+            self._rings.clear()
+            self._closed_rings = []
+        for ring in rings:
+            self._drain_or_drop(ring)
+            self._close_ring(ring)
+        self._pool.shutdown(wait=True)
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+    def _accept_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            self._serve_in_thread(conn)
+        # Producers already queued in the backlog may have pushed events: take them too.
+        self._server.setblocking(False)
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            conn.setblocking(True)
+            self._serve_in_thread(conn)
+
+    def _serve_in_thread(self, conn: socket.socket) -> None:
+        thread = threading.Thread(target=self._serve_connection, args=(conn,), name="plausible-ship-conn", daemon=True)
+        with self._conns_lock:
+            self._conns[conn] = thread
+        thread.start()
+
+    def _serve_connection(self, conn: socket.socket) -> None:
+        ring: Optional[EventRing] = None
+        reader = conn.makefile("rb")
+        try:
+            while True:
+                head = reader.read(_MSG_HEAD.size)
+                if len(head) < _MSG_HEAD.size:
+                    return
+                kind, length = _MSG_HEAD.unpack(head)
+                body = reader.read(length)
+                if len(body) < length:
+                    return
+                if kind == _KIND_RING and ring is None:
+                    name = body.decode("utf-8", "replace")
+                    if not _RING_NAME.match(name):
+                        logger.warning("refusing to attach shared memory segment %r: not an event ring name", name)
+                        return
+                    try:
+                        ring = EventRing.attach(name)
+                    except ValueError as exc:
+                        logger.warning("refusing to attach %s", exc)
+                        return
+                    with self._rings_lock:
+                        self._rings[id(ring)] = ring
+                elif kind == _KIND_FRAME:
+                    self._dispatch(body)
+        except OSError:
+            return
+        finally:
+            reader.close()
+            conn.close()
+            with self._conns_lock:
+                self._conns.pop(conn, None)
+            if ring is not None:
+                # Producer gone: the drain loop empties the ring once more, then unlinks it.
+                # A ring the drain loop dropped is already closed.
+                with self._rings_lock:
+                    if self._rings.pop(id(ring), None) is not None:
+                        self._closed_rings.append(ring)
+
+    def _drain_loop(self) -> None:
+        idle = self.poll_interval_s
+        while not self._stop.is_set():
+            with self._rings_lock:
+                rings = list(self._rings.values())
+                closed, self._closed_rings = self._closed_rings, []
+            moved = sum(self._drain_or_drop(ring) for ring in rings)
+            for ring in closed:
+                moved += self._drain_or_drop(ring)
+                self._close_ring(ring)
+            if moved:
+                idle = self.poll_interval_s
+            else:
+                # Back off while idle, up to 25x the poll interval.
+                time.sleep(idle)
+                idle = min(idle * 2, self.poll_interval_s * 25)
+
+    def _drain_or_drop(self, ring: EventRing) -> int:
+        """Drain ring; one that cannot be read is logged, unregistered and unlinked."""
+        try:
+            return self._drain_ring(ring)
+        except Exception:
+            logger.exception("dropping event ring %r: draining it failed", ring.name)
+            with self._rings_lock:
+                dropped = self._rings.pop(id(ring), None) is not None
+            if dropped:
+                self._close_ring(ring)
+            return 0
+
+    def _close_ring(self, ring: EventRing) -> None:
+        try:
+            ring.close(unlink=True)
+        except Exception:
+            logger.exception("closing event ring %r failed", ring.name)
+
+    def _drain_ring(self, ring: EventRing) -> int:
+        moved = 0
+        while True:
+            frames = ring.pop_many()
+            if not frames:
+                return moved
+            for frame in frames:
+                self._dispatch(frame)
+            moved += len(frames)
+
+    def _dispatch(self, frame: bytes) -> None:
+        self._slots.acquire()
+        self._pool.submit(self._send, frame)
+
+    def _send(self, frame: bytes) -> None:
+        error: Optional[Exception] = None
+        try:
+            body, user_agent, client_ip = decode_frame(frame)
+            self.client.send_encoded_event(body, user_agent=user_agent, client_ip=client_ip)
+            outcome = "sent"
+        except Exception as exc:
+            outcome = "failed"
+            error = exc
+        finally:
+            self._slots.release()
+        unlogged = 0
+        with self._counts_lock:
+            if outcome == "sent":
+                self.sent += 1
+            else:
+                self.failed += 1
+                self._unlogged_failures += 1
+                now = time.monotonic()
+                if now - self._last_failure_log >= self.log_interval_s:
+                    unlogged, self._unlogged_failures = self._unlogged_failures, 0
+                    self._last_failure_log = now
+        if unlogged:
+            logger.warning("%d event send(s) failed upstream; last error: %s: %s", unlogged, type(error).__name__, error)
+        if self.client.metrics is not None:
+            self.client.metrics.inc("plausible_shipper_events_total", labels={"outcome": outcome})
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from .client import PlausibleClient
+    from .metrics import default_registry, serve_prometheus
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", required=True, help="Unix domain socket path")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent upstream calls")
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--pool-maxsize", type=int, default=16)
+    parser.add_argument("--rate-limit-per-hour", type=int, default=600)
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus metrics on this port at /metrics")
+    parser.add_argument("--metrics-host", default="127.0.0.1", help="address for --metrics-port (default: loopback only)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    kwargs: Dict[str, Any] = {"pool_maxsize": args.pool_maxsize, "rate_limit_per_hour": args.rate_limit_per_hour}
+    if args.base_url:
+        kwargs["base_url"] = args.base_url
+    metrics_server = None
+    if args.metrics_port is not None:
+        kwargs["metrics"] = default_registry()
+        metrics_server = serve_prometheus(kwargs["metrics"], args.metrics_host, args.metrics_port)
+    client = PlausibleClient(**kwargs)
+    shipper = EventShipper(client, args.socket, workers=args.workers).start()
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    while not stop.wait(1.0):
+        pass
+    shipper.stop()
+    client.close()
+    if metrics_server is not None:
+        metrics_server.shutdown()
+    print(f"shipper stopped: sent={shipper.sent} failed={shipper.failed}")
+
+
+if __name__ == "__main__":
+    main()
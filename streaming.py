@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import codecs
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .errors import PlausibleAPIError, PlausibleResponseTooLargeError
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\n\r"
+
+
+def iter_body(resp: Any, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Decoded (decompressed) body chunks of a requests, httpx or TransportResponse response."""
+    if hasattr(resp, "iter_content"):
+        return resp.iter_content(chunk_size)
+    return resp.iter_bytes(chunk_size)
+
+
+class _Reader:
+    """Text buffer over byte chunks with a byte cap; parsing happens on self.buf[self.pos:]."""
+
+    __slots__ = ("_chunks", "_decoder", "buf", "pos", "bytes_read", "max_bytes", "eof")
+
+    def __init__(self, chunks: Iterable[bytes], max_bytes: Optional[int]) -> None:
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.bytes_read = 0
+        self.max_bytes = max_bytes
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Append the next chunk; False at end of body."""
+        if self.eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.eof = True
+            tail = self._decoder.decode(b"", final=True)
+            self.buf += tail
+            return bool(tail)
+        self.bytes_read += len(chunk)
+        if self.max_bytes is not None and self.bytes_read > self.max_bytes:
+            raise PlausibleResponseTooLargeError(
+                f"Stats response exceeds {self.max_bytes} bytes", limit_bytes=self.max_bytes
+            )
+        # Drop what has been parsed so the buffer stays about one chunk long.
+        if self.pos:
+            self.buf = self.buf[self.pos :]
+            self.pos = 0
+        self.buf += self._decoder.decode(chunk)
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character (consuming the whitespace), or '' at end."""
+        while True:
+            buf, pos = self.buf, self.pos
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.bytes_read}")
+        self.pos += 1
+
+    def value(self, decode: Any = json.JSONDecoder().raw_decode) -> Any:
+        """Decode one JSON value, reading more chunks while it is incomplete."""
+        self.peek()
+        while True:
+            try:
+                value, end = decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk.
+            if end == len(self.buf) and not self.eof and self.buf[end - 1] not in "}]\"el":
+                if self.fill():
+                    continue
+            self.pos = end
+            return value
+
+
+class StatsStream:
+    """
+    Iterates the `results` rows of a /api/v2/query response as they are parsed.
+
+    Only one row (plus one chunk of body) is held at a time. `meta`, `query` and any
+    other top-level fields are available once iteration has finished (they follow
+    `results` in the upstream response). max_bytes caps the decoded body size.
+    Use as a context manager, or call close(), if iteration may stop early.
+    """
+
+    def __init__(self, resp: Any, *, max_bytes: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self._resp = resp
+        self._reader = _Reader(iter_body(resp, chunk_size), max_bytes)
+        self._fields: Dict[str, Any] = {}
+        self._started = False
+        self.rows_read = 0
+        self.finished = False
+
+    @property
+    def bytes_read(self) -> int:
+        return self._reader.bytes_read
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return self._field("meta")
+
+    @property
+    def query(self) -> Dict[str, Any]:
+        return self._field("query")
+
+    def _field(self, name: str) -> Any:
+        if not self.finished:
+            raise RuntimeError(f"`{name}` is available once all rows have been read")
+        return self._fields.get(name, {})
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self._started:
+            raise RuntimeError("StatsStream can only be iterated once")
+        self._started = True
+        try:
+            yield from self._parse()
+        finally:
+            self.close()
+
+    def _parse(self) -> Iterator[Dict[str, Any]]:
+        r = self._reader
+        try:
+            r.expect("{")
+            if r.peek() == "}":
+                r.pos += 1
+            else:
+                while True:
+                    key = r.value()
+                    r.expect(":")
+                    if key == "results" and r.peek() == "[":
+                        r.pos += 1
+                        if r.peek() == "]":
+                            r.pos += 1
+                        else:
+                            while True:
+                                row = r.value()
+                                self.rows_read += 1
+                                yield row
+                                sep = r.peek()
+                                r.pos += 1
+                                if sep == "]":
+                                    break
+                                if sep != ",":
+                                    raise ValueError(f"expected ',' or ']' at offset {r.bytes_read}")
+                    else:
+                        self._fields[key] = r.value()
+                    sep = r.peek()
+                    r.pos += 1
+                    if sep == "}":
+                        break
+                    if sep != ",":
+                        raise ValueError(f"expected ',' or '}}' at offset {r.bytes_read}")
+        except ValueError as exc:
+            raise PlausibleAPIError(
+                f"Malformed stats response: {exc}",
+                status_code=getattr(self._resp, "status_code", None),
+            ) from exc
+        self.finished = True
+
+    def read_all(self) -> Dict[str, Any]:
+        """Materialize the whole response, like query_stats() (still size-capped)."""
+        rows: List[Dict[str, Any]] = list(self)
+        return {**self._fields, "results": rows}
+
+    def close(self) -> None:
+        if self._resp is not None:
+            self._resp.close()
+            self._resp = None
+
+    def __enter__(self) -> "StatsStream":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+
+# Phases in the order they happen during one upstream call.
+PHASES = ("rate_limit", "connect", "tls", "ttfb", "download", "parse", "validate")
+
+_local = threading.local()
+
+
+class CallTiming:
+    """
+    Per-call phase breakdown (seconds) for one upstream Plausible call.
+
+    connect/tls are only non-zero when a new pooled connection had to be opened.
+    """
+
+    __slots__ = ("endpoint", "phases", "started_at")
+
+    def __init__(self, endpoint: str = "") -> None:
+        self.endpoint = endpoint
+        self.phases: Dict[str, float] = {}
+        self.started_at = time.perf_counter()
+
+    def add(self, phase: str, seconds: float) -> None:
+        if seconds > 0:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def as_ms(self) -> Dict[str, float]:
+        return {p: round(self.phases[p] * 1000.0, 3) for p in PHASES if p in self.phases}
+
+    def server_timing(self) -> str:
+        """Render as a Server-Timing header value, e.g. 'rate_limit;dur=0.1, ttfb;dur=84.2'."""
+        return ", ".join(f"{phase};dur={ms}" for phase, ms in self.as_ms().items())
+
+
+class TimingSampler:
+    """Decides which calls get a CallTiming; rate is the sampled fraction in [0, 1]."""
+
+    __slots__ = ("rate",)
+
+    def __init__(self, rate: float = 0.0) -> None:
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError("timing sample rate must be within [0, 1]")
+        self.rate = rate
+
+    def should_sample(self) -> bool:
+        rate = self.rate
+        return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+def begin(endpoint: str = "") -> CallTiming:
+    """Start timing a call on this thread; transports record into current()."""
+    timing = CallTiming(endpoint)
+    _local.current = timing
+    return timing
+
+
+def current() -> Optional[CallTiming]:
+    return getattr(_local, "current", None)
+
+
+def finish() -> Optional[CallTiming]:
+    """Close the current call; it becomes available through pop_last()."""
+    timing = getattr(_local, "current", None)
+    _local.current = None
+    if timing is not None:
+        _local.last = timing
+    return timing
+
+
+def pop_last() -> Optional[CallTiming]:
+    """Return and clear the most recent finished CallTiming on this thread."""
+    timing = getattr(_local, "last", None)
+    _local.last = None
+    return timing
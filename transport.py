@@ -0,0 +1,510 @@
+from __future__ import annotations
+
+import gzip
+import json as _json
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Mapping, MutableSequence, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from .errors import PlausibleError
+
+if TYPE_CHECKING:
+    from requests import Session
+
+    from .resolver import DNSCache
+
+
+DEFAULT_ACCEPT_ENCODING = "gzip, deflate"
+RETRY_STATUS_FORCELIST = (429, 500, 502, 503, 504)
+RETRY_ALLOWED_METHODS = ("GET", "POST", "PUT", "DELETE")
+# Statuses whose Retry-After header is honoured, and the longest backoff (as urllib3).
+RETRY_AFTER_STATUS_CODES = (413, 429, 503)
+RETRY_BACKOFF_MAX_S = 120.0
+
+
+def encode_json_body(
+    payload: Any,
+    headers: Dict[str, str],
+    *,
+    compress: bool = False,
+    compress_min_bytes: int = 1024,
+) -> bytes:
+    """
+    Serialize a JSON payload to compact bytes and gzip it when it is large enough.
+    Mutates headers in place (Content-Type, Content-Encoding).
+    """
+    body = _json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    headers.setdefault("Content-Type", "application/json")
+    if compress and len(body) >= compress_min_bytes:
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return body
+
+
+class TransportResponse:
+    """
+    Minimal response object returned by non-requests transports.
+
+    Mirrors the subset of requests.Response used by PlausibleClient:
+    status_code, content, text, headers and json().
+    """
+
+    __slots__ = ("status_code", "content", "headers", "url")
+
+    def __init__(
+        self,
+        status_code: int = 200,
+        content: bytes = b"",
+        headers: Optional[Mapping[str, str]] = None,
+        url: str = "",
+    ) -> None:
+        self.status_code = status_code
+        self.content = content
+        self.headers: Dict[str, str] = dict(headers or {})
+        self.url = url
+
+    @classmethod
+    def from_json(cls, data: Any, status_code: int = 200, headers: Optional[Mapping[str, str]] = None) -> "TransportResponse":
+        merged = {"Content-Type": "application/json"}
+        merged.update(headers or {})
+        return cls(status_code=status_code, content=_json.dumps(data).encode("utf-8"), headers=merged)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return _json.loads(self.content)
+
+    def iter_content(self, chunk_size: int = 65536) -> Iterator[bytes]:
+        content = self.content
+        for start in range(0, len(content), chunk_size):
+            yield content[start : start + chunk_size]
+
+    def close(self) -> None:
+        pass
+
+
+class Transport:
+    """
+    Base class for the HTTP layer PlausibleClient delegates to.
+
+    Subclasses implement request() and return an object exposing
+    status_code, content, text, headers and json() (requests.Response or TransportResponse).
+    With stream=True the body is left unread: callers consume it through
+    iter_content()/iter_bytes() and must close() the response.
+    """
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        data: Optional[Union[bytes, Dict[str, Any]]] = None,
+        files: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        stream: bool = False,
+    ) -> Any:
+        raise NotImplementedError
+
+    def warm(self, url: str, connections: int = 1) -> int:
+        """Open up to `connections` pooled connections to url's host ahead of use; returns how many."""
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+class RequestsTransport(Transport):
+    """
+    requests/urllib3 based transport with a tunable connection pool.
+
+    pool_connections: number of per-host pools kept by the adapter
+    pool_maxsize: connections kept alive per host; size it to the number of worker threads
+    pool_block: block instead of opening throwaway connections when the pool is exhausted
+    keep_alive: when False, every request sends Connection: close
+    compress_requests: gzip JSON bodies of at least compress_min_bytes
+    dns_cache: resolve hosts through a resolver.DNSCache instead of on every new connection
+
+    Connection setup (TCP connect, TLS handshake) is recorded into timing.current()
+    when the calling thread is timing a call.
+    """
+
+    def __init__(
+        self,
+        *,
+        session: Optional[Session] = None,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        keep_alive: bool = True,
+        compress_requests: bool = False,
+        compress_min_bytes: int = 1024,
+        accept_encoding: str = DEFAULT_ACCEPT_ENCODING,
+        dns_cache: Optional[DNSCache] = None,
+    ) -> None:
+        # requests/urllib3 are imported here so that importing the package stays cheap.
+        import requests
+        from urllib3.util.retry import Retry
+
+        from ._timed_adapter import TimedHTTPAdapter
+
+        self.session = session or requests.Session()
+        self.keep_alive = keep_alive
+        self.compress_requests = compress_requests
+        self.compress_min_bytes = compress_min_bytes
+
+        retry = Retry(
+            total=max_retries,
+            read=max_retries,
+            connect=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_FORCELIST,
+            allowed_methods=RETRY_ALLOWED_METHODS,
+            raise_on_status=False,
+        )
+        adapter = TimedHTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+            pool_block=pool_block,
+            dns_cache=dns_cache,
+        )
+        self.dns_cache = dns_cache
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept-Encoding"] = accept_encoding
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        data: Optional[Union[bytes, Dict[str, Any]]] = None,
+        files: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        stream: bool = False,
+    ) -> Any:
+        headers = dict(headers or {})
+        if json is not None:
+            data = encode_json_body(
+                json,
+                headers,
+                compress=self.compress_requests,
+                compress_min_bytes=self.compress_min_bytes,
+            )
+        elif isinstance(data, bytes) and self.compress_requests and len(data) >= self.compress_min_bytes:
+            data = gzip.compress(data, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        return self.session.request(
+            method,
+            url,
+            headers=headers,
+            params=params,
+            data=data,
+            files=files,
+            timeout=timeout,
+            stream=stream,
+        )
+
+    def warm(self, url: str, connections: int = 1) -> int:
+        """
+        Connect (TCP + TLS) up to `connections` connections to url's host in parallel
+        and park them in the pool the first requests will use. Failures are skipped.
+        """
+        import requests
+        from urllib3.exceptions import EmptyPoolError
+
+        prepared = requests.Request("GET", url).prepare()
+        settings = self.session.merge_environment_settings(url, {}, None, None, None)
+        adapter = self.session.get_adapter(url)
+        pool = adapter.get_connection_with_tls_context(prepared, settings["verify"], settings["proxies"], settings["cert"])
+        conns = []
+        for _ in range(min(connections, pool.pool.maxsize if pool.pool is not None else 0)):
+            try:
+                conns.append(pool._get_conn(timeout=0))
+            except EmptyPoolError:
+                break
+
+        opened = []
+
+        def connect(conn: Any) -> None:
+            try:
+                conn.connect()
+                if _settle_tls(conn.sock):
+                    opened.append(conn)
+                else:
+                    conn.close()
+            except Exception:
+                conn.close()
+
+        threads = [threading.Thread(target=connect, args=(conn,), name="plausible-warm") for conn in conns]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for conn in conns:
+            pool._put_conn(conn)
+        return len(opened)
+
+    def collect_metrics(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        """Connection pool stats per host, for MetricsRegistry collectors."""
+        from requests.adapters import HTTPAdapter
+
+        seen = set()
+        for adapter in self.session.adapters.values():
+            if id(adapter) in seen or not isinstance(adapter, HTTPAdapter):
+                continue
+            seen.add(id(adapter))
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                labels = {"host": f"{pool.host}:{pool.port}"}
+                yield "plausible_pool_connections_opened", labels, float(pool.num_connections)
+                yield "plausible_pool_requests", labels, float(pool.num_requests)
+                yield "plausible_pool_maxsize", labels, float(pool.pool.maxsize if pool.pool is not None else 0)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def _settle_tls(sock: Any, wait_s: float = 0.05) -> bool:
+    """
+    Read the TLS 1.3 session tickets a server sends after the handshake.
+    Left unread they make an idle connection look readable, which urllib3 takes as
+    dropped, so a pre-opened connection would be discarded on first use.
+    Returns False if the server closed the connection.
+    """
+    # Imported here (ssl takes ~10 ms) so that importing the transports stays cheap.
+    import socket
+    import ssl
+
+    if not isinstance(sock, ssl.SSLSocket):
+        return True
+    timeout = sock.gettimeout()
+    try:
+        sock.settimeout(wait_s)
+        return sock.recv(1) != b""
+    except (socket.timeout, ssl.SSLWantReadError):
+        return True
+    finally:
+        sock.settimeout(timeout)
+
+
+def _retry_delay(retry: int, status_code: int, headers: Mapping[str, str], backoff_factor: float) -> float:
+    """
+    Seconds to wait before retry number `retry` (1-based), following urllib3's Retry:
+    Retry-After (seconds or HTTP date) for 413/429/503, else exponential backoff.
+    """
+    if status_code in RETRY_AFTER_STATUS_CODES:
+        value = headers.get("Retry-After")
+        if value:
+            value = value.strip()
+            if value.isdigit():
+                return float(value)
+            from email.utils import parsedate_to_datetime
+
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    if retry <= 1:
+        return 0.0
+    return min(RETRY_BACKOFF_MAX_S, backoff_factor * (2 ** (retry - 1)))
+
+
+class HTTPXTransport(Transport):
+    """
+    httpx based transport with optional HTTP/2 multiplexing.
+
+    Requires the optional dependency: pip install "httpx[http2]".
+    Applies the same retry policy as RequestsTransport: failed connection attempts
+    are retried by httpx, and responses with a RETRY_STATUS_FORCELIST status are
+    retried up to max_retries times, waiting per Retry-After or backoff_factor.
+    """
+
+    def __init__(
+        self,
+        *,
+        http2: bool = True,
+        max_connections: int = 10,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry_s: float = 30.0,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        compress_requests: bool = False,
+        compress_min_bytes: int = 1024,
+        accept_encoding: str = DEFAULT_ACCEPT_ENCODING,
+    ) -> None:
+        try:
+            import httpx
+        except ImportError as exc:  # pragma: no cover - depends on environment
+            raise PlausibleError('HTTPXTransport requires httpx. Install with: pip install "httpx[http2]"') from exc
+
+        self.http2 = http2
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.compress_requests = compress_requests
+        self.compress_min_bytes = compress_min_bytes
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections if max_keepalive_connections is not None else max_connections,
+            keepalive_expiry=keepalive_expiry_s,
+        )
+        self.client = httpx.Client(
+            http2=http2,
+            limits=limits,
+            transport=httpx.HTTPTransport(http2=http2, limits=limits, retries=max_retries),
+            headers={"Accept-Encoding": accept_encoding},
+        )
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        data: Optional[Union[bytes, Dict[str, Any]]] = None,
+        files: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        stream: bool = False,
+    ) -> Any:
+        headers = dict(headers or {})
+        content: Optional[bytes] = None
+        if json is not None:
+            content = encode_json_body(
+                json,
+                headers,
+                compress=self.compress_requests,
+                compress_min_bytes=self.compress_min_bytes,
+            )
+        elif isinstance(data, bytes):
+            content = data
+            data = None
+        request = self.client.build_request(
+            method,
+            url,
+            headers=headers,
+            params=params,
+            content=content,
+            data=data,
+            files=files,
+            timeout=timeout,
+        )
+        resp = self.client.send(request, stream=stream)
+        if method.upper() not in RETRY_ALLOWED_METHODS:
+            return resp
+        # Once retries run out the last response is returned as-is (raise_on_status=False).
+        retry = 0
+        while resp.status_code in RETRY_STATUS_FORCELIST and retry < self.max_retries:
+            retry += 1
+            delay = _retry_delay(retry, resp.status_code, resp.headers, self.backoff_factor)
+            resp.close()
+            if delay > 0:
+                time.sleep(delay)
+            resp = self.client.send(request, stream=stream)
+        return resp
+
+    def warm(self, url: str, connections: int = 1) -> int:
+        """
+        httpx cannot pre-open pooled connections, so this sends `connections`
+        concurrent HEAD requests to url (one suffices with HTTP/2 multiplexing).
+        """
+        if self.http2:
+            connections = 1
+        opened = []
+
+        def head() -> None:
+            try:
+                self.client.head(url).close()
+                opened.append(True)
+            except Exception:
+                pass
+
+        threads = [threading.Thread(target=head, name="plausible-warm") for _ in range(connections)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return len(opened)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+CannedHandler = Callable[[Dict[str, Any]], TransportResponse]
+
+
+class CannedTransport(Transport):
+    """
+    In-process transport serving canned responses, for tests and benchmarks.
+
+    routes maps (METHOD, path) to a TransportResponse or to a callable receiving the
+    recorded request dict and returning one. Unknown routes return 404.
+    Every request is appended to self.calls; with max_calls only the latest max_calls
+    are kept (max_calls=0 keeps none), so long benchmark runs do not grow memory.
+    """
+
+    def __init__(
+        self,
+        routes: Optional[Dict[Tuple[str, str], Union[TransportResponse, CannedHandler]]] = None,
+        *,
+        max_calls: Optional[int] = None,
+    ) -> None:
+        self.routes: Dict[Tuple[str, str], Union[TransportResponse, CannedHandler]] = dict(routes or {})
+        self.calls: MutableSequence[Dict[str, Any]] = [] if max_calls is None else deque(maxlen=max_calls)
+
+    def add(self, method: str, path: str, response: Union[TransportResponse, CannedHandler]) -> None:
+        self.routes[(method.upper(), path)] = response
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        data: Optional[Union[bytes, Dict[str, Any]]] = None,
+        files: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        stream: bool = False,
+    ) -> Any:
+        path = urlsplit(url).path
+        call = {
+            "method": method.upper(),
+            "url": url,
+            "path": path,
+            "headers": dict(headers or {}),
+            "params": params,
+            "json": json,
+            "data": data,
+            "files": files,
+        }
+        self.calls.append(call)
+        route = self.routes.get((call["method"], path))
+        if route is None:
+            return TransportResponse(status_code=404, content=b'{"error":"not found"}', url=url)
+        resp = route(call) if callable(route) else route
+        resp.url = url
+        return resp
+
+    def iter_calls(self, path: str) -> Iterator[Dict[str, Any]]:
+        return (c for c in self.calls if c["path"] == path)
@@ -0,0 +1,400 @@
+from __future__ import annotations
+
+import datetime as _dt
+import re
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from .errors import PlausibleQueryValidationError
+
+
+METRICS = frozenset(
+    {
+        "visitors",
+        "visits",
+        "pageviews",
+        "views_per_visit",
+        "bounce_rate",
+        "visit_duration",
+        "events",
+        "scroll_depth",
+        "percentage",
+        "conversion_rate",
+        "group_conversion_rate",
+        "average_revenue",
+        "total_revenue",
+        "time_on_page",
+        "exit_rate",
+    }
+)
+GOAL_METRICS = frozenset({"conversion_rate", "group_conversion_rate"})
+# Computed per visit, so they cannot be broken down by an event dimension.
+SESSION_METRICS = frozenset({"bounce_rate", "views_per_visit", "visit_duration"})
+# Share of the total, so they need a dimension to split the total by.
+DIMENSION_METRICS = frozenset({"percentage"})
+
+EVENT_DIMENSIONS = frozenset({"event:name", "event:page", "event:goal", "event:hostname"})
+VISIT_DIMENSIONS = frozenset(
+    {
+        "visit:entry_page",
+        "visit:exit_page",
+        "visit:entry_page_hostname",
+        "visit:exit_page_hostname",
+        "visit:source",
+        "visit:referrer",
+        "visit:channel",
+        "visit:utm_medium",
+        "visit:utm_source",
+        "visit:utm_campaign",
+        "visit:utm_content",
+        "visit:utm_term",
+        "visit:device",
+        "visit:browser",
+        "visit:browser_version",
+        "visit:os",
+        "visit:os_version",
+        "visit:country",
+        "visit:region",
+        "visit:city",
+        "visit:country_name",
+        "visit:region_name",
+        "visit:city_name",
+    }
+)
+TIME_DIMENSIONS = frozenset({"time", "time:minute", "time:hour", "time:day", "time:week", "time:month"})
+_CUSTOM_PROP = re.compile(r"^event:props:[^\s:]+$")
+
+SIMPLE_FILTER_OPS = frozenset(
+    {
+        "is",
+        "is_not",
+        "contains",
+        "contains_not",
+        "matches",
+        "matches_not",
+        "matches_wildcard",
+        "matches_wildcard_not",
+    }
+)
+LOGICAL_FILTER_OPS = frozenset({"and", "or"})
+UNARY_FILTER_OPS = frozenset({"not", "has_done", "has_not_done"})
+
+# Named date ranges and the number of days they can span.
+DATE_RANGES: Dict[str, float] = {
+    "day": 1,
+    "24h": 1,
+    "7d": 7,
+    "28d": 28,
+    "30d": 30,
+    "91d": 91,
+    "month": 31,
+    "6mo": 184,
+    "12mo": 366,
+    "year": 366,
+    "all": float("inf"),
+}
+# Longest date range (in days) a time dimension can be bucketed over.
+TIME_DIMENSION_MAX_DAYS: Dict[str, float] = {"time:minute": 1, "time:hour": 31}
+
+QUERY_FIELDS = frozenset({"site_id", "metrics", "date_range", "dimensions", "filters", "order_by", "include", "pagination"})
+INCLUDE_FIELDS = frozenset({"imports", "time_labels", "total_rows"})
+MAX_PAGINATION_LIMIT = 10_000
+
+
+class QueryIssue(NamedTuple):
+    path: str  # e.g. "metrics[1]" or "filters[0][1]"
+    code: str  # machine readable, e.g. "unknown_metric"
+    message: str
+
+    def as_dict(self) -> Dict[str, str]:
+        return self._asdict()
+
+
+def _parse_iso(value: Any) -> Optional[_dt.date]:
+    if not isinstance(value, str):
+        return None
+    try:
+        if len(value) == 10:
+            return _dt.date.fromisoformat(value)
+        return _dt.datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+    except ValueError:
+        return None
+
+
+class QueryValidator:
+    """
+    Local validator for Stats API v2 queries (models.StatsQuery / StatsQueryRequest).
+
+    Checks the metric, dimension, filter and date_range grammar plus cross-field rules
+    the upstream would answer with a 400 (goal metrics without a goal, time dimensions
+    over too long a range, session metrics with event dimensions, order_by on fields
+    not in the query, ...).
+
+    The grammar is compiled into frozensets and a regex once, so a typical query
+    validates in a few microseconds without any network or pydantic work.
+    extra_* arguments extend the grammar for upstream additions not known here.
+    """
+
+    def __init__(
+        self,
+        *,
+        extra_metrics: Iterable[str] = (),
+        extra_dimensions: Iterable[str] = (),
+        extra_date_ranges: Optional[Mapping[str, float]] = None,
+        time_dimension_max_days: Optional[Mapping[str, float]] = None,
+    ) -> None:
+        self.metrics: FrozenSet[str] = METRICS | frozenset(extra_metrics)
+        self.dimensions: FrozenSet[str] = EVENT_DIMENSIONS | VISIT_DIMENSIONS | TIME_DIMENSIONS | frozenset(extra_dimensions)
+        self.date_ranges: Dict[str, float] = {**DATE_RANGES, **(extra_date_ranges or {})}
+        self.time_dimension_max_days: Dict[str, float] = dict(
+            TIME_DIMENSION_MAX_DAYS if time_dimension_max_days is None else time_dimension_max_days
+        )
+
+    # ----------
+    # Public API
+    # ----------
+    def issues(self, query: Any) -> Tuple[QueryIssue, ...]:
+        if hasattr(query, "model_dump"):
+            query = query.model_dump(exclude_none=True)
+        return self._check_query(query)
+
+    def validate(self, query: Any) -> None:
+        issues = self.issues(query)
+        if issues:
+            summary = "; ".join(f"{i.path}: {i.message}" for i in issues[:3])
+            more = f" (+{len(issues) - 3} more)" if len(issues) > 3 else ""
+            raise PlausibleQueryValidationError(f"Invalid stats query: {summary}{more}", issues=list(issues))
+
+    # ---------
+    # Internals
+    # ---------
+    def _check_query(self, query: Any) -> Tuple[QueryIssue, ...]:
+        out: List[QueryIssue] = []
+        if not isinstance(query, Mapping):
+            return (QueryIssue("", "invalid_type", "query must be a JSON object"),)
+
+        for key in query:
+            if key not in QUERY_FIELDS:
+                out.append(QueryIssue(key, "unknown_field", f"unknown query field '{key}'"))
+
+        site_id = query.get("site_id")
+        if not isinstance(site_id, str) or not site_id:
+            out.append(QueryIssue("site_id", "required", "site_id is required"))
+
+        metrics = self._check_metrics(query.get("metrics"), out)
+        dimensions = self._check_dimensions(query.get("dimensions"), out)
+        span_days = self._check_date_range(query.get("date_range"), out)
+        goal_filtered = self._check_filters(query.get("filters"), out)
+
+        time_dims = [d for d in dimensions if d in TIME_DIMENSIONS]
+        if len(time_dims) > 1:
+            out.append(QueryIssue("dimensions", "multiple_time_dimensions", "only one time dimension can be queried"))
+        for dim in time_dims:
+            max_days = self.time_dimension_max_days.get(dim)
+            if max_days is not None and span_days is not None and span_days > max_days:
+                out.append(
+                    QueryIssue(
+                        "dimensions",
+                        "time_dimension_range",
+                        f"{dim} cannot be used with a date_range longer than {max_days:g} day(s)",
+                    )
+                )
+
+        goal_metrics = GOAL_METRICS.intersection(metrics)
+        if goal_metrics and not goal_filtered and "event:goal" not in dimensions:
+            out.append(
+                QueryIssue(
+                    "metrics",
+                    "goal_required",
+                    f"{', '.join(sorted(goal_metrics))} requires an event:goal filter or dimension",
+                )
+            )
+
+        session_metrics = SESSION_METRICS.intersection(metrics)
+        event_dims = [d for d in dimensions if d in EVENT_DIMENSIONS or _CUSTOM_PROP.match(d)]
+        if session_metrics and event_dims:
+            out.append(
+                QueryIssue(
+                    "metrics",
+                    "incompatible_dimension",
+                    f"{', '.join(sorted(session_metrics))} cannot be queried with event dimension(s) {', '.join(event_dims)}",
+                )
+            )
+        dimension_metrics = DIMENSION_METRICS.intersection(metrics)
+        if dimension_metrics and not dimensions:
+            out.append(
+                QueryIssue(
+                    "metrics",
+                    "dimension_required",
+                    f"{', '.join(sorted(dimension_metrics))} requires at least one dimension",
+                )
+            )
+
+        self._check_order_by(query.get("order_by"), set(metrics) | set(dimensions), out)
+        self._check_include(query.get("include"), bool(time_dims), out)
+        self._check_pagination(query.get("pagination"), out)
+        return tuple(out)
+
+    def _check_metrics(self, metrics: Any, out: List[QueryIssue]) -> List[str]:
+        if not isinstance(metrics, list) or not metrics:
+            out.append(QueryIssue("metrics", "required", "metrics must be a non-empty list"))
+            return []
+        seen = set()
+        for i, metric in enumerate(metrics):
+            if not isinstance(metric, str):
+                out.append(QueryIssue(f"metrics[{i}]", "invalid_type", "metrics must be strings"))
+                continue
+            if metric not in self.metrics:
+                out.append(QueryIssue(f"metrics[{i}]", "unknown_metric", f"unknown metric '{metric}'"))
+            elif metric in seen:
+                out.append(QueryIssue(f"metrics[{i}]", "duplicate_metric", f"metric '{metric}' is listed twice"))
+            seen.add(metric)
+        return [m for m in metrics if isinstance(m, str)]
+
+    def _is_dimension(self, dim: Any) -> bool:
+        return isinstance(dim, str) and (dim in self.dimensions or bool(_CUSTOM_PROP.match(dim)))
+
+    def _check_dimensions(self, dimensions: Any, out: List[QueryIssue]) -> List[str]:
+        if dimensions is None:
+            return []
+        if not isinstance(dimensions, list):
+            out.append(QueryIssue("dimensions", "invalid_type", "dimensions must be a list"))
+            return []
+        seen = set()
+        for i, dim in enumerate(dimensions):
+            if not isinstance(dim, str):
+                out.append(QueryIssue(f"dimensions[{i}]", "invalid_type", "dimensions must be strings"))
+                continue
+            if not self._is_dimension(dim):
+                out.append(QueryIssue(f"dimensions[{i}]", "unknown_dimension", f"unknown dimension '{dim}'"))
+            elif dim in seen:
+                out.append(QueryIssue(f"dimensions[{i}]", "duplicate_dimension", f"dimension '{dim}' is listed twice"))
+            seen.add(dim)
+        return [d for d in dimensions if isinstance(d, str)]
+
+    def _check_date_range(self, date_range: Any, out: List[QueryIssue]) -> Optional[float]:
+        """Returns the span in days when it can be determined."""
+        if date_range is None:
+            out.append(QueryIssue("date_range", "required", "date_range is required"))
+            return None
+        if isinstance(date_range, str):
+            if date_range not in self.date_ranges:
+                out.append(QueryIssue("date_range", "unknown_date_range", f"unknown date_range '{date_range}'"))
+                return None
+            return self.date_ranges[date_range]
+        if isinstance(date_range, list) and len(date_range) == 2:
+            start, end = _parse_iso(date_range[0]), _parse_iso(date_range[1])
+            if start is None or end is None:
+                out.append(QueryIssue("date_range", "invalid_date", "custom date_range must be two ISO8601 dates"))
+                return None
+            if start > end:
+                out.append(QueryIssue("date_range", "inverted_date_range", "date_range start is after its end"))
+                return None
+            return float((end - start).days + 1)
+        out.append(QueryIssue("date_range", "invalid_type", "date_range must be a named range or [start, end]"))
+        return None
+
+    def _check_filters(self, filters: Any, out: List[QueryIssue]) -> bool:
+        """Validates the filter tree; returns True when it filters on event:goal."""
+        if filters is None:
+            return False
+        if not isinstance(filters, list):
+            out.append(QueryIssue("filters", "invalid_type", "filters must be a list"))
+            return False
+        goal = False
+        for i, flt in enumerate(filters):
+            goal = self._check_filter(flt, f"filters[{i}]", out) or goal
+        return goal
+
+    def _check_filter(self, flt: Any, path: str, out: List[QueryIssue]) -> bool:
+        if not isinstance(flt, list) or not flt or not isinstance(flt[0], str):
+            out.append(QueryIssue(path, "invalid_filter", "filter must be a list starting with an operator"))
+            return False
+        op = flt[0]
+        if op in SIMPLE_FILTER_OPS:
+            if len(flt) not in (3, 4):
+                out.append(QueryIssue(path, "invalid_filter", f"'{op}' filter must be [op, dimension, clauses(, modifiers)]"))
+                return False
+            dim, clauses = flt[1], flt[2]
+            if dim != "segment" and (not self._is_dimension(dim) or dim in TIME_DIMENSIONS):
+                out.append(QueryIssue(f"{path}[1]", "unknown_dimension", f"cannot filter on '{dim}'"))
+            if not isinstance(clauses, list) or not clauses:
+                out.append(QueryIssue(f"{path}[2]", "invalid_filter", "filter clauses must be a non-empty list"))
+            elif not all(isinstance(c, (str, int)) and not isinstance(c, bool) for c in clauses):
+                out.append(QueryIssue(f"{path}[2]", "invalid_filter", "filter clauses must be strings"))
+            if len(flt) == 4 and not isinstance(flt[3], dict):
+                out.append(QueryIssue(f"{path}[3]", "invalid_filter", "filter modifiers must be an object"))
+            return dim == "event:goal"
+        if op in LOGICAL_FILTER_OPS:
+            if len(flt) != 2 or not isinstance(flt[1], list) or not flt[1]:
+                out.append(QueryIssue(path, "invalid_filter", f"'{op}' filter must be [op, [filters...]]"))
+                return False
+            goal = False
+            for i, child in enumerate(flt[1]):
+                goal = self._check_filter(child, f"{path}[1][{i}]", out) or goal
+            return goal
+        if op in UNARY_FILTER_OPS:
+            if len(flt) != 2:
+                out.append(QueryIssue(path, "invalid_filter", f"'{op}' filter must be [op, filter]"))
+                return False
+            self._check_filter(flt[1], f"{path}[1]", out)
+            return False
+        out.append(QueryIssue(f"{path}[0]", "unknown_filter_operator", f"unknown filter operator '{op}'"))
+        return False
+
+    def _check_order_by(self, order_by: Any, fields: set, out: List[QueryIssue]) -> None:
+        if order_by is None:
+            return
+        if not isinstance(order_by, list):
+            out.append(QueryIssue("order_by", "invalid_type", "order_by must be a list"))
+            return
+        for i, item in enumerate(order_by):
+            if not isinstance(item, (list, tuple)) or len(item) != 2 or item[1] not in ("asc", "desc"):
+                out.append(QueryIssue(f"order_by[{i}]", "invalid_order_by", "order_by items must be [field, 'asc'|'desc']"))
+            elif not isinstance(item[0], str):
+                out.append(QueryIssue(f"order_by[{i}]", "invalid_order_by", "order_by field must be a string"))
+            elif item[0] not in fields:
+                out.append(
+                    QueryIssue(f"order_by[{i}]", "order_by_not_queried", f"cannot order by '{item[0]}': not in metrics or dimensions")
+                )
+
+    def _check_include(self, include: Any, has_time_dimension: bool, out: List[QueryIssue]) -> None:
+        if include is None:
+            return
+        if not isinstance(include, dict):
+            out.append(QueryIssue("include", "invalid_type", "include must be an object"))
+            return
+        for key, value in include.items():
+            if key not in INCLUDE_FIELDS:
+                out.append(QueryIssue(f"include.{key}", "unknown_field", f"unknown include option '{key}'"))
+            elif not isinstance(value, bool):
+                out.append(QueryIssue(f"include.{key}", "invalid_type", f"include.{key} must be a boolean"))
+        if include.get("time_labels") and not has_time_dimension:
+            out.append(QueryIssue("include.time_labels", "time_dimension_required", "time_labels requires a time dimension"))
+
+    def _check_pagination(self, pagination: Any, out: List[QueryIssue]) -> None:
+        if pagination is None:
+            return
+        if not isinstance(pagination, dict):
+            out.append(QueryIssue("pagination", "invalid_type", "pagination must be an object"))
+            return
+        limit = pagination.get("limit")
+        if limit is not None and (not isinstance(limit, int) or not 1 <= limit <= MAX_PAGINATION_LIMIT):
+            out.append(QueryIssue("pagination.limit", "invalid_pagination", f"limit must be between 1 and {MAX_PAGINATION_LIMIT}"))
+        offset = pagination.get("offset")
+        if offset is not None and (not isinstance(offset, int) or offset < 0):
+            out.append(QueryIssue("pagination.offset", "invalid_pagination", "offset must be a non-negative integer"))
+
+
+_default_validator: Optional[QueryValidator] = None
+
+
+def default_validator() -> QueryValidator:
+    global _default_validator
+    if _default_validator is None:
+        _default_validator = QueryValidator()
+    return _default_validator
+
+
+def validate_query(query: Any) -> None:
+    """Raise PlausibleQueryValidationError if query fails the default validator."""
+    default_validator().validate(query)